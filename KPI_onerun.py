@@ -2,15 +2,17 @@ import matplotlib.pyplot as plt
 import pandas as pd
 import seaborn as sns
 import numpy as np
+from main.warmup import load_warmup_days
+from main.kpi import load_summary, histogram_edges
 
 """
 This code calculates KPIs for one simulation and saves graphs in the same folder as the output data
 """
 
-# choose situation to visualize + warm-up period
+# choose situation to visualize (the warm-up period is chosen with KPI_warmup.py)
 folder = 'networks/network-europe-volume'
 orderfreq_mult = 1
-warmup_days = 10
+warmup_days = load_warmup_days(folder)
 
 # set standard plot settings
 sns.set_style("white")
@@ -21,34 +23,21 @@ plt.rc('ytick', labelsize=10)
 plt.rc('legend', fontsize=10)
 plt.rcParams["figure.figsize"] = (6,4)
 
-# load data & remove warmup
+# load KPIs (aggregated per run, the traces are not loaded in memory)
 orders = pd.read_csv(f'{folder}/input/orders.csv')
 output_folder = f'{folder}/output/orderfreq_{orderfreq_mult}'
-logfile_trucks = f'{output_folder}/transports.csv'
-logfile_packages = f'{output_folder}/deliveries.csv'
-Transports = pd.read_csv(logfile_trucks)
-Transports = Transports.loc[Transports['endtime'] >= warmup_days*24]
-Deliveries = pd.read_csv(logfile_packages)
-Deliveries = Deliveries.loc[Deliveries['arrivaltime'] >= warmup_days*24]
-
-# calculation
-Transports['loadfraction'] = Transports['load']/Transports['capacity']
-Deliveries['deliverytime'] = Deliveries['arrivaltime'] - Deliveries['starttime']
-Deliveries['order'] = Deliveries['startnode'] + ' > ' + Deliveries['endnode']
-Deliveries['delay'] = Deliveries['arrivaltime'] - Deliveries['duetime']
-Deliveries['ontime'] = Deliveries['delay'] <= 0
+summary = load_summary(output_folder, warmup_days)
 
 # on-time delivery fraction
-ontime_avg = Deliveries['ontime'].mean()
-ontime_numsamples = Deliveries['ontime'].count()
-ontime_stdev = np.sqrt(ontime_avg*(1-ontime_avg)/ontime_numsamples)
-print(f'On-time delivery fraction = {round(ontime_avg*100,2)}[{round((ontime_avg-1.96*ontime_stdev)*100,2)},{round((ontime_avg+1.96*ontime_stdev)*100,2)}]%')
+ontime_avg = summary['ontime_fraction']
+ontime_low, ontime_high = summary['ontime_ci']
+print(f'On-time delivery fraction = {round(ontime_avg*100,2)}[{round(ontime_low*100,2)},{round(ontime_high*100,2)}]%')
 
 # on-time delivery fraction per order
-ontimedf = Deliveries[['order','ontime']].groupby('order',as_index=False).mean()
-ontimedf['stdev'] = np.sqrt(ontimedf['ontime']*(1-ontimedf['ontime'])/Deliveries[['order','ontime']].groupby('order',as_index=False).count()['ontime'])
-ontimedf = ontimedf.sort_values(by=['ontime'])
-print(ontimedf)
+ontimedf = pd.DataFrame(summary['orders'])
+ontimedf['stdev'] = [(high-low)/(2*1.96) for low,high in ontimedf['ontime_ci']]
+ontimedf = ontimedf.rename(columns={'ontime_fraction':'ontime'}).sort_values(by=['ontime'])
+print(ontimedf[['order','ontime','stdev']])
 plt.figure()
 plt.errorbar(ontimedf['order'], ontimedf['ontime'], yerr=1.96*ontimedf['stdev'], fmt='o', capsize=10, markersize=5, markerfacecolor='red', linewidth=2)
 plt.title('Estimated: On-time delivery fraction per order (95% CI)')
@@ -76,14 +65,15 @@ plt.tight_layout()
 plt.savefig(f'{output_folder}/interarrival.png')
 
 # total truck driving time
-totaltruckdriving = sum(Transports['endtime']-Transports['starttime'])
+totaltruckdriving = summary['total_drivingtime']
 print(f'\nTotal truck driving time = {totaltruckdriving} hours')
 
 # truck load fraction
-loadfraction_avg = Transports['loadfraction'].mean()
+loadfraction_avg = summary['loadfraction']
 print(f'Average truck load fraction = {round(loadfraction_avg*100,2)}%\n')
+loadfractions = [float(value) for value in summary['loadfraction_counts']]
 plt.figure()
-plt.hist(Transports['loadfraction'], density=True)
+plt.hist(loadfractions, weights=list(summary['loadfraction_counts'].values()), density=True)
 locs, _ = plt.yticks()
 plt.yticks(locs,np.round(locs/10,3))
 plt.title('Estimated distribution: Truck load fraction')
@@ -93,12 +83,12 @@ plt.tight_layout()
 plt.savefig(f'{output_folder}/loadfraction.png')
 
 # delivery time distribution
-orders = Deliveries['order'].unique()
-for i in range(len(orders)):
-    order = orders[i]
+for i, order in enumerate(summary['orders']):
+    histogram = order['deliverytime_histogram']
+    edges = histogram_edges(histogram)
     plt.figure()
-    plt.hist(Deliveries.loc[Deliveries['order'] == order]['deliverytime'], density=True, bins=10)
-    plt.title(f'Estimated distribution: Total delivery time for order {order}',fontsize=12)
+    plt.hist(edges[:-1], bins=edges, weights=histogram['counts'], density=True)
+    plt.title(f"Estimated distribution: Total delivery time for order {order['order']}",fontsize=12)
     plt.xlabel('Total delivery time (h)')
     plt.ylabel('Density')
     plt.xlim(xmin=0)
@@ -106,9 +96,7 @@ for i in range(len(orders)):
     plt.savefig(f'{output_folder}/deliverytime_{i}.png')
 
 # time distribution per order (avg abs)
-timedist = Deliveries[['order','deliverytime','handlingtime','transporttime']].groupby('order',as_index=False).mean()
-timedist['idletime'] = timedist['deliverytime'] - timedist['handlingtime'] - timedist['transporttime']
-timedist = timedist[['order','idletime','transporttime','handlingtime']].sort_values(by=['idletime'])
+timedist = ontimedf[['order','idletime','transporttime','handlingtime']].sort_values(by=['idletime'])
 timedist.columns = ['order', 'Idle', 'Transport', 'Handling']
 plt.figure(figsize=(8,4))
 timedist.plot(x='order', kind='bar', stacked=True)
@@ -120,8 +108,10 @@ plt.tight_layout()
 plt.savefig(f'{output_folder}/timesegmentation.png')
 
 # delay
+histogram = summary['lateness_histogram']
+edges = histogram_edges(histogram)
 plt.figure(figsize=(4,5))
-plt.hist(Deliveries['delay'], density=True, bins=10)
+plt.hist(edges[:-1], bins=edges, weights=histogram['counts'], density=True)
 plt.title('Estimated distribution: Lateness')
 plt.ylabel('Density')
 plt.xlabel('Lateness (h)')
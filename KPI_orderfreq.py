@@ -1,15 +1,16 @@
 import matplotlib.pyplot as plt
-import pandas as pd
 import seaborn as sns
+from main.warmup import load_warmup_days
+from main.sweep_analytics import load_sweep, sweep_kpis, order_kpis, arc_kpis
 
 """
 This code calculates KPIs for different simulations of the same network and saves graphs in the same folder as the output data
 """
 
-# choose situation to visualize + warm-up period
+# choose situation to visualize (the warm-up period is chosen with KPI_warmup.py)
 folder = 'networks/network-test-volume'
 orderfreq_values = [0.1,0.3,0.5,0.75,1,1.25,1.5,1.75,2,2.5,3,3.5,4,5]
-warmup_days = 10
+warmup_days = load_warmup_days(folder)
 
 # set standard plot settings
 sns.set_style("white")
@@ -20,19 +21,18 @@ plt.rc('ytick', labelsize=10)
 plt.rc('legend', fontsize=10)
 plt.rcParams["figure.figsize"] = (6,4)
 
-fillrates = []
-totaltruckdrivingtimes = []
-for orderfreq_mult in orderfreq_values:
-    output_folder = f'{folder}/output/orderfreq_{orderfreq_mult}'
-    logfile_trucks = f'{output_folder}/transports.csv'
-    logfile_packages = f'{output_folder}/deliveries.csv'
-    Transports = pd.read_csv(logfile_trucks)
-    Transports = Transports.loc[Transports['endtime'] >= warmup_days*24]
-    Deliveries = pd.read_csv(logfile_packages)
-    Deliveries = Deliveries.loc[Deliveries['arrivaltime'] >= warmup_days*24]
-    Deliveries['delay'] = Deliveries['arrivaltime'] - Deliveries['duetime']
-    fillrates.append(Deliveries[Deliveries['delay'] <= 0].shape[0] / Deliveries.shape[0])
-    totaltruckdrivingtimes.append(sum(Transports['endtime']-Transports['starttime']))
+# load the traces of all multipliers in one table and calculate the KPIs of all runs, orders and arcs at once
+transports, deliveries = load_sweep({orderfreq_mult:f'{folder}/output/orderfreq_{orderfreq_mult}' for orderfreq_mult in orderfreq_values}, warmup_days)
+kpis = sweep_kpis(transports, deliveries)
+orders = order_kpis(deliveries)
+arcs = arc_kpis(transports)
+kpis.to_csv(f'{folder}/output/orderfreq_kpis.csv')
+orders.to_csv(f'{folder}/output/orderfreq_orders.csv', index=False)
+arcs.to_csv(f'{folder}/output/orderfreq_arcs.csv', index=False)
+print(kpis[['deliveries','ontime_fraction','deliverytime','transports','loadfraction','total_drivingtime']])
+
+fillrates = kpis['ontime_fraction'].to_numpy()
+totaltruckdrivingtimes = kpis['total_drivingtime'].to_numpy()
 
 plt.plot(orderfreq_values,fillrates,linewidth=1.5)
 plt.title('Estimated: Average on-time delivery fraction vs order frequency',fontsize=12)
@@ -47,4 +47,15 @@ plt.title('Estimated: Total driving time vs order frequency',fontsize=12)
 plt.ylabel('Driving time (h)')
 plt.xlabel('Order frequency multiplier')
 plt.tight_layout()
-plt.savefig(f'{folder}/output/totaldrivetime.png')
\ No newline at end of file
+plt.savefig(f'{folder}/output/totaldrivetime.png')
+
+# on-time delivery fraction per order
+plt.figure(figsize=(8,4))
+for order, group in orders.groupby('order'):
+    plt.plot(group['scenario'].astype(float), group['ontime_fraction'], linewidth=1.5, label=order)
+plt.title('Estimated: On-time delivery fraction per order vs order frequency',fontsize=12)
+plt.ylabel('On-time delivery fraction')
+plt.xlabel('Order frequency multiplier')
+plt.legend(loc='center left', bbox_to_anchor=(1, 0.5), fontsize=8)
+plt.tight_layout()
+plt.savefig(f'{folder}/output/orderfreq_orders.png')
\ No newline at end of file
@@ -1,14 +1,19 @@
 import matplotlib.pyplot as plt
 import pandas as pd
 import seaborn as sns
+import numpy as np
+from main.warmup import load_deliveries, daily_means, recommend_warmup_days, save_warmup_days
 
 """
-This code calculates and saves the warm-up graph in the same folder as the output data
+This code calculates and saves the warm-up graphs in the same folder as the output data.
+The recommended warm-up period (MSER-5) is saved in output/warmup.json of the network,
+which is used by KPI_onerun.py and KPI_orderfreq.py.
 """
 
 # choose situation to visualize
 folder = 'networks/network-europe-volume'
 orderfreq_mult = 1
+window = 5 # days of the moving window mean
 
 # set standard plot settings
 sns.set_style("white")
@@ -21,24 +26,16 @@ plt.rcParams["figure.figsize"] = (10,4)
 
 # load data
 output_folder = f'{folder}/output/orderfreq_{orderfreq_mult}'
-logfile_trucks = f'{output_folder}/transports.csv'
-logfile_packages = f'{output_folder}/deliveries.csv'
 parameters = pd.read_csv(f'{folder}/input/parameters.csv')
-Transports = pd.read_csv(logfile_trucks)
-Deliveries = pd.read_csv(logfile_packages)
-
-# calculate KPIs
-Transports['loadfraction'] = Transports['load']/Transports['capacity']
-Deliveries['deliverytime'] = Deliveries['arrivaltime'] - Deliveries['starttime']
-Deliveries['order'] = Deliveries['startnode'] + ' => ' + Deliveries['endnode']
-Deliveries['delay'] = Deliveries['arrivaltime'] - Deliveries['duetime']
+Deliveries = load_deliveries(output_folder)
 
 # avg time distribution for all orders over time
-timedistribution = pd.DataFrame(columns = ['Day','Idle','Transport','Handling'])
-for cutoff in range(1,round(max(Deliveries['arrivaltime'])/24)):
-    meantimes = Deliveries[['arrivaltime','deliverytime','handlingtime','transporttime']].loc[Deliveries['arrivaltime'] < cutoff*24].mean()
-    meantimes['idletime'] = meantimes['deliverytime'] - meantimes['handlingtime'] - meantimes['transporttime']
-    timedistribution.loc[timedistribution.shape[0]] = [cutoff,meantimes['idletime'],meantimes['transporttime'],meantimes['handlingtime']]
+days = round(max(Deliveries['arrivaltime'])/24)
+means = {name:daily_means(Deliveries['arrivaltime'], Deliveries[name], days-1) for name in ('deliverytime','transporttime','handlingtime')}
+timedistribution = pd.DataFrame({'Day': np.arange(1,days),
+                                 'Idle': means['deliverytime'] - means['transporttime'] - means['handlingtime'],
+                                 'Transport': means['transporttime'],
+                                 'Handling': means['handlingtime']})
 
 timedistribution.plot(x='Day', kind='bar', stacked=True,
     title='Estimated: Average delivery time distribution up to certain day')
@@ -47,4 +44,21 @@ plt.xlabel('Day')
 plt.ylabel('Average delivery time (h)')
 plt.legend(loc=4)
 plt.tight_layout()
-plt.savefig(f'{output_folder}/warmup.png')
\ No newline at end of file
+plt.savefig(f'{output_folder}/warmup.png')
+
+# automatic warm-up detection
+warmup_days = recommend_warmup_days(Deliveries['arrivaltime'], Deliveries['deliverytime'])
+save_warmup_days(folder, warmup_days, method='MSER-5', orderfreq_mult=orderfreq_mult)
+print(f'Recommended warm-up period = {warmup_days} days')
+
+# cumulative vs moving window mean delivery time
+plt.figure()
+plt.plot(timedistribution['Day'], means['deliverytime'], label='Cumulative mean')
+plt.plot(timedistribution['Day'], daily_means(Deliveries['arrivaltime'], Deliveries['deliverytime'], days-1, window), label=f'{window}-day moving mean')
+plt.axvline(warmup_days, color='r', linestyle='--', label='Recommended warm-up')
+plt.title('Estimated: Average delivery time up to certain day')
+plt.xlabel('Day')
+plt.ylabel('Average delivery time (h)')
+plt.legend(loc=4)
+plt.tight_layout()
+plt.savefig(f'{output_folder}/warmup_moving.png')
\ No newline at end of file
@@ -0,0 +1,38 @@
+from benchmarks.suite import run_benchmarks, load_results, compare_results
+from benchmarks.checks import check_fork_overrides
+from main.protocols import PROTOCOL_NAMES
+
+"""
+This script generates synthetic networks of increasing size, simulates every network with every protocol
+and saves the timings, events/s, peak memory and output size in benchmarks/results/<commit>.json.
+The results can be compared with the results of an earlier commit to find performance regressions.
+"""
+
+# networks: name => (generator, parameters), see benchmarks/networks.py
+networks = {
+    'grid-10x10': ('grid', {'rows': 10, 'columns': 10}),
+    'geometric-500': ('geometric', {'size': 500}),
+    'hubspoke-20x25': ('hubspoke', {'hubs': 20, 'spokes': 25}),
+    'geometric-2000': ('geometric', {'size': 2000}),
+}
+
+# protocols to benchmark, see main.protocols.get_protocol
+protocols = list(PROTOCOL_NAMES)
+
+# simulated days of every run
+sim_days = 10
+seed = 1
+
+# commit of earlier results to compare with (None = no comparison)
+compare_with = None
+
+# network on which forks with a parameter override are compared between the order generation modes (None = no check)
+fork_check_network = 'networks/network-belgium-volume'
+fork_check_overrides = {'orderfreq_mult': 2}
+
+if __name__ == '__main__':
+    results = run_benchmarks(networks, protocols, sim_days, seed)
+    if compare_with is not None:
+        compare_results(load_results(compare_with), results)
+    if fork_check_network is not None:
+        check_fork_overrides(fork_check_network, fork_check_overrides)
@@ -0,0 +1,51 @@
+from main.snapshot import warmup_snapshot, run_from_snapshot
+from main.trace_writer import read_trace
+import tempfile
+
+# order generation modes that are compared, see main.simulation
+ORDER_GENERATION_MODES = ('process', 'vectorized')
+
+def check_fork_overrides(folder, overrides=None, warmup_days=10, seed=1, tolerance=0.1):
+    """Checks that a parameter override of a run forked from a snapshot has the same effect with both order generation modes
+
+    For every order generation mode, the warm-up period is simulated once and saved in a
+    snapshot, and the snapshot is continued with the overrides. The containers created
+    after the snapshot are counted in the deliveries of the fork. The two modes use other
+    random streams, so the counts are not identical, but an override of orderfreq_mult or
+    lookahead must change them alike. Prints the counts and returns them with the result
+    of the check.
+
+    Parameters
+    ----------
+    folder : str
+        Path of the network folder, e.g. 'networks/network-belgium-volume'
+
+    overrides : dict, optional
+        Parameters that replace the values in parameters.csv in the forks. Defaults to {'orderfreq_mult': 2}.
+
+    warmup_days : float
+        Length of the warm-up period before the snapshot
+
+    seed : int
+        Seed of the warm-up runs
+
+    tolerance : float
+        Largest relative difference between the counts of the two modes that passes the check
+    """
+
+    overrides = {'orderfreq_mult': 2} if overrides is None else overrides
+    containers = dict()
+    with tempfile.TemporaryDirectory(prefix='fork_check_') as temp:
+        for mode in ORDER_GENERATION_MODES:
+            snapshot = f'{temp}/{mode}.pkl'
+            warmup_snapshot(folder, 1, f'{temp}/{mode}_warmup', snapshot, seed, days=warmup_days, overrides={'order_generation': mode})
+            run_from_snapshot(snapshot, f'{temp}/{mode}_fork', overrides={'order_generation': mode, **overrides}, verbose=False)
+            deliveries = read_trace(f'{temp}/{mode}_fork', 'deliveries')
+            containers[mode] = int((deliveries['starttime'] >= 24*warmup_days).sum())
+
+    process, vectorized = (containers[mode] for mode in ORDER_GENERATION_MODES)
+    difference = abs(vectorized-process) / max(process, 1)
+    passed = difference <= tolerance
+    print(f"Fork with {overrides}: {process} containers (process), {vectorized} containers (vectorized), "
+          f"difference {difference*100:.1f}% {'OK' if passed else 'FAILED'}")
+    return {'overrides': overrides, 'containers': containers, 'difference': difference, 'passed': passed}
@@ -0,0 +1,231 @@
+import networkx as nx
+import numpy as np
+import pandas as pd
+import os
+
+# coordinates of the synthetic networks: km per degree of latitude and longitude around (50N, 4E)
+ORIGIN = (50.0, 4.0)
+KM_PER_DEGREE = (111.0, 71.3)
+
+def _connect(G, pos):
+    """Connects every component of a graph to the nearest node of the largest component"""
+
+    components = sorted(nx.connected_components(G), key=len, reverse=True)
+    main = list(components[0])
+    for component in components[1:]:
+        main_pos = np.array([pos[name] for name in main])
+        best = None
+        for name in component:
+            distance = np.hypot(*(main_pos - pos[name]).T)
+            idx = int(np.argmin(distance))
+            if best is None or distance[idx] < best[0]:
+                best = (distance[idx], name, main[idx])
+        G.add_edge(best[1], best[2])
+        main.extend(component)
+
+def _orders(names, num_orders, interval_range, rng):
+    """Returns an orders DataFrame with random (source, target) pairs of different nodes"""
+
+    pairs = set()
+    while len(pairs) < min(num_orders, len(names)*(len(names)-1)):
+        source, target = rng.choice(len(names), 2, replace=False)
+        pairs.add((names[source], names[target]))
+    pairs = sorted(pairs)
+    intervals = rng.integers(interval_range[0], interval_range[1]+1, len(pairs))
+    return pd.DataFrame({'source': [source for source,_ in pairs], 'target': [target for _,target in pairs], 'interval': intervals})
+
+def _network(G, pos, num_orders, interval_range, speed, numforklifts, numtrucks, rng, order_nodes=None):
+    """Returns the nodes, edges and orders DataFrames of a graph with positions in km"""
+
+    names = list(G.nodes)
+    nodes = pd.DataFrame({'name': names,
+                          'lat': [ORIGIN[0] + pos[name][1]/KM_PER_DEGREE[0] for name in names],
+                          'lon': [ORIGIN[1] + pos[name][0]/KM_PER_DEGREE[1] for name in names],
+                          'numforklifts': numforklifts,
+                          'numtrucks': numtrucks})
+
+    # driving time in hours, rounded to a quarter of an hour
+    edges = pd.DataFrame([(source, target, max(0.25, round(4*np.hypot(*(pos[source]-pos[target]))/speed)/4))
+                          for source, target in G.edges], columns=['source','target','weight'])
+
+    orders = _orders(order_nodes or names, num_orders, interval_range, rng)
+    return nodes, edges, orders
+
+def grid_network(rows, columns, spacing=50, num_orders=None, interval_range=(1,4), speed=70, numforklifts=2, numtrucks=3, seed=0):
+    """Returns the nodes, edges and orders DataFrames of a rectangular grid network
+
+    Node R<r>C<c> is connected to its horizontal and vertical neighbours.
+
+    Parameters
+    ----------
+    rows, columns : int
+        Size of the grid
+
+    spacing : float
+        Distance between neighbouring nodes in km
+
+    num_orders : int, optional
+        Number of orders between random pairs of nodes. Defaults to the number of nodes.
+
+    interval_range : tuple
+        Smallest and largest order interval in hours
+
+    speed : float
+        Driving speed in km/h, used for the edge weights
+
+    numforklifts, numtrucks : int
+        Number of forklifts and trucks at every node
+
+    seed : int
+        Seed of the orders
+    """
+
+    rng = np.random.default_rng(seed)
+    G = nx.relabel_nodes(nx.grid_2d_graph(rows, columns), lambda rc: f'R{rc[0]}C{rc[1]}')
+    pos = {f'R{r}C{c}': np.array([c*spacing, r*spacing], dtype=float) for r in range(rows) for c in range(columns)}
+    return _network(G, pos, num_orders or rows*columns, interval_range, speed, numforklifts, numtrucks, rng)
+
+def random_geometric_network(size, radius=None, area=None, num_orders=None, interval_range=(1,4), speed=70,
+                             numforklifts=2, numtrucks=3, seed=0):
+    """Returns the nodes, edges and orders DataFrames of a random geometric network
+
+    Nodes N<i> are placed uniformly in a square and connected when their distance is at
+    most radius. Components are connected to the largest component by their nearest nodes.
+
+    Parameters
+    ----------
+    size : int
+        Number of nodes
+
+    radius : float, optional
+        Connection radius in km. Defaults to a radius with on average about 5 neighbours.
+
+    area : float, optional
+        Side of the square in km. Defaults to 40 km times the square root of size.
+
+    num_orders : int, optional
+        Number of orders between random pairs of nodes. Defaults to the number of nodes.
+
+    interval_range : tuple
+        Smallest and largest order interval in hours
+
+    speed : float
+        Driving speed in km/h, used for the edge weights
+
+    numforklifts, numtrucks : int
+        Number of forklifts and trucks at every node
+
+    seed : int
+        Seed of the node positions and the orders
+    """
+
+    rng = np.random.default_rng(seed)
+    area = area or 40*np.sqrt(size)
+    radius = radius or area*np.sqrt(5/(np.pi*size))
+    points = rng.uniform(0, area, (size, 2))
+    G = nx.random_geometric_graph(size, radius/area, pos={idx:points[idx]/area for idx in range(size)})
+    G = nx.relabel_nodes(G, lambda idx: f'N{idx}')
+    pos = {f'N{idx}': points[idx] for idx in range(size)}
+    _connect(G, pos)
+    return _network(G, pos, num_orders or size, interval_range, speed, numforklifts, numtrucks, rng)
+
+def hub_and_spoke_network(hubs, spokes, area=None, spoke_radius=40, hub_degree=3, num_orders=None, interval_range=(1,4),
+                          speed=70, numforklifts=2, numtrucks=3, seed=0):
+    """Returns the nodes, edges and orders DataFrames of a hub-and-spoke network
+
+    Hubs H<i> are placed uniformly in a square and connected to their hub_degree nearest
+    hubs. Spokes H<i>S<j> are placed around their hub and only connected to it. The orders
+    are between random pairs of spokes.
+
+    Parameters
+    ----------
+    hubs : int
+        Number of hubs
+
+    spokes : int
+        Number of spokes per hub
+
+    area : float, optional
+        Side of the square of the hubs in km. Defaults to 150 km times the square root of hubs.
+
+    spoke_radius : float
+        Largest distance between a spoke and its hub in km
+
+    hub_degree : int
+        Number of nearest hubs every hub is connected to
+
+    num_orders : int, optional
+        Number of orders between random pairs of spokes. Defaults to the number of spokes.
+
+    interval_range : tuple
+        Smallest and largest order interval in hours
+
+    speed : float
+        Driving speed in km/h, used for the edge weights
+
+    numforklifts, numtrucks : int
+        Number of forklifts and trucks at every node
+
+    seed : int
+        Seed of the node positions and the orders
+    """
+
+    rng = np.random.default_rng(seed)
+    area = area or 150*np.sqrt(hubs)
+    G = nx.Graph()
+    pos = dict()
+
+    points = rng.uniform(0, area, (hubs, 2))
+    for idx in range(hubs):
+        pos[f'H{idx}'] = points[idx]
+        G.add_node(f'H{idx}')
+    for idx in range(hubs):
+        distance = np.hypot(*(points - points[idx]).T)
+        for other in np.argsort(distance)[1:hub_degree+1]:
+            G.add_edge(f'H{idx}', f'H{other}')
+    _connect(G, pos)
+
+    spoke_names = []
+    for idx in range(hubs):
+        angles = rng.uniform(0, 2*np.pi, spokes)
+        radii = rng.uniform(spoke_radius/4, spoke_radius, spokes)
+        for spoke in range(spokes):
+            name = f'H{idx}S{spoke}'
+            pos[name] = points[idx] + radii[spoke]*np.array([np.cos(angles[spoke]), np.sin(angles[spoke])])
+            G.add_edge(f'H{idx}', name)
+            spoke_names.append(name)
+
+    return _network(G, pos, num_orders or len(spoke_names), interval_range, speed, numforklifts, numtrucks, rng, spoke_names)
+
+def write_network(folder, nodes, edges, orders, sim_days=30, truck_storage_capacity=3, handling_time=0.1,
+                  lookahead=0, protocol_interval=0.5, **optional):
+    """Saves a network in the input format of the simulation: folder/input/{parameters,nodes,edges,orders}.csv
+
+    Parameters
+    ----------
+    folder : str
+        Path of the network folder
+
+    nodes, edges, orders : Pandas DataFrame
+        Input data of the network, e.g. returned by grid_network
+
+    sim_days, truck_storage_capacity, handling_time, lookahead, protocol_interval
+        Columns of parameters.csv
+
+    **optional
+        Optional columns of parameters.csv, e.g. order_generation='vectorized'
+    """
+
+    os.makedirs(f'{folder}/input', exist_ok=True)
+    parameters = pd.DataFrame([{'sim_days': sim_days, 'truck_storage_capacity': truck_storage_capacity,
+                                'handling_time': handling_time, 'orderfreq_mult': 1, 'lookahead': lookahead,
+                                'protocol_interval': protocol_interval, **optional}])
+    parameters.to_csv(f'{folder}/input/parameters.csv', index=False)
+    nodes.to_csv(f'{folder}/input/nodes.csv', index=False)
+    edges.to_csv(f'{folder}/input/edges.csv', index=False)
+    orders.to_csv(f'{folder}/input/orders.csv', index=False)
+
+# generators of the benchmark networks by kind
+GENERATORS = {'grid': grid_network,
+              'geometric': random_geometric_network,
+              'hubspoke': hub_and_spoke_network}
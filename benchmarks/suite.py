@@ -0,0 +1,232 @@
+from benchmarks.networks import GENERATORS, write_network
+from main.simulation import Simulation, load_inputs
+from main.init_graph import init_graph
+from main.trace_writer import init_trace_writers
+from main.profiling import CountingEnvironment
+from main.protocols import PROTOCOL_NAMES, get_protocol
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import subprocess
+import platform
+import resource
+import tempfile
+import shutil
+import json
+import time
+import sys
+import gc
+import os
+
+# folder in which the results are saved, one file per commit
+RESULTS_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+def _peak_rss():
+    """Returns the peak resident memory of the current process in MB"""
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak/2**20 if sys.platform == 'darwin' else peak/2**10
+
+def _folder_size(folder):
+    """Returns the total size of the files in a folder in bytes"""
+
+    return sum(os.path.getsize(os.path.join(path, name)) for path, _, names in os.walk(folder) for name in names)
+
+def git_revision(folder=None):
+    """Returns the short hash of the checked out commit, with '-dirty' if there are uncommitted changes
+
+    Parameters
+    ----------
+    folder : str, optional
+        Folder in the git repository. Defaults to the repository of this package.
+    """
+
+    folder = folder or os.path.dirname(os.path.abspath(__file__))
+    try:
+        revision = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=folder, capture_output=True, text=True, check=True).stdout.strip()
+        status = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=folder, capture_output=True, text=True, check=True).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+    return revision + ('-dirty' if status.strip() else '')
+
+def benchmark_case(folder, protocol, seed=1, overrides=None):
+    """Simulates one network with one protocol and returns its timings, throughput, peak memory and output size
+
+    The time of init_graph (including the routing table) is measured separately from
+    the setup and the run of the simulation. The events are counted with a
+    CountingEnvironment. The peak memory is the peak resident memory of the process,
+    so every case should run in a fresh process, see run_benchmarks.
+
+    Parameters
+    ----------
+    folder : str
+        Path of the network folder
+
+    protocol : str
+        Name of the protocol, see main.protocols.get_protocol
+
+    seed : int
+        Seed of the run
+
+    overrides : dict, optional
+        Parameters that replace the values in parameters.csv, e.g. {'sim_days': 10}
+    """
+
+    gc.collect()
+    baseline_rss = _peak_rss()
+    parameters, nodes, edges, orders = load_inputs(folder)
+    for name, value in (overrides or dict()).items():
+        parameters[name] = value
+    output_folder = tempfile.mkdtemp(prefix='benchmark_')
+
+    try:
+        # init_graph on its own
+        logfile_trucks, logfile_containers = init_trace_writers(output_folder)
+        start = time.perf_counter()
+        G = init_graph(CountingEnvironment(), parameters, nodes, edges, logfile_trucks, logfile_containers)
+        init_graph_time = time.perf_counter() - start
+        logfile_trucks.close()
+        logfile_containers.close()
+        del G
+        gc.collect()
+
+        # complete run
+        start = time.perf_counter()
+        simulation = Simulation(folder, float(parameters['orderfreq_mult'].iloc[0]), output_folder, seed, get_protocol(protocol, edges),
+                                environment=CountingEnvironment, overrides={'warmup_days': 0, **(overrides or dict())})
+        setup_time = time.perf_counter() - start
+        try:
+            start = time.perf_counter()
+            simulation.run()
+            run_time = time.perf_counter() - start
+        finally:
+            simulation.close()
+        wall_time = setup_time + run_time
+        summary = simulation.kpis.summary()
+        output_bytes = _folder_size(output_folder)
+
+    finally:
+        shutil.rmtree(output_folder, ignore_errors=True)
+
+    events = simulation.env.processed_events
+    return {'network': os.path.basename(os.path.normpath(folder)), 'protocol': protocol,
+            'nodes': len(nodes), 'edges': len(edges), 'orders': len(orders), 'sim_days': float(simulation.parameters['sim_days'].iloc[0]),
+            'init_graph_time': init_graph_time, 'setup_time': setup_time, 'run_time': run_time, 'wall_time': wall_time,
+            'events': events, 'events_per_s': events/run_time if run_time else None,
+            'sim_hours_per_s': simulation.sim_time/run_time if run_time else None,
+            'baseline_rss_mb': baseline_rss, 'peak_rss_mb': _peak_rss(), 'output_bytes': output_bytes,
+            'transports': summary['transports'], 'deliveries': summary['deliveries']}
+
+def run_benchmarks(networks, protocols=PROTOCOL_NAMES, sim_days=None, seed=1, results_folder=RESULTS_FOLDER, isolate=True):
+    """Generates the benchmark networks, simulates every network with every protocol and saves the results.
+
+    The results of all cases are saved in results_folder/<commit>.json together with the
+    commit, the date and the Python and platform versions, so the results of different
+    commits can be compared with compare_results. Returns the saved dictionary.
+
+    Parameters
+    ----------
+    networks : dict
+        name => (kind, keyword arguments of the generator), with kind a key of GENERATORS,
+        e.g. {'grid-10x10': ('grid', {'rows': 10, 'columns': 10})}
+
+    protocols : list
+        Names of the protocols, see main.protocols.get_protocol
+
+    sim_days : float, optional
+        Simulated days of every case. Defaults to the sim_days of write_network.
+
+    seed : int
+        Seed of every run
+
+    results_folder : str
+        Folder in which the results are saved
+
+    isolate : bool
+        Run every case in a fresh worker process, so the peak memory of the cases can be compared
+    """
+
+    revision = git_revision()
+    cases = []
+    with tempfile.TemporaryDirectory(prefix='benchmark_networks_') as temp:
+        jobs = []
+        for name, (kind, kwargs) in networks.items():
+            folder = os.path.join(temp, name)
+            start = time.perf_counter()
+            write_network(folder, *GENERATORS[kind](**kwargs), **({'sim_days': sim_days} if sim_days is not None else {}))
+            print(f'{name}: network generated in {time.perf_counter()-start:.1f}s')
+            jobs.extend((folder, protocol) for protocol in protocols)
+
+        for idx, (folder, protocol) in enumerate(jobs, 1):
+            label = f'{os.path.basename(folder)} {protocol}'
+            try:
+                if isolate:
+                    context = multiprocessing.get_context('spawn')
+                    with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                        case = pool.submit(benchmark_case, folder, protocol, seed).result()
+                else:
+                    case = benchmark_case(folder, protocol, seed)
+            except Exception as error:
+                case = {'network': os.path.basename(folder), 'protocol': protocol, 'error': repr(error)}
+                print(f'[{idx}/{len(jobs)}] {label} FAILED ({case["error"]})')
+            else:
+                print(f"[{idx}/{len(jobs)}] {label}: init_graph {case['init_graph_time']:.2f}s, run {case['run_time']:.2f}s, "
+                      f"{case['events_per_s']:.0f} events/s, peak memory {case['peak_rss_mb']:.0f} MB, "
+                      f"output {case['output_bytes']/2**20:.1f} MB")
+            cases.append(case)
+
+    results = {'commit': revision, 'date': time.strftime('%Y-%m-%d %H:%M:%S'), 'python': platform.python_version(),
+               'platform': platform.platform(), 'seed': seed, 'cases': cases}
+    os.makedirs(results_folder, exist_ok=True)
+    path = os.path.join(results_folder, f'{revision}.json')
+    with open(path, 'w') as file:
+        json.dump(results, file, indent=1)
+    print(f'Results saved in {path}')
+    return results
+
+def load_results(commit, results_folder=RESULTS_FOLDER):
+    """Returns the saved benchmark results of a commit, see run_benchmarks"""
+
+    with open(os.path.join(results_folder, f'{commit}.json')) as file:
+        return json.load(file)
+
+def compare_results(baseline, current, threshold=0.1):
+    """Prints the change of the timings, throughput and memory of every case between two benchmark results.
+
+    Changes that are worse than threshold (relative) are marked as regressions.
+    Returns the list of regressions as (network, protocol, metric, baseline, current) tuples.
+
+    Parameters
+    ----------
+    baseline, current : dict
+        Results of run_benchmarks or load_results
+
+    threshold : float
+        Relative change above which a worse value is a regression, e.g. 0.1 for 10%
+    """
+
+    # metrics and whether higher values are better
+    metrics = {'init_graph_time': False, 'run_time': False, 'wall_time': False, 'events_per_s': True,
+               'peak_rss_mb': False, 'output_bytes': False}
+    old_cases = {(case['network'], case['protocol']):case for case in baseline['cases'] if 'error' not in case}
+    regressions = []
+
+    print(f"Comparing {current['commit']} with {baseline['commit']}")
+    for case in current['cases']:
+        key = (case['network'], case['protocol'])
+        if 'error' in case or key not in old_cases:
+            continue
+        message = f'{key[0]} {key[1]}:'
+        for metric, higher_is_better in metrics.items():
+            old, new = old_cases[key][metric], case[metric]
+            if not old or new is None:
+                continue
+            change = new/old - 1
+            worse = -change if higher_is_better else change
+            message += f' {metric} {change*100:+.1f}%'
+            if worse > threshold:
+                message += ' (!)'
+                regressions.append((*key, metric, old, new))
+        print(message)
+
+    print(f'{len(regressions)} regression(s) above {threshold*100:.0f}%')
+    return regressions
@@ -0,0 +1,113 @@
+import math
+import numpy as np
+
+def _betacf(a, b, x):
+    """Continued fraction of the incomplete beta function (modified Lentz method)"""
+
+    tiny = 1e-300
+    c, d = 1.0, 1 - (a+b)*x/(a+1)
+    d = 1/(d if abs(d) > tiny else tiny)
+    h = d
+    for m in range(1, 301):
+        # even step
+        aa = m*(b-m)*x/((a+2*m-1)*(a+2*m))
+        d = 1 + aa*d
+        d = 1/(d if abs(d) > tiny else tiny)
+        c = 1 + aa/c
+        c = c if abs(c) > tiny else tiny
+        h *= d*c
+        # odd step
+        aa = -(a+m)*(a+b+m)*x/((a+2*m)*(a+2*m+1))
+        d = 1 + aa*d
+        d = 1/(d if abs(d) > tiny else tiny)
+        c = 1 + aa/c
+        c = c if abs(c) > tiny else tiny
+        delta = d*c
+        h *= delta
+        if abs(delta-1) < 1e-15:
+            break
+    return h
+
+def _betainc(a, b, x):
+    """Regularized incomplete beta function I_x(a,b)"""
+
+    if x <= 0:
+        return 0.0
+    if x >= 1:
+        return 1.0
+    front = math.exp(math.lgamma(a+b) - math.lgamma(a) - math.lgamma(b) + a*math.log(x) + b*math.log(1-x))
+    if x < (a+1)/(a+b+2):
+        return front*_betacf(a, b, x)/a
+    return 1 - front*_betacf(b, a, 1-x)/b
+
+def t_cdf(t, df):
+    """Returns the cumulative distribution function of Student's t-distribution
+
+    Parameters
+    ----------
+    t : float
+        Value of the t-statistic
+
+    df : float
+        Degrees of freedom
+    """
+
+    tail = 0.5*_betainc(df/2, 0.5, df/(df+t*t))
+    return 1-tail if t > 0 else tail
+
+def t_quantile(p, df):
+    """Returns the p-quantile of Student's t-distribution, e.g. t_quantile(0.975, 9) = 2.262
+
+    Parameters
+    ----------
+    p : float
+        Probability, between 0 and 1
+
+    df : float
+        Degrees of freedom
+    """
+
+    if p == 0.5:
+        return 0.0
+    if p < 0.5:
+        return -t_quantile(1-p, df)
+
+    # bracket the quantile and bisect
+    low, high = 0.0, 1.0
+    while t_cdf(high, df) < p:
+        low, high = high, 2*high
+    for _ in range(200):
+        middle = (low+high)/2
+        if t_cdf(middle, df) < p:
+            low = middle
+        else:
+            high = middle
+        if high-low < 1e-12*max(1, high):
+            break
+    return (low+high)/2
+
+def confidence_interval(values, level=0.95):
+    """Returns the mean of independent samples and the half-width of its t-confidence interval
+
+    Parameters
+    ----------
+    values : list
+        Independent samples, e.g. one KPI value per replication
+
+    level : float
+        Confidence level of the interval
+    """
+
+    values = np.asarray(values, dtype=float)
+    mean = float(values.mean())
+    if len(values) < 2:
+        return mean, math.inf
+    stderr = values.std(ddof=1)/math.sqrt(len(values))
+    return mean, float(t_quantile((1+level)/2, len(values)-1)*stderr)
+
+def relative_halfwidth(mean, halfwidth):
+    """Returns the half-width of a confidence interval relative to its mean"""
+
+    if mean == 0:
+        return 0.0 if halfwidth == 0 else math.inf
+    return halfwidth/abs(mean)
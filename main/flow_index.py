@@ -0,0 +1,101 @@
+from functools import lru_cache
+import numpy as np
+import pandas as pd
+
+class FlowIndex():
+
+    def __init__(self, transports, sim_time, resolution=24, cache_size=256):
+        """Index of the container and truck flows per arc, to get the flows of any time window without filtering the transports
+
+        The transports are sorted by arc and end time once, with the cumulative load
+        over the sorted rows. The flows of an arc in a time window are then differences of
+        the cumulative load (containers) and of the row positions (trucks) at the bounds
+        of the window. The positions of every arc at every multiple of resolution (the
+        days) are precomputed, so windows on the day grid (the steps of the time slider)
+        take O(arcs). Other bounds are searched per arc, O(arcs log rows). The flows of
+        the last cache_size windows are memoized.
+
+        A transport is in the window (start, end) if start < endtime < end.
+
+        Parameters
+        ----------
+        transports : Pandas DataFrame
+            Transports trace of a run, see main.trace_writer.read_trace
+
+        sim_time : float
+            Simulated time of the run in hours
+
+        resolution : float
+            Time step of the precomputed grid in hours
+
+        cache_size : int
+            Number of memoized windows
+        """
+
+        arcs = transports['startnode'].astype(str) + ' => ' + transports['endnode'].astype(str)
+        codes, uniques = pd.factorize(arcs)
+        self.arcs = list(uniques)
+        _, first = np.unique(codes, return_index=True)
+        self.startnodes = transports['startnode'].to_numpy()[first].tolist()
+        self.endnodes = transports['endnode'].to_numpy()[first].tolist()
+
+        endtime = transports['endtime'].to_numpy(dtype=float)
+        order = np.lexsort((endtime, codes))
+        self.endtime = endtime[order]
+        self.cumload = np.concatenate(([0], np.cumsum(transports['load'].to_numpy()[order])))
+        self.ptr = np.searchsorted(codes[order], np.arange(len(self.arcs)+1))
+
+        # positions of every arc at the grid times, strictly before (left) and up to (right)
+        self.grid = {time:column for column, time in enumerate(np.arange(0, sim_time+resolution, resolution).tolist())}
+        times = np.array(list(self.grid), dtype=float)
+        self.left = self._positions(times, 'left')
+        self.right = self._positions(times, 'right')
+
+        self.flows = lru_cache(maxsize=cache_size)(self._flows)
+
+    def __repr__(self):
+        return f'FlowIndex ({len(self.arcs)} arcs, {len(self.endtime)} transports)'
+
+    def _positions(self, times, side):
+        """Returns the positions of the first row of every arc with endtime >= (left) or > (right) each time, shape (arcs, times)"""
+
+        positions = np.empty((len(self.arcs), len(times)), dtype=np.int64)
+        for arc in range(len(self.arcs)):
+            start, end = self.ptr[arc], self.ptr[arc+1]
+            positions[arc] = start + np.searchsorted(self.endtime[start:end], times, side)
+        return positions
+
+    def _bound(self, time, side):
+        column = self.grid.get(float(time))
+        if column is not None:
+            return (self.left if side == 'left' else self.right)[:,column]
+        return self._positions(np.array([time], dtype=float), side)[:,0]
+
+    def window(self, start, end):
+        """Returns the number of containers and trucks of every arc (in the order of arcs) that arrived in the window (start, end)
+
+        Parameters
+        ----------
+        start, end : float
+            Bounds of the time window in hours
+        """
+
+        low = self._bound(start, 'right')
+        high = np.maximum(self._bound(end, 'left'), low)
+        return self.cumload[high] - self.cumload[low], high - low
+
+    def _flows(self, start, end, flow):
+        """Returns the (startnode, endnode, weight) of the arcs with a positive flow in the window (start, end), memoized as flows
+
+        Parameters
+        ----------
+        start, end : float
+            Bounds of the time window in hours
+
+        flow : str
+            'Containers' for the number of containers, 'Trucks' for the number of trucks
+        """
+
+        containers, trucks = self.window(start, end)
+        weights = containers if flow == 'Containers' else trucks
+        return tuple((self.startnodes[arc], self.endnodes[arc], weights[arc].item()) for arc in np.flatnonzero(weights > 0))
@@ -0,0 +1,45 @@
+from main.parameters import get_parameter
+import random
+
+# supported handling time distributions
+HANDLING_DISTRIBUTIONS = ('constant', 'exponential', 'uniform')
+
+def handling_distribution(parameters, rng=random):
+    """Returns the handling time distribution of the trucks, or None for a constant handling time
+
+    The distribution is a function that returns a list with the handling times of a given
+    number of containers. It is configured with the optional parameters:
+
+    - handling_distribution: 'constant' (default), 'exponential' or 'uniform'
+    - handling_spread: relative half-width of the uniform distribution (default 0.5)
+
+    All distributions have mean handling_time.
+
+    Parameters
+    ----------
+    parameters : Pandas DataFrame
+        Parameters of the simulation
+
+    rng : random.Random
+        Random number generator of the handling times
+    """
+
+    handling_time = float(parameters['handling_time'])
+    distribution = str(get_parameter(parameters, 'handling_distribution', 'constant'))
+    if distribution not in HANDLING_DISTRIBUTIONS:
+        raise ValueError(f"handling_distribution must be one of {HANDLING_DISTRIBUTIONS}, not '{distribution}'")
+
+    if distribution == 'constant':
+        return None
+
+    if distribution == 'exponential':
+        def handling_times(amount):
+            return [rng.expovariate(1/handling_time) for _ in range(amount)]
+
+    elif distribution == 'uniform':
+        spread = float(get_parameter(parameters, 'handling_spread', 0.5))
+        low, high = handling_time*(1-spread), handling_time*(1+spread)
+        def handling_times(amount):
+            return [rng.uniform(low, high) for _ in range(amount)]
+
+    return handling_times
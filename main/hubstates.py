@@ -0,0 +1,77 @@
+from operator import attrgetter
+import numpy as np
+import math
+
+# columns of the hub states trace
+HUBSTATE_COLUMNS = [('time','d'),('node','str'),('arrived','q'),('queued','q'),('forklift_queue','q'),('forklifts_busy','q'),
+                    ('visiting_trucks','q'),('own_trucks','q')]
+
+# gauges of the nodes, in the order of the columns after time and node
+GAUGES = [name for name,_ in HUBSTATE_COLUMNS[2:]]
+
+_items = attrgetter('items')
+
+class HubSampler():
+
+    def __init__(self, env, G, interval, start_time, end_time):
+        """Samples the state of every node at a fixed interval into preallocated arrays
+
+        The gauges of a node are:
+
+        - arrived: containers in arrived_containers, not yet sorted by the protocol
+        - queued: containers in the queues of the protocol (presort or heaps)
+        - forklift_queue: trucks waiting for a forklift
+        - forklifts_busy: forklifts loading or unloading a truck
+        - visiting_trucks, own_trucks: trucks in available_trucks[0] and [1]
+
+        The samples are taken at the multiples of interval between start_time and
+        end_time, so runs that start from a snapshot sample at the same times. They are
+        written to the hubstates trace with write.
+
+        Parameters
+        ----------
+        env : SimPy Environment
+            The simulation environment of the model
+
+        G : NetworkX Graph
+            State Graph of the simulation
+
+        interval : float
+            Time between two samples in hours
+
+        start_time, end_time : float
+            Simulated time at which the run starts and ends
+        """
+
+        self.env = env
+        self.nodes = G.graph['model'].nodes
+        self.times = np.arange(math.ceil(round(start_time/interval, 6))*interval, end_time, interval)
+        self.values = np.zeros((len(GAUGES), len(self.times), len(self.nodes)), dtype=np.int32)
+        self.samples = 0
+
+    def __repr__(self):
+        return f'HubSampler ({self.samples}/{len(self.times)} samples of {len(self.nodes)} nodes)'
+
+    def sample(self):
+        """SimPy process that records the gauges of all nodes at every sample time"""
+
+        nodes = self.nodes
+        arrived, queued, forklift_queue, forklifts_busy, visiting_trucks, own_trucks = self.values
+        for k, time in enumerate(self.times):
+            if time > self.env.now:
+                yield self.env.timeout(time-self.env.now)
+            arrived[k] = [len(node.arrived_containers) for node in nodes]
+            queued[k] = [sum(map(len, map(_items, node.queues.values()))) for node in nodes]
+            forklift_queue[k] = [len(node.forklifts.queue) for node in nodes]
+            forklifts_busy[k] = [node.forklifts.count for node in nodes]
+            visiting_trucks[k] = [len(node.available_trucks[0]) for node in nodes]
+            own_trucks[k] = [len(node.available_trucks[1]) for node in nodes]
+            self.samples = k+1
+
+    def write(self, logfile):
+        """Writes the recorded samples to a trace writer with the HUBSTATE_COLUMNS, one record per sample and node"""
+
+        size = len(self.nodes)
+        names = [node.name for node in self.nodes]
+        for k in range(self.samples):
+            logfile.write_many(np.full(size, self.times[k]), names, *self.values[:,k])
@@ -1,14 +1,23 @@
 import networkx as nx
 from main.sim_classes import Truck, Node
-import logging
+from main.routing import RoutingTable
+from main.network_model import NetworkModel
+from main.handling import handling_distribution
+from main.profiling import timed
+from main import tracing
+import random
 
-def init_graph(env,parameters,nodes,edges,logfile_trucks,logfile_containers):
+def init_graph(env,parameters,nodes,edges,logfile_trucks,logfile_containers,streams=None):
     """Returns a NetworkX State Graph.
 
     Each node in the State Graph has two attributes:
     'node': An instance of the Node class
     'trucks': A list of Truck class instances
 
+    The graph itself has two attributes:
+    'model': A NetworkModel with the nodes, trucks and edge weights indexed by integer IDs
+    'routing': A RoutingTable with the shortest paths between all nodes, shared by all protocols
+
     Parameters
     ----------
     env : SimPy Environment
@@ -23,14 +32,19 @@ def init_graph(env,parameters,nodes,edges,logfile_trucks,logfile_containers):
     edges : Pandas DataFrame
         An edge list representation of a graph
 
-    logfile_trucks : Logging logger
-        Logger for information on truck trips
+    logfile_trucks : TraceWriter
+        Output trace for information on truck trips
+
+    logfile_containers : TraceWriter
+        Output trace for information on arrived containers
 
-    logfile_containers : Logging logger
-        Logger for information on arrived containers
+    streams : RandomStreams, optional
+        Seed hierarchy of the run. Every truck gets its own stream of handling times.
+        All trucks share the global random module when None.
     """
 
-    logging.debug('%.2f | init_graph | initializing state graph...', env.now)
+    if tracing.enabled:
+        tracing.emit(env.now, 'init_graph_start')
 
     ## load parameters
     truck_max_capacity = int(parameters['truck_storage_capacity'])
@@ -42,10 +56,22 @@ def init_graph(env,parameters,nodes,edges,logfile_trucks,logfile_containers):
     ## initialize classes in state graph
     for idx in range(nodes.shape[0]):
         name,_,_,numforklifts,numtrucks = nodes.iloc[idx]
-        trucks = [Truck(env,f'{name}_{x}',logfile_trucks,truck_max_capacity,handling_time) for x in range(int(numtrucks))]
+        trucks = []
+        for x in range(int(numtrucks)):
+            rng = random if streams is None else streams.random('handling', idx, x)
+            handling_times = handling_distribution(parameters, rng)
+            trucks.append(Truck(env,f'{name}_{x}',logfile_trucks,truck_max_capacity,handling_time,handling_times,name))
         G.nodes[name]['trucks'] = trucks
         G.nodes[name]['node'] = Node(env,name,numforklifts,trucks,logfile_containers)
 
-    logging.debug('%.2f | init_graph | state graph initialized', env.now)
+    ## compile the integer-indexed network model used on the hot path
+    G.graph['model'] = NetworkModel(G)
+
+    ## calculate shortest paths between all nodes
+    with timed(env, 'routing table', 'all'):
+        G.graph['routing'] = RoutingTable(G)
+
+    if tracing.enabled:
+        tracing.emit(env.now, 'init_graph_end')
 
     return G
\ No newline at end of file
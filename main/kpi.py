@@ -0,0 +1,281 @@
+import numpy as np
+import pandas as pd
+import json
+from main.trace_writer import iter_trace
+
+# z-value of the 95% confidence intervals
+Z_95 = 1.96
+
+def proportion_ci(successes, samples):
+    """Returns a fraction and its 95% confidence interval (normal approximation), or None without samples
+
+    Parameters
+    ----------
+    successes : int
+        Number of successes, e.g. on-time deliveries
+
+    samples : int
+        Number of samples, e.g. deliveries
+    """
+
+    if not samples:
+        return None, None
+    fraction = successes/samples
+    stdev = np.sqrt(fraction*(1-fraction)/samples)
+    return fraction, [fraction-Z_95*stdev, fraction+Z_95*stdev]
+
+def mean_ci(total, total_squares, samples):
+    """Returns a mean and its 95% confidence interval from the sum and the sum of squares of the samples
+
+    Parameters
+    ----------
+    total : float
+        Sum of the samples
+
+    total_squares : float
+        Sum of the squared samples
+
+    samples : int
+        Number of samples
+    """
+
+    if not samples:
+        return None, None
+    mean = total/samples
+    if samples < 2:
+        return mean, [mean, mean]
+    variance = max(total_squares - samples*mean**2, 0)/(samples-1)
+    halfwidth = Z_95*np.sqrt(variance/samples)
+    return mean, [mean-halfwidth, mean+halfwidth]
+
+class Histogram():
+
+    def __init__(self, bin_width):
+        """Histogram with bins of a fixed width and an unbounded range, updated in chunks
+
+        Parameters
+        ----------
+        bin_width : float
+            Width of the bins, bin i covers [i*bin_width, (i+1)*bin_width)
+        """
+
+        self.bin_width = bin_width
+        self.counts = dict()
+
+    def __repr__(self):
+        return f'Histogram ({sum(self.counts.values())} samples)'
+
+    def add(self, values):
+        """Adds an array of samples to the histogram"""
+
+        if not len(values):
+            return
+        bins, counts = np.unique(np.floor(np.asarray(values)/self.bin_width).astype(np.int64), return_counts=True)
+        for b, count in zip(bins.tolist(), counts.tolist()):
+            self.counts[b] = self.counts.get(b, 0) + count
+
+    def to_dict(self):
+        """Returns the start of the first bin, the bin width and the counts of all consecutive bins"""
+
+        if not self.counts:
+            return {'start': 0.0, 'bin_width': self.bin_width, 'counts': []}
+        first, last = min(self.counts), max(self.counts)
+        return {'start': first*self.bin_width,
+                'bin_width': self.bin_width,
+                'counts': [self.counts.get(b, 0) for b in range(first, last+1)]}
+
+class KPIAggregator():
+
+    def __init__(self, warmup_days=0, lateness_bin=1, deliverytime_bin=1):
+        """Online aggregation of the KPIs of one simulation run
+
+        The aggregates are updated chunk by chunk, either while the simulation runs (see
+        attach) or while existing traces are read (see summarize_output), so the traces
+        never have to be loaded in memory completely. Transports that end and deliveries
+        that arrive before the end of the warm-up period are ignored.
+
+        Parameters
+        ----------
+        warmup_days : float
+            Length of the warm-up period in days
+
+        lateness_bin : float
+            Bin width of the lateness histogram in hours
+
+        deliverytime_bin : float
+            Bin width of the delivery time histograms per order in hours
+        """
+
+        self.warmup_days = warmup_days
+        self.warmup = 24*warmup_days
+        self.deliverytime_bin = deliverytime_bin
+
+        # transports
+        self.transports = 0
+        self.loadfraction = 0.0
+        self.drivingtime = 0.0
+        self.loadfractions = dict() # load fraction => number of transports
+
+        # deliveries
+        self.deliveries = 0
+        self.ontime = 0
+        self.deliverytime = 0.0
+        self.deliverytime_squares = 0.0
+        self.lateness = Histogram(lateness_bin)
+        self.orders = dict() # order => [deliveries, on time, delivery time, transport time, handling time]
+        self.deliverytimes = dict() # order => Histogram of the delivery times
+
+    def __repr__(self):
+        return f'KPIAggregator ({self.transports} transports, {self.deliveries} deliveries)'
+
+    def attach(self, logfile_trucks, logfile_containers):
+        """Updates the aggregates with every chunk that is flushed by the trace writers of a run
+
+        Parameters
+        ----------
+        logfile_trucks : TraceWriter
+            Output trace for information on truck trips
+
+        logfile_containers : TraceWriter
+            Output trace for information on arrived containers
+        """
+
+        logfile_trucks.consumers.append(self.add_transports)
+        logfile_containers.consumers.append(self.add_deliveries)
+
+    def add_transports(self, chunk):
+        """Adds a chunk of transport records (dict of columns or DataFrame)"""
+
+        endtime = np.asarray(chunk['endtime'], dtype=float)
+        keep = endtime >= self.warmup
+        if not keep.any():
+            return
+
+        starttime = np.asarray(chunk['starttime'], dtype=float)[keep]
+        loadfraction = np.asarray(chunk['load'])[keep] / np.asarray(chunk['capacity'])[keep]
+
+        self.transports += int(keep.sum())
+        self.loadfraction += float(loadfraction.sum())
+        self.drivingtime += float((endtime[keep]-starttime).sum())
+        values, counts = np.unique(np.round(loadfraction, 6), return_counts=True)
+        for value, count in zip(values.tolist(), counts.tolist()):
+            self.loadfractions[value] = self.loadfractions.get(value, 0) + count
+
+    def add_deliveries(self, chunk):
+        """Adds a chunk of delivery records (dict of columns or DataFrame)"""
+
+        arrivaltime = np.asarray(chunk['arrivaltime'], dtype=float)
+        keep = arrivaltime >= self.warmup
+        if not keep.any():
+            return
+
+        deliveries = pd.DataFrame({name:np.asarray(chunk[name])[keep] for name in
+                                   ('duetime','startnode','endnode','starttime','arrivaltime','transporttime','handlingtime')})
+        deliveries['deliverytime'] = deliveries['arrivaltime'] - deliveries['starttime']
+        deliveries['delay'] = deliveries['arrivaltime'] - deliveries['duetime']
+        deliveries['ontime'] = deliveries['delay'] <= 0
+
+        self.deliveries += len(deliveries)
+        self.ontime += int(deliveries['ontime'].sum())
+        self.deliverytime += float(deliveries['deliverytime'].sum())
+        self.deliverytime_squares += float((deliveries['deliverytime']**2).sum())
+        self.lateness.add(deliveries['delay'].values)
+
+        # aggregates per order
+        for (source, target), group in deliveries.groupby(['startnode','endnode']):
+            order = f'{source} > {target}'
+            totals = self.orders.setdefault(order, [0, 0, 0.0, 0.0, 0.0])
+            totals[0] += len(group)
+            totals[1] += int(group['ontime'].sum())
+            totals[2] += float(group['deliverytime'].sum())
+            totals[3] += float(group['transporttime'].sum())
+            totals[4] += float(group['handlingtime'].sum())
+            self.deliverytimes.setdefault(order, Histogram(self.deliverytime_bin)).add(group['deliverytime'].values)
+
+    def summary(self):
+        """Returns all KPIs as a dictionary that can be saved as json"""
+
+        ontime_fraction, ontime_ci = proportion_ci(self.ontime, self.deliveries)
+        deliverytime, deliverytime_ci = mean_ci(self.deliverytime, self.deliverytime_squares, self.deliveries)
+
+        orders = []
+        for order, (deliveries, ontime, deliverytime_sum, transporttime, handlingtime) in sorted(self.orders.items()):
+            fraction, ci = proportion_ci(ontime, deliveries)
+            orders.append({'order': order,
+                           'deliveries': deliveries,
+                           'ontime_fraction': fraction,
+                           'ontime_ci': ci,
+                           'idletime': (deliverytime_sum-transporttime-handlingtime)/deliveries,
+                           'transporttime': transporttime/deliveries,
+                           'handlingtime': handlingtime/deliveries,
+                           'deliverytime_histogram': self.deliverytimes[order].to_dict()})
+
+        return {'warmup_days': self.warmup_days,
+                'deliveries': self.deliveries,
+                'ontime_fraction': ontime_fraction,
+                'ontime_ci': ontime_ci,
+                'deliverytime': deliverytime,
+                'deliverytime_ci': deliverytime_ci,
+                'lateness_histogram': self.lateness.to_dict(),
+                'transports': self.transports,
+                'loadfraction': self.loadfraction/self.transports if self.transports else None,
+                'loadfraction_counts': {str(value):count for value, count in sorted(self.loadfractions.items())},
+                'total_drivingtime': self.drivingtime,
+                'orders': orders}
+
+    def save(self, path):
+        """Saves the summary as a json file"""
+
+        with open(path, 'w') as file:
+            json.dump(self.summary(), file, indent=1)
+
+def summarize_output(output_folder, warmup_days=0, chunksize=65536):
+    """Returns a KPIAggregator with the KPIs of the saved traces of one run, read in chunks
+
+    Parameters
+    ----------
+    output_folder : str
+        Folder in which the traces are saved
+
+    warmup_days : float
+        Length of the warm-up period in days
+
+    chunksize : int
+        Maximum number of records kept in memory
+    """
+
+    kpis = KPIAggregator(warmup_days)
+    for chunk in iter_trace(output_folder, 'transports', chunksize):
+        kpis.add_transports(chunk)
+    for chunk in iter_trace(output_folder, 'deliveries', chunksize):
+        kpis.add_deliveries(chunk)
+    return kpis
+
+def load_summary(output_folder, warmup_days=0):
+    """Returns the KPI summary of one run
+
+    The summary.json saved by the run is used when it has the same warm-up period,
+    otherwise the KPIs are calculated from the traces with summarize_output.
+
+    Parameters
+    ----------
+    output_folder : str
+        Folder in which the traces are saved
+
+    warmup_days : float
+        Length of the warm-up period in days
+    """
+
+    try:
+        with open(f'{output_folder}/summary.json') as file:
+            summary = json.load(file)
+        if summary['warmup_days'] == warmup_days:
+            return summary
+    except FileNotFoundError:
+        pass
+    return summarize_output(output_folder, warmup_days).summary()
+
+def histogram_edges(histogram):
+    """Returns the bin edges of a histogram in a summary, see Histogram.to_dict"""
+
+    return histogram['start'] + histogram['bin_width']*np.arange(len(histogram['counts'])+1)
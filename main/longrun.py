@@ -0,0 +1,172 @@
+from main.simulation import Simulation
+from main.protocols import protocol_volume
+from main.kpi import KPIAggregator
+from main.confidence import confidence_interval, relative_halfwidth
+from main.parameters import get_parameter
+from main.warmup import DEFAULT_WARMUP_DAYS
+from main.profiling import CountingEnvironment
+import json
+import time
+
+# KPIs of every batch, see BatchMeans
+BATCH_KPIS = ('ontime_fraction', 'drivingtime_per_day')
+
+class BatchMeans():
+
+    def __init__(self, level=0.95):
+        """KPIs of consecutive batches (time windows) of one long simulation run
+
+        The records of the traces are aggregated per batch. Batches that are long enough
+        are approximately independent, so the batch KPIs give confidence intervals for
+        the steady state KPIs of the run.
+
+        Parameters
+        ----------
+        level : float
+            Confidence level of the intervals
+        """
+
+        self.level = level
+        self.batches = []
+        self.current = KPIAggregator()
+
+    def __repr__(self):
+        return f'BatchMeans ({len(self.batches)} batches)'
+
+    def attach(self, logfile_trucks, logfile_containers):
+        """Adds the records of the trace writers of a run to the current batch, see KPIAggregator.attach"""
+
+        logfile_trucks.consumers.append(lambda chunk: self.current.add_transports(chunk))
+        logfile_containers.consumers.append(lambda chunk: self.current.add_deliveries(chunk))
+
+    def end_batch(self, start, end):
+        """Closes the current batch, which covers [start, end) in hours, and returns its KPIs"""
+
+        summary = self.current.summary()
+        batch = {'start': start,
+                 'end': end,
+                 'deliveries': summary['deliveries'],
+                 'ontime_fraction': summary['ontime_fraction'],
+                 'drivingtime_per_day': summary['total_drivingtime']/(end-start)*24}
+        self.batches.append(batch)
+        self.current = KPIAggregator()
+        return batch
+
+    def intervals(self):
+        """Returns the mean, half-width and relative half-width of every KPI over the batches"""
+
+        intervals = dict()
+        for kpi in BATCH_KPIS:
+            values = [batch[kpi] for batch in self.batches if batch[kpi] is not None]
+            if len(values) < 2:
+                continue
+            mean, halfwidth = confidence_interval(values, self.level)
+            intervals[kpi] = {'mean': mean, 'halfwidth': halfwidth, 'relative_halfwidth': relative_halfwidth(mean, halfwidth)}
+        return intervals
+
+def run_longrun(folder, orderfreq_mult, output_folder, seed=None, protocol=protocol_volume, window_days=5, target=0.05,
+                level=0.95, min_batches=10, max_days=None, debug=False, verbose=True):
+    """Simulates one long run in windows and stops when the batch means confidence intervals are tight enough.
+
+    After the warm-up period (optional parameter warmup_days, default 10 days), every
+    window of window_days is one batch. After each window the batch KPIs and their
+    confidence intervals are calculated and the progress and throughput of the run are
+    printed. The run stops when there are at least min_batches batches and the relative
+    half-width of every batch KPI is at most target, or after max_days.
+
+    The batches and the confidence intervals are saved in longrun.json, next to the usual
+    output data of run_simulation. Returns the same information as a dictionary.
+
+    Parameters
+    ----------
+    folder : str
+        Path of the network folder, e.g. 'networks/network-test-volume'
+
+    orderfreq_mult : float
+        Multiplier of the order frequencies in orders.csv
+
+    output_folder : str
+        Folder in which the output data is saved, see Simulation. An existing folder is removed first.
+
+    seed : int, optional
+        Seed of the run. Fresh entropy is used when None.
+
+    protocol : function
+        Protocol running at every node of the network
+
+    window_days : float
+        Length of the batches in days
+
+    target : float
+        Target relative half-width of the confidence intervals
+
+    level : float
+        Confidence level of the intervals
+
+    min_batches : int
+        Minimum number of batches before the run can stop
+
+    max_days : float, optional
+        Maximum simulated time in days. Defaults to sim_days.
+
+    debug : bool
+        Write the debug events to debug.bin, see main.tracing
+
+    verbose : bool
+        Print the progress after every window
+    """
+
+    start = time.perf_counter()
+    simulation = Simulation(folder, orderfreq_mult, output_folder, seed, protocol, debug, environment=CountingEnvironment)
+    env = simulation.env
+    warmup = 24*float(get_parameter(simulation.parameters, 'warmup_days', DEFAULT_WARMUP_DAYS))
+    max_time = 24*float(max_days if max_days is not None else simulation.parameters['sim_days'])
+    batch_means = BatchMeans(level)
+    converged = False
+
+    try:
+        # warm-up period
+        simulation.run(warmup)
+        simulation.flush()
+        batch_means.attach(simulation.logfile_trucks, simulation.logfile_packages)
+
+        # batches
+        while env.now + 24*window_days <= max_time:
+            window_start, window_wall, window_events = env.now, time.perf_counter(), env.processed_events
+            simulation.run(env.now + 24*window_days)
+            simulation.flush()
+            batch = batch_means.end_batch(window_start, env.now)
+            intervals = batch_means.intervals()
+            wall = time.perf_counter() - window_wall
+
+            if verbose:
+                message = f"day {env.now/24:.0f} | batch {len(batch_means.batches)}: {batch['deliveries']} deliveries, "
+                message += f"on-time {batch['ontime_fraction'] if batch['ontime_fraction'] is not None else float('nan'):.3f}, "
+                message += f"driving {batch['drivingtime_per_day']:.1f} h/day"
+                for kpi, interval in intervals.items():
+                    message += f" | {kpi} {interval['mean']:.3f} +- {interval['relative_halfwidth']*100:.1f}%"
+                message += f" | {(env.processed_events-window_events)/wall:.0f} events/s, {(env.now-window_start)/wall:.0f} sim h/s"
+                print(message)
+
+            if (len(batch_means.batches) >= min_batches and len(intervals) == len(BATCH_KPIS)
+                    and all(interval['relative_halfwidth'] <= target for interval in intervals.values())):
+                converged = True
+                break
+
+    finally:
+        simulation.close()
+
+    simulation.kpis.save(f'{output_folder}/summary.json')
+    wall_time = time.perf_counter() - start
+    if verbose:
+        status = 'converged' if converged else 'did not converge'
+        print(f'Batch means {status} after {env.now/24:.0f} days ({len(batch_means.batches)} batches) in {wall_time:.1f}s, '
+              f'{env.processed_events/wall_time:.0f} events/s')
+
+    result = {'folder': folder, 'orderfreq_mult': orderfreq_mult, 'seed': simulation.streams.seed, 'level': level,
+              'target': target, 'window_days': window_days, 'converged': converged, 'sim_days': env.now/24,
+              'events': env.processed_events, 'wall_time': wall_time,
+              'intervals': batch_means.intervals(), 'batches': batch_means.batches}
+    with open(f'{output_folder}/longrun.json', 'w') as file:
+        json.dump(result, file, indent=1)
+    return result
@@ -0,0 +1,52 @@
+import numpy as np
+
+class NetworkModel():
+
+    def __init__(self, G):
+        """Compiled model of the State Graph, used on the hot path of the simulation instead of the NetworkX attribute dicts
+
+        Nodes are indexed by integer IDs, in the order of G.nodes (the same IDs as the RoutingTable):
+
+        - names[i]: name of node i
+        - index[name]: ID of a node
+        - nodes[i]: Node class instance of node i
+        - node[name]: Node class instance of a node by name
+        - trucks: all Truck class instances, in the order of the nodes
+        - weight[i,j]: weight of the edge between node i and node j (inf if there is no edge, 0 if i == j)
+        - indptr, indices: CSR adjacency, the neighbor IDs of node i are indices[indptr[i]:indptr[i+1]]
+        - edge_weight[source][target]: weight of the edge between two neighbors by name, for scalar lookups
+        - neighbors[name]: list of (neighbor name, edge weight, neighbor Node) tuples of a node
+
+        Parameters
+        ----------
+        G : NetworkX Graph
+            State Graph with a 'node' and 'trucks' attribute on every node and a 'weight' attribute on every edge
+        """
+
+        self.names = list(G.nodes)
+        self.index = {name:idx for idx,name in enumerate(self.names)}
+        self.nodes = [G.nodes[name]['node'] for name in self.names]
+        self.node = dict(zip(self.names, self.nodes))
+        self.trucks = [truck for name in self.names for truck in G.nodes[name]['trucks']]
+
+        size = len(self.names)
+        self.weight = np.full((size,size), np.inf)
+        np.fill_diagonal(self.weight, 0)
+        self.indptr = np.zeros(size+1, dtype=np.int32)
+        indices = []
+        self.edge_weight = dict()
+        self.neighbors = dict()
+        for i, name in enumerate(self.names):
+            self.edge_weight[name] = dict()
+            self.neighbors[name] = []
+            for nextnode, attributes in G[name].items():
+                j = self.index[nextnode]
+                self.weight[i,j] = attributes['weight']
+                indices.append(j)
+                self.edge_weight[name][nextnode] = attributes['weight']
+                self.neighbors[name].append((nextnode, attributes['weight'], self.node[nextnode]))
+            self.indptr[i+1] = len(indices)
+        self.indices = np.array(indices, dtype=np.int32)
+
+    def __repr__(self):
+        return f'NetworkModel ({len(self.names)} nodes, {len(self.indices)//2} edges)'
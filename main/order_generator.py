@@ -1,9 +1,11 @@
 import random
-import simpy
-import logging
-import networkx as nx
+import heapq
+import numpy as np
+from collections import deque
+from main.sim_classes import Container
+from main import tracing
 
-def order_generator(G,env,parameters,source,target,interval):
+def order_generator(G,env,parameters,source,target,interval,rng=random,state=None):
     """Generates all container arrivals for one order and populates the incoming_containers attribute.
 
     Parameters
@@ -25,54 +27,257 @@ def order_generator(G,env,parameters,source,target,interval):
 
     interval : str
         Mean order interarrival time
+
+    rng : random.Random
+        Random number generator of the arrivals and due dates of this order
+
+    state : dict, optional
+        Resumable state of the generator, updated while it runs: the time of the next
+        arrival without lookahead, the time and action of the pending wait with lookahead.
+        A generator that gets a saved state continues from it, see main.snapshot.
     """
+    if state is None:
+        state = dict()
+
     # load parameters
     lookahead = float(parameters['lookahead'])
     orderfreq_mult = float(parameters['orderfreq_mult'])
 
-    # calculate shortest path distance
-    length,_ = nx.single_source_dijkstra(G, source, target)
+    # look up shortest path distance and source node
+    length = G.graph['routing'].length(source, target)
+    node = G.graph['model'].node[source]
 
     # if there is no lookahead, orders can be directly generated without intermediate storage
     if lookahead == 0:
 
+        # continue a restored generator
+        if 'next_arrival' in state:
+            yield env.timeout(max(state['next_arrival']-env.now,0))
+            due = env.now + rng.randint(round(3*length),round(8*length))
+            container = Container(due,source,target,env.now)
+            node.receive_container(container)
+
         while True:
-            yield env.timeout(round(random.expovariate(orderfreq_mult/interval),2))
-            due = env.now + random.randint(round(3*length),round(8*length))
-            container = simpy.PriorityItem(due, [source,target,env.now,0,0,0,-1])
-            G.nodes[source]['node'].receive_container(container)
+            interarrival = round(rng.expovariate(orderfreq_mult/interval),2)
+            state['next_arrival'] = env.now + interarrival
+            yield env.timeout(interarrival)
+            due = env.now + rng.randint(round(3*length),round(8*length))
+            container = Container(due,source,target,env.now)
+            node.receive_container(container)
 
     # else, the order generator must populate the incoming_containers list
     else:
 
-        logging.debug('%.2f | order_generator %s => %s | initializing incoming_containers...', env.now, source, target)
+        # a restored generator continues with its incoming_containers
+        if target not in node.incoming_containers:
+
+            if tracing.enabled:
+                tracing.emit(env.now, 'order_init_start', source, other=target)
+
+            time = env.now
+            node.incoming_containers[target] = []
+            while time < env.now+lookahead:
+                time += round(rng.expovariate(orderfreq_mult/interval),2)
+                node.incoming_containers[target].append(time)
 
-        time = 0
-        G.nodes[source]['node'].incoming_containers[target] = []
-        while time < lookahead:
-            time += round(random.expovariate(orderfreq_mult/interval),2)
-            G.nodes[source]['node'].incoming_containers[target].append(time)
+            if tracing.enabled:
+                tracing.emit(env.now, 'order_init_end', source, other=target)
 
-        logging.debug('%.2f | order_generator %s => %s | incoming_containers initialized', env.now, source, target)
-        logging.debug('%.2f | order_generator %s => %s | activated', env.now, source, target)
+        if tracing.enabled:
+            tracing.emit(env.now, 'order_activated', source, other=target)
 
+        resume = 'wakeup' in state
         while True:
-            nextordertime = G.nodes[source]['node'].incoming_containers[target][0]
-            lastordertime = G.nodes[source]['node'].incoming_containers[target][-1]
-            logging.debug('%.2f | order_generator %s => %s | next arrival %.2f, last arrival %.2f', env.now, source, target, nextordertime, lastordertime)
-            
-            if nextordertime-env.now <= lastordertime-(env.now+lookahead):
-                yield env.timeout(round(nextordertime-env.now,2))
-
-                logging.debug('%.2f | order_generator %s => %s | generate container', env.now, source, target)
-                due = env.now + random.randint(round(3*length),round(8*length))
-                container = simpy.PriorityItem(due, [source,target,env.now,0,0,0,-1])
-                G.nodes[source]['node'].receive_container(container)
-                G.nodes[source]['node'].incoming_containers[target].pop(0)
+
+            # continue the pending wait of a restored generator
+            if resume:
+                resume = False
+                yield env.timeout(max(state['wakeup']-env.now,0))
+                generate = state['generate']
+
+            else:
+                nextordertime = node.incoming_containers[target][0]
+                lastordertime = node.incoming_containers[target][-1]
+                if tracing.enabled:
+                    tracing.emit(env.now, 'order_next', source, other=target, value=nextordertime)
+
+                generate = nextordertime-env.now <= lastordertime-(env.now+lookahead)
+                if generate:
+                    delay = round(nextordertime-env.now,2)
+                else:
+                    # a restored generator with a longer lookahead catches up without waiting
+                    delay = max(round(lastordertime-(env.now+lookahead),2), 0)
+                state['wakeup'], state['generate'] = env.now+delay, generate
+                yield env.timeout(delay)
+
+            if generate:
+                if tracing.enabled:
+                    tracing.emit(env.now, 'order_generate', source, other=target)
+                due = env.now + rng.randint(round(3*length),round(8*length))
+                container = Container(due,source,target,env.now)
+                node.receive_container(container)
+                node.incoming_containers[target].pop(0)
             
             else:
-                yield env.timeout(round(lastordertime-(env.now+lookahead),2))
+                if tracing.enabled:
+                    tracing.emit(env.now, 'order_future', source, other=target)
+                time = node.incoming_containers[target][-1] + round(rng.expovariate(orderfreq_mult/interval),2)
+                node.incoming_containers[target].append(time)
+
+class OrderStream():
+
+    def __init__(self, G, env, parameters, orders, rngs, block_size=1024):
+        """Generates the container arrivals of all orders of the network in one process.
+
+        Interarrival times and due dates are sampled with NumPy in blocks per order and
+        merged into one arrival stream, instead of running one order_generator process
+        per order. With a lookahead, the incoming_containers attribute of the source node
+        holds the known future arrival times of each order, like order_generator.
+
+        Parameters
+        ----------
+        G : NetworkX Graph
+            State Graph of the simulation
+
+        env : SimPy Environment
+            The simulation environment of the model
+
+        parameters : Pandas DataFrame
+            Parameters of the simulation
+
+        orders : Pandas DataFrame
+            Each line contains an order's source, target and mean interarrival time
+
+        rngs : list of NumPy Generators
+            Random number generator of the arrivals and due dates of every order
+
+        block_size : int
+            Number of arrivals sampled at once per order
+        """
+
+        self.G = G
+        self.env = env
+        self.rngs = rngs
+        self.block_size = block_size
+        self.lookahead = float(parameters['lookahead'])
+        orderfreq_mult = float(parameters['orderfreq_mult'])
+        routing = G.graph['routing']
+
+        # order data, indexed by order number
+        self.sources = list(orders['source'])
+        self.targets = list(orders['target'])
+        self.nodes = [G.graph['model'].node[source] for source in self.sources]
+        self.mean_interarrival = [interval/orderfreq_mult for interval in orders['interval']]
+        self.due_range = []
+        for source, target in zip(self.sources, self.targets):
+            length = routing.length(source, target)
+            self.due_range.append((round(3*length), round(8*length)))
+
+        # sampled arrivals that are not generated yet
+        self.arrivals = [deque() for _ in self.sources]
+        self.due_offsets = [deque() for _ in self.sources]
+        self.last_arrival = [0.0 for _ in self.sources]
+
+        # known future arrivals in case of lookahead
+        if self.lookahead:
+            for order, (node, target) in enumerate(zip(self.nodes, self.targets)):
+                node.incoming_containers[target] = deque()
+                self._reveal(order)
+
+        # next wake-up time of every order
+        self.queue = [(self._next_wakeup(order), order) for order in range(len(self.sources))]
+        heapq.heapify(self.queue)
+
+    def __repr__(self):
+        return f'OrderStream ({len(self.sources)} orders)'
+
+    def _sample(self, order):
+        """Samples the next block of arrival times and due date offsets of one order"""
+
+        rng = self.rngs[order]
+        interarrivals = np.round(rng.exponential(self.mean_interarrival[order], self.block_size), 2)
+        arrivals = self.last_arrival[order] + np.cumsum(interarrivals)
+        low, high = self.due_range[order]
+        self.arrivals[order].extend(arrivals.tolist())
+        self.due_offsets[order].extend(rng.integers(low, high+1, self.block_size).tolist())
+        self.last_arrival[order] = self.arrivals[order][-1]
+
+    def _peek(self, order, position):
+        """Returns the arrival time at a position of the not yet generated arrivals of one order"""
+
+        while position >= len(self.arrivals[order]):
+            self._sample(order)
+        return self.arrivals[order][position]
+
+    def _reveal(self, order):
+        """Adds future arrivals to incoming_containers until they cover the lookahead period"""
+
+        incoming = self.nodes[order].incoming_containers[self.targets[order]]
+        while not incoming or incoming[-1]-self.lookahead <= self.env.now:
+            incoming.append(self._peek(order, len(incoming)))
+
+    def _next_wakeup(self, order):
+        """Returns the time of the next arrival of an order, or of the next update of its incoming_containers"""
+
+        next_arrival = self._peek(order, 0)
+        if self.lookahead:
+            incoming = self.nodes[order].incoming_containers[self.targets[order]]
+            return min(next_arrival, incoming[-1]-self.lookahead)
+        return next_arrival
+
+    def resample(self, previous_lookahead):
+        """Samples the arrivals that are not known yet again, after mean_interarrival or lookahead changed, e.g. in a restored snapshot
+
+        The next arrival of every order, and with a lookahead the arrivals in its
+        incoming_containers, are known already and kept, like the pending arrival or the
+        incoming_containers of a restored order_generator. The arrivals after them are
+        sampled again from the current random state, with the current mean_interarrival
+        and lookahead.
+
+        Parameters
+        ----------
+        previous_lookahead : float
+            Lookahead with which the arrivals were sampled
+        """
+
+        for order, (node, target) in enumerate(zip(self.nodes, self.targets)):
+            known = max(len(node.incoming_containers[target]), 1) if previous_lookahead else 1
+            arrivals, due_offsets = self.arrivals[order], self.due_offsets[order]
+            for _ in range(len(arrivals)-known):
+                arrivals.pop()
+                due_offsets.pop()
+            self.last_arrival[order] = arrivals[-1]
+
+            if self.lookahead:
+                if not previous_lookahead:
+                    node.incoming_containers[target] = deque()
+                self._reveal(order)
+            else:
+                node.incoming_containers.pop(target, None)
+
+        self.queue = [(self._next_wakeup(order), order) for order in range(len(self.sources))]
+        heapq.heapify(self.queue)
+
+    def run(self):
+        """SimPy process that generates the containers of all orders"""
+
+        env = self.env
+        while True:
+            yield env.timeout(max(self.queue[0][0]-env.now, 0))
+
+            # handle all orders that are due now
+            while self.queue[0][0] <= env.now:
+                order = self.queue[0][1]
+
+                if self._peek(order, 0) <= env.now:
+                    self.arrivals[order].popleft()
+                    due = env.now + self.due_offsets[order].popleft()
+                    container = Container(due,self.sources[order],self.targets[order],env.now)
+                    self.nodes[order].receive_container(container)
+                    if self.lookahead:
+                        self.nodes[order].incoming_containers[self.targets[order]].popleft()
+
+                if self.lookahead:
+                    self._reveal(order)
 
-                logging.debug('%.2f | order_generator %s => %s | add future arrival to incoming_containers', env.now, source, target)
-                time = lastordertime + round(random.expovariate(orderfreq_mult/interval),2)
-                G.nodes[source]['node'].incoming_containers[target].append(time)
\ No newline at end of file
+                heapq.heapreplace(self.queue, (self._next_wakeup(order), order))
@@ -0,0 +1,21 @@
+def get_parameter(parameters, name, default):
+    """Returns the value of an optional simulation parameter
+
+    Optional parameters are extra columns in parameters.csv. Networks without the
+    column use the default value, so older input files keep working.
+
+    Parameters
+    ----------
+    parameters : Pandas DataFrame
+        Parameters of the simulation
+
+    name : str
+        Name of the parameter column
+
+    default : object
+        Value used when the column is missing or empty
+    """
+
+    if name in parameters.columns and parameters[name].notna().all():
+        return parameters[name].iloc[0]
+    return default
@@ -0,0 +1,137 @@
+import numpy as np
+import pandas as pd
+
+def _step_counts(grid, times, ids, amounts, size):
+    """Returns the sum of the amounts of the events with time <= grid[k] per id, shape (len(grid), size)
+
+    Every event is added to its first time step in one np.add.at and the steps are
+    accumulated with one cumsum, so the cost is linear in the events and the steps.
+    """
+
+    keep = ids >= 0
+    delta = np.zeros((len(grid)+1, size), dtype=np.int64)
+    np.add.at(delta, (np.searchsorted(grid, times[keep], side='left'), ids[keep]), amounts[keep])
+    return np.cumsum(delta, axis=0)[:len(grid)]
+
+class Playback():
+
+    def __init__(self, transports, deliveries, nodes, sim_time, step=1, start=0, hubstates=None):
+        """State of the network at every time step of a run, for the playback of the visualizer
+
+        The states are built from the traces in one vectorized pass over the records:
+
+        - times[k]: simulation time of step k
+        - names: names of the nodes, in the order of nodes
+        - inventory[k,i]: containers at node i, counted from their creation (or arrival by
+          truck) until they leave on a truck (or are delivered). Containers that were not
+          delivered by the end of the run are not in the deliveries trace, so the inventory
+          of their hubs is underestimated towards the end of the run (clipped at 0).
+        - trucks[k,i]: trucks at node i: idle, waiting for a forklift, loading or unloading
+        - arcs: (startnode, endnode) of every arc with transports
+        - arc_trucks[k,a], arc_containers[k,a]: trucks and containers driving on arc a
+        - the trucks driving at step k are the rows pointers[k]:pointers[k+1] of the markers:
+          marker_truck, marker_start and marker_end (node indices), marker_fraction (part of
+          the arc already driven) and marker_load
+
+        A truck drives from starttime (its departure after loading) until endtime (its
+        arrival before unloading) of its transport record.
+
+        When the hubstates trace of the run is given (see main.hubstates), the inventory is
+        the arrived and queued containers of the last sample before each step instead, and
+        the forklift queue is known:
+
+        - forklift_queue[k,i]: trucks waiting for a forklift at node i (None without hubstates)
+
+        Parameters
+        ----------
+        transports : Pandas DataFrame
+            Transports trace of the run
+
+        deliveries : Pandas DataFrame
+            Deliveries trace of the run
+
+        nodes : Pandas DataFrame
+            Nodes input data with the name and numtrucks of every node
+
+        sim_time : float
+            Simulated time of the run in hours
+
+        step : float
+            Time between two steps in hours
+
+        start : float
+            Time of the first step in hours
+
+        hubstates : Pandas DataFrame, optional
+            Hub states trace of the run
+        """
+
+        self.times = np.arange(start, sim_time, step, dtype=float)
+        self.names = list(nodes['name'])
+        names = pd.Index(self.names)
+        size = len(self.names)
+
+        startnode = names.get_indexer(transports['startnode'].astype(str))
+        endnode = names.get_indexer(transports['endnode'].astype(str))
+        starttime = transports['starttime'].to_numpy(dtype=float)
+        endtime = transports['endtime'].to_numpy(dtype=float)
+        load = transports['load'].to_numpy(dtype=np.int64)
+        ones = np.ones(len(transports), dtype=np.int64)
+
+        # containers at the nodes: created, unloaded, loaded and delivered
+        source = names.get_indexer(deliveries['startnode'].astype(str))
+        target = names.get_indexer(deliveries['endnode'].astype(str))
+        delivered = np.ones(len(deliveries), dtype=np.int64)
+        self.inventory = (_step_counts(self.times, deliveries['starttime'].to_numpy(dtype=float), source, delivered, size)
+                          + _step_counts(self.times, endtime, endnode, load, size)
+                          - _step_counts(self.times, starttime, startnode, load, size)
+                          - _step_counts(self.times, deliveries['arrivaltime'].to_numpy(dtype=float), target, delivered, size))
+        np.maximum(self.inventory, 0, out=self.inventory)
+
+        # sampled containers and forklift queues at the nodes
+        self.forklift_queue = None
+        if hubstates is not None and len(hubstates):
+            sample_times, samples = np.unique(hubstates['time'].to_numpy(dtype=float), return_inverse=True)
+            columns = names.get_indexer(hubstates['node'].astype(str))
+            sampled = np.zeros((2, len(sample_times), size), dtype=np.int64)
+            sampled[0, samples, columns] = hubstates['arrived'].to_numpy() + hubstates['queued'].to_numpy()
+            sampled[1, samples, columns] = hubstates['forklift_queue'].to_numpy()
+            rows = np.maximum(np.searchsorted(sample_times, self.times, side='right') - 1, 0)
+            self.inventory, self.forklift_queue = sampled[:, rows]
+
+        # trucks at the nodes: the own trucks at the start, arrivals and departures
+        self.trucks = (nodes['numtrucks'].to_numpy(dtype=np.int64)
+                       + _step_counts(self.times, endtime, endnode, ones, size)
+                       - _step_counts(self.times, starttime, startnode, ones, size))
+
+        # trucks and containers on the arcs
+        arcs, keys = pd.factorize(startnode.astype(np.int64)*size + endnode)
+        self.arcs = [(self.names[key//size], self.names[key%size]) for key in keys]
+        self.arc_trucks = _step_counts(self.times, starttime, arcs, ones, len(self.arcs)) - _step_counts(self.times, endtime, arcs, ones, len(self.arcs))
+        self.arc_containers = _step_counts(self.times, starttime, arcs, load, len(self.arcs)) - _step_counts(self.times, endtime, arcs, load, len(self.arcs))
+
+        # one marker per step of every transport: the steps k with starttime <= times[k] < endtime
+        first = np.searchsorted(self.times, starttime, side='left')
+        counts = np.searchsorted(self.times, endtime, side='left') - first
+        rows = np.repeat(np.arange(len(transports)), counts)
+        steps = np.repeat(first, counts) + np.arange(len(rows)) - np.repeat(np.cumsum(counts)-counts, counts)
+        order = np.argsort(steps, kind='stable')
+        rows, steps = rows[order], steps[order]
+        self.pointers = np.searchsorted(steps, np.arange(len(self.times)+1))
+        self.marker_truck = transports['truckname'].to_numpy()[rows]
+        self.marker_start = startnode[rows]
+        self.marker_end = endnode[rows]
+        self.marker_fraction = (self.times[steps]-starttime[rows]) / np.maximum(endtime[rows]-starttime[rows], 1e-9)
+        self.marker_load = load[rows]
+
+    def __repr__(self):
+        return f'Playback ({len(self.times)} steps, {len(self.names)} nodes, {len(self.marker_truck)} truck markers)'
+
+    def __len__(self):
+        return len(self.times)
+
+    def markers(self, k):
+        """Returns the truck, start node, end node, driven fraction and load of the trucks driving at step k"""
+
+        rows = slice(self.pointers[k], self.pointers[k+1])
+        return self.marker_truck[rows], self.marker_start[rows], self.marker_end[rows], self.marker_fraction[rows], self.marker_load[rows]
@@ -0,0 +1,214 @@
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+import simpy
+import json
+import time
+
+class CountingEnvironment(simpy.Environment):
+
+    def __init__(self, initial_time=0):
+        """SimPy Environment that counts the number of processed events"""
+
+        super().__init__(initial_time)
+        self.processed_events = 0
+
+    def step(self):
+        super().step()
+        self.processed_events += 1
+
+def _add(stats, key, elapsed):
+    """Adds one measurement to the [count, total time, max time] entry of a key"""
+
+    entry = stats[key]
+    entry[0] += 1
+    entry[1] += elapsed
+    if elapsed > entry[2]:
+        entry[2] = elapsed
+
+def _rows(stats, names):
+    """Returns the entries of a stats dict as a list of dicts, sorted by total time"""
+
+    rows = [{**dict(zip(names, key)), 'count': count, 'wall_time': total, 'mean': total/count, 'max': longest}
+            for key, (count, total, longest) in stats.items()]
+    return sorted(rows, key= lambda row: row['wall_time'], reverse=True)
+
+class Profile():
+
+    def __init__(self):
+        """Event counts and wall times of the components of one simulation run, see ProfiledEnvironment
+
+        - events[(type, component)]: number of processed events by event type and origin
+        - steps[(component, owner)]: [count, total time, max time] of the processed events by origin,
+          e.g. the ticks of the protocol of one node or the trip steps of one truck
+        - timers[(category, name)]: [count, total time, max time] of timed code, e.g. routing computations
+        """
+
+        self.events = defaultdict(int)
+        self.steps = defaultdict(lambda: [0, 0.0, 0.0])
+        self.timers = defaultdict(lambda: [0, 0.0, 0.0])
+        self.start = time.perf_counter()
+
+    def __repr__(self):
+        return f'Profile ({sum(self.events.values())} events)'
+
+    @contextmanager
+    def timed(self, category, name):
+        """Context manager that adds the wall time of its block to timers[(category, name)]"""
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            _add(self.timers, (category, name), time.perf_counter()-start)
+
+    def wrap(self, function, category, name):
+        """Returns a wrapper of a function that adds the wall time of every call to timers[(category, name)]"""
+
+        timers, key = self.timers, (category, name)
+
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                _add(timers, key, time.perf_counter()-start)
+
+        return wrapper
+
+    def report(self):
+        """Returns the profile as a dictionary: totals, events by type and origin, time per component, protocol tick and timer"""
+
+        events_by_type = defaultdict(int)
+        for (kind, _), count in self.events.items():
+            events_by_type[kind] += count
+        components = defaultdict(lambda: [0, 0.0, 0.0])
+        for (component, _), (count, total, longest) in self.steps.items():
+            entry = components[(component,)]
+            entry[0] += count
+            entry[1] += total
+            entry[2] = max(entry[2], longest)
+        timers = defaultdict(list)
+        for row in _rows(self.timers, ('category', 'name')):
+            timers[row.pop('category')].append(row)
+
+        steps = _rows(self.steps, ('component', 'owner'))
+        return {'wall_time': time.perf_counter()-self.start,
+                'event_time': sum(total for _, total, _ in self.steps.values()),
+                'events': sum(self.events.values()),
+                'events_by_type': dict(sorted(events_by_type.items(), key= lambda x: -x[1])),
+                'events_by_origin': [{'type': kind, 'component': component, 'count': count}
+                                     for (kind, component), count in sorted(self.events.items(), key= lambda x: -x[1])],
+                'components': _rows(components, ('component',)),
+                'protocol_ticks': [row for row in steps if row['component'].startswith('protocol')],
+                'steps': [row for row in steps if not row['component'].startswith('protocol')],
+                'timers': dict(timers)}
+
+    def save(self, path):
+        """Saves the report of the profile in a json file"""
+
+        with open(path, 'w') as file:
+            json.dump(self.report(), file, indent=1)
+
+class ProfiledEnvironment(CountingEnvironment):
+
+    def __init__(self, initial_time=0):
+        """SimPy Environment that profiles every processed event, see Profile
+
+        The origin of an event is the process it resumes: the name of its generator
+        function (e.g. protocol_volume, deliver_cargo, order_generator) and its owner
+        (the node of a protocol, the truck of a trip, the source>target of an order).
+        Events that do not resume a process are attributed to the object of their
+        callback, e.g. the Resource of the forklifts or the Condition of an event mode
+        check, or to 'no callbacks', e.g. a finished trip that nobody waits for.
+        The wall time of processing an event includes the process code that runs until
+        its next yield, so the time per protocol origin is the time per protocol tick.
+        """
+
+        super().__init__(initial_time)
+        self.profile = Profile()
+
+    def _origin(self, event):
+        """Returns the (component, owner) of the first callback of an event"""
+
+        for callback in event.callbacks or ():
+            process = getattr(callback, '__self__', None)
+            if isinstance(process, simpy.events.Process):
+                origin = getattr(process, 'profile_origin', None)
+                if origin is None:
+                    origin = process.profile_origin = _process_origin(process)
+                return origin
+            if isinstance(process, type):
+                return process.__name__, ''
+            if process is not None:
+                return type(process).__name__, ''
+            return getattr(callback, '__name__', 'callback'), ''
+        return 'no callbacks', ''
+
+    def step(self):
+        if not self._queue:
+            return super().step()
+        event = self._queue[0][3]
+        component, owner = self._origin(event)
+        start = time.perf_counter()
+        try:
+            super().step()
+        finally:
+            elapsed = time.perf_counter() - start
+            self.profile.events[(type(event).__name__, component)] += 1
+            _add(self.profile.steps, (component, owner), elapsed)
+
+def _process_origin(process):
+    """Returns the (component, owner) of a SimPy process, from the name and local variables of its generator"""
+
+    generator = process._generator
+    local = generator.gi_frame.f_locals if generator.gi_frame is not None else dict()
+    if generator.__name__ in ('_delayed', '_resumed'):
+        generator = local['process']
+        local = generator.gi_frame.f_locals if generator.gi_frame is not None else dict()
+
+    if 'nodename' in local:
+        owner = str(local['nodename'])
+    elif 'source' in local and 'target' in local:
+        owner = f"{local['source']}>{local['target']}"
+    else:
+        owner = str(getattr(local.get('self'), 'name', ''))
+    return generator.__name__, owner
+
+def timed(env, category, name):
+    """Returns a context manager that times its block in the profile of env, or does nothing when env is not profiled
+
+    Parameters
+    ----------
+    env : SimPy Environment
+        The simulation environment of the model
+
+    category : str
+        Category of the timed code, e.g. 'routing table'
+
+    name : str
+        Name of the timed instance, e.g. the node
+    """
+
+    profile = getattr(env, 'profile', None)
+    return nullcontext() if profile is None else profile.timed(category, name)
+
+def profiled(env, function, category, name):
+    """Returns a function that times every call in the profile of env, or the function itself when env is not profiled
+
+    Parameters
+    ----------
+    env : SimPy Environment
+        The simulation environment of the model
+
+    function : function
+        Function or bound method to time, e.g. the update method of a DynamicRouting
+
+    category : str
+        Category of the timed function, e.g. 'routing update'
+
+    name : str
+        Name of the timed instance, e.g. the node
+    """
+
+    profile = getattr(env, 'profile', None)
+    return function if profile is None else profile.wrap(function, category, name)
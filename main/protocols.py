@@ -1,6 +1,99 @@
-import simpy
-import networkx as nx
-import logging
+import numpy as np
+from main.routing import DynamicRouting
+from main.sim_classes import ContainerQueue
+from main.parameters import get_parameter
+from main.profiling import timed, profiled
+from main import tracing
+
+# time resolution of the model (times are rounded to 2 decimals)
+TIME_RESOLUTION = 0.01
+
+# names of the protocols, see get_protocol
+PROTOCOL_NAMES = ('volume', 'patience', 'urgency', 'information', 'information_urgency', 'consolidation')
+
+def _dispatch_mode(parameters):
+    """Returns the dispatch mode of the protocols: 'polling' (default) or 'event'
+
+    polling: the dispatch rules are checked every protocol_interval hours
+    event: the dispatch rules are checked when a container or truck arrives at the node,
+    or when a deadline of the protocol comes due
+
+    Parameters
+    ----------
+    parameters : Pandas DataFrame
+        Parameters of the simulation
+    """
+
+    dispatch_mode = str(get_parameter(parameters, 'dispatch_mode', 'polling'))
+    if dispatch_mode not in ('polling', 'event'):
+        raise ValueError(f"dispatch_mode must be 'polling' or 'event', not '{dispatch_mode}'")
+    return dispatch_mode
+
+def _next_check(env,node,interval,dispatch_mode,deadline=None):
+    """Returns the event after which the protocol checks its dispatch rules again
+
+    Parameters
+    ----------
+    env : SimPy Environment
+        The simulation environment of the model
+
+    node : Node class
+        The node at which the protocol is running
+
+    interval : float
+        Time between two checks in polling mode
+
+    dispatch_mode : str
+        'polling' or 'event'
+
+    deadline : float, optional
+        Time at which a dispatch rule becomes active without any arrival (event mode only)
+    """
+
+    if dispatch_mode == 'polling':
+        return env.timeout(interval)
+    if deadline is not None:
+        delay = max(deadline-env.now,0)+TIME_RESOLUTION
+        node.wakeup = env.now + delay
+        return node.activity | env.timeout(delay)
+    node.wakeup = None
+    return node.activity
+
+def _neighbor_delays(G,env,node,processing_time):
+    """Returns the estimated delay per neighbor caused by trucks arriving there just before us
+
+    A truck sent now arrives at the same time as the trucks already on their way to that
+    neighbor. If there are more of those trucks than forklifts, it must wait to be unloaded.
+
+    Parameters
+    ----------
+    G : NetworkX graph
+        The state graph of the simulation
+
+    env : SimPy Environment
+        The simulation environment of the model
+
+    node : Node class
+        The node at which the protocol is running
+
+    processing_time : float
+        Time needed to unload a full truck
+    """
+
+    delays = dict()
+    for nextnode, weight, neighbor in G.graph['model'].neighbors[node.name]:
+        estimated_arrival = env.now + weight
+        delaying_trucks = []
+        for arrival in neighbor.incoming_trucks.values():
+            if estimated_arrival-processing_time < arrival < estimated_arrival:
+                delaying_trucks.append(arrival)
+        if len(delaying_trucks) >= neighbor.forklifts.capacity:
+            first_arrival = min(delaying_trucks)
+            min_unavailable = processing_time*(len(delaying_trucks)//neighbor.forklifts.capacity)
+            min_delay = round(first_arrival+min_unavailable-estimated_arrival,2)
+            if min_delay>0:
+                delays[nextnode] = min_delay
+    return delays
 
 def protocol_volume(G,env,parameters,nodename):
     """Volume-based protocol
@@ -20,29 +113,38 @@ def protocol_volume(G,env,parameters,nodename):
         Name of the node at which the protocol is running
     """
 
-    logging.debug('%.2f | Node %s | initializing protocol...', env.now, nodename)
+    if tracing.enabled:
+        tracing.emit(env.now, 'protocol_init_start', nodename)
 
     # load parameters
     interval = float(parameters['protocol_interval'])
+    dispatch_mode = _dispatch_mode(parameters)
     truck_storage_capacity = float(parameters['truck_storage_capacity'])
 
     # initialize node inventory
-    node = G.nodes[nodename]['node']
-    presort = {nextnode:simpy.PriorityStore(env) for nextnode in G.neighbors(node.name)}
+    node = G.graph['model'].node[nodename]
+    presort = {nextnode:ContainerQueue() for nextnode in G.neighbors(node.name)}
+    node.queues = presort
     
-    # calculate shortest paths
-    _,path = nx.single_source_dijkstra(G, nodename)
+    # shortest paths from the shared routing table
+    routing = G.graph['routing']
 
-    logging.debug('%.2f | Node %s | protocol initialized', env.now, nodename)
+    if tracing.enabled:
+        tracing.emit(env.now, 'protocol_init_end', nodename)
 
     while True:
         
-        logging.debug('%.2f | Node %s | checking dispatch rules...', env.now, nodename)
+        if tracing.enabled:
+            tracing.emit(env.now, 'protocol_check', nodename)
+
+        # in event mode, every arrival from now on triggers the next check
+        if dispatch_mode == 'event':
+            node.activity = env.event()
 
         # sort newly arrived containers based on next destination in shortest path
         for container in node.arrived_containers:
-            nextnode = path[container.item[1]][1]
-            yield presort[nextnode].put(container)
+            nextnode = routing.next_node(nodename, container.target)
+            presort[nextnode].put(container)
         node.arrived_containers = []
 
         # send out trucks
@@ -52,25 +154,26 @@ def protocol_volume(G,env,parameters,nodename):
             # Rule 1
             if node.available_trucks[0]:
                 truck = node.available_trucks[0].pop(0)
-                destination = truck.name.split('_')[0]
-                logging.debug('%.2f | Node %s | send %s to Node %s: not our truck', env.now, nodename, truck, destination)
+                destination = truck.home
+                if tracing.enabled:
+                    tracing.emit(env.now, 'dispatch', nodename, truck.name, destination, reason='not our truck')
 
             # Rule 2
             if not truck and node.available_trucks[1]:
                 destination = max(presort, key= lambda x: len(presort[x].items)) 
                 if len(presort[destination].items) >= truck_storage_capacity:
                     truck = node.available_trucks[1].pop(0)
-                    logging.debug('%.2f | Node %s | send %s to Node %s: possible to fill', env.now, nodename, truck, destination)
+                    if tracing.enabled:
+                        tracing.emit(env.now, 'dispatch', nodename, truck.name, destination, reason='possible to fill')
 
             if truck:
-                cargo = []
-                while len(cargo) < truck_storage_capacity and presort[destination].items:
-                        container = yield presort[destination].get()
-                        cargo.append(container)
+                cargo = presort[destination].get_many(truck_storage_capacity)
                 env.process(truck.deliver_cargo(G,node.name,destination,cargo))
             else:
                 break
-        yield env.timeout(interval)
+
+        # wait until the next check
+        yield _next_check(env,node,interval,dispatch_mode)
 
 def protocol_patience(G,env,parameters,nodename,patience):
     """Volume-based protocol + truck driver patience
@@ -93,29 +196,38 @@ def protocol_patience(G,env,parameters,nodename,patience):
         Maximum amount of hours a truck driver will wait before returning to their parent node
     """
 
-    logging.debug('%.2f | Node %s | initializing protocol...', env.now, nodename)
+    if tracing.enabled:
+        tracing.emit(env.now, 'protocol_init_start', nodename)
 
     # load parameters
     interval = float(parameters['protocol_interval'])
+    dispatch_mode = _dispatch_mode(parameters)
     truck_storage_capacity = float(parameters['truck_storage_capacity'])
 
     # initialize node inventory
-    node = G.nodes[nodename]['node']
-    presort = {nextnode:simpy.PriorityStore(env) for nextnode in G.neighbors(node.name)}
+    node = G.graph['model'].node[nodename]
+    presort = {nextnode:ContainerQueue() for nextnode in G.neighbors(node.name)}
+    node.queues = presort
     
-    # calculate shortest paths
-    _,path = nx.single_source_dijkstra(G, nodename)
+    # shortest paths from the shared routing table
+    routing = G.graph['routing']
 
-    logging.debug('%.2f | Node %s | protocol initialized', env.now, nodename)
+    if tracing.enabled:
+        tracing.emit(env.now, 'protocol_init_end', nodename)
 
     while True:
 
-        logging.debug('%.2f | Node %s | checking dispatch rules...', env.now, nodename)
+        if tracing.enabled:
+            tracing.emit(env.now, 'protocol_check', nodename)
+
+        # in event mode, every arrival from now on triggers the next check
+        if dispatch_mode == 'event':
+            node.activity = env.event()
         
         # sort newly arrived containers based on next destination in shortest path
         for container in node.arrived_containers:
-            nextnode =  path[container.item[1]][1]
-            yield presort[nextnode].put(container)
+            nextnode = routing.next_node(nodename, container.target)
+            presort[nextnode].put(container)
         node.arrived_containers = []
 
         # send out trucks
@@ -124,16 +236,18 @@ def protocol_patience(G,env,parameters,nodename,patience):
 
             # Rule 3
             for other_truck in list(node.available_trucks[0]):
-                destination = other_truck.name.split('_')[0]
+                destination = other_truck.home
                 if len(presort[destination].items) >= truck_storage_capacity:
                     truck = other_truck
                     node.available_trucks[0].remove(truck)
-                    logging.debug('%.2f | Node %s | send %s to Node %s: possible to fill', env.now, nodename, truck, destination)
+                    if tracing.enabled:
+                        tracing.emit(env.now, 'dispatch', nodename, truck.name, destination, reason='possible to fill')
                     break
                 elif round(env.now-other_truck.idle_since,1) >= patience:
                     truck = other_truck
                     node.available_trucks[0].remove(truck)
-                    logging.debug('%.2f | Node %s | send %s to Node %s: not our truck + patience ran out', env.now, nodename, truck, destination)
+                    if tracing.enabled:
+                        tracing.emit(env.now, 'dispatch', nodename, truck.name, destination, reason='not our truck + patience ran out')
                     break
             
             # Rule 2
@@ -141,17 +255,20 @@ def protocol_patience(G,env,parameters,nodename,patience):
                 destination = max(presort, key= lambda x: len(presort[x].items))
                 if len(presort[destination].items) >= truck_storage_capacity: 
                     truck = node.available_trucks[1].pop(0)
-                    logging.debug('%.2f | Node %s | send %s to Node %s: possible to fill', env.now, nodename, truck, destination)
+                    if tracing.enabled:
+                        tracing.emit(env.now, 'dispatch', nodename, truck.name, destination, reason='possible to fill')
 
             if truck:
-                cargo = []
-                while len(cargo) < truck_storage_capacity and presort[destination].items:
-                        container = yield presort[destination].get()
-                        cargo.append(container)
+                cargo = presort[destination].get_many(truck_storage_capacity)
                 env.process(truck.deliver_cargo(G,node.name,destination,cargo))
             else:
                 break
-        yield env.timeout(interval)
+
+        # wait until the next check, or until the patience of a waiting truck driver runs out
+        deadline = None
+        if dispatch_mode == 'event' and node.available_trucks[0]:
+            deadline = min(other_truck.idle_since for other_truck in node.available_trucks[0]) + patience
+        yield _next_check(env,node,interval,dispatch_mode,deadline)
 
 def protocol_urgency(G,env,parameters,nodename):
     """Urgency-based protocol
@@ -171,38 +288,47 @@ def protocol_urgency(G,env,parameters,nodename):
         Name of the node at which the protocol is running
     """
 
-    logging.debug('%.2f | Node %s | initializing protocol...', env.now, nodename)
+    if tracing.enabled:
+        tracing.emit(env.now, 'protocol_init_start', nodename)
 
     # dispatch deadline calculator
-    def dispatch_deadline(nextnode,length,path):
+    def dispatch_deadline(nextnode):
         scale = 1.2
-        due_date = presort[nextnode].items[0].priority
-        finalnode = presort[nextnode].items[0].item[1]
-        delivery_time_estimate = length[finalnode]+2*scale*truck_storage_capacity*handling_time*(len(path[finalnode])-1)
+        due_date = presort[nextnode].items[0].due
+        finalnode = presort[nextnode].items[0].target
+        delivery_time_estimate = routing.length(nodename,finalnode)+2*scale*truck_storage_capacity*handling_time*routing.num_hops(nodename,finalnode)
         return due_date-delivery_time_estimate
 
     ## load parameters
     interval = float(parameters['protocol_interval'])
+    dispatch_mode = _dispatch_mode(parameters)
     truck_storage_capacity = float(parameters['truck_storage_capacity'])
     handling_time = float(parameters['handling_time'])
 
     ## initialise node inventory
-    node = G.nodes[nodename]['node']
-    presort = {nextnode:simpy.PriorityStore(env) for nextnode in G.neighbors(node.name)}
+    node = G.graph['model'].node[nodename]
+    presort = {nextnode:ContainerQueue() for nextnode in G.neighbors(node.name)}
+    node.queues = presort
     
-    ## Calculate shortest paths
-    length,path = nx.single_source_dijkstra(G, nodename)
+    ## shortest paths from the shared routing table
+    routing = G.graph['routing']
 
-    logging.debug('%.2f | Node %s | protocol initialized', env.now, nodename)
+    if tracing.enabled:
+        tracing.emit(env.now, 'protocol_init_end', nodename)
 
     while True:
         
-        logging.debug('%.2f | Node %s | checking dispatch rules...', env.now, nodename)
+        if tracing.enabled:
+            tracing.emit(env.now, 'protocol_check', nodename)
+
+        # in event mode, every arrival from now on triggers the next check
+        if dispatch_mode == 'event':
+            node.activity = env.event()
 
         # sort newly arrived containers based on next destination in shortest path
         for container in node.arrived_containers:
-            nextnode =  path[container.item[1]][1]
-            yield presort[nextnode].put(container)
+            nextnode = routing.next_node(nodename, container.target)
+            presort[nextnode].put(container)
         node.arrived_containers = []
 
         # send out trucks
@@ -212,33 +338,38 @@ def protocol_urgency(G,env,parameters,nodename):
             # Rule 1
             if node.available_trucks[0]:
                 truck = node.available_trucks[0].pop(0)
-                destination = truck.name.split('_')[0]
-                logging.debug('%.2f | Node %s | send %s to Node %s: not our truck', env.now, nodename, truck, destination)
+                destination = truck.home
+                if tracing.enabled:
+                    tracing.emit(env.now, 'dispatch', nodename, truck.name, destination, reason='not our truck')
 
             # Rule 2
             if not truck and node.available_trucks[1]:
                 destination = max(presort, key= lambda x: len(presort[x].items))
                 if len(presort[destination].items) >= truck_storage_capacity:
                     truck = node.available_trucks[1].pop(0)
-                    logging.debug('%.2f | Node %s | send %s to Node %s: possible to fill', env.now, nodename, truck, destination)
+                    if tracing.enabled:
+                        tracing.emit(env.now, 'dispatch', nodename, truck.name, destination, reason='possible to fill')
 
             # Rule 4
             if not truck and node.available_trucks[1]:
-                dispatchdeadline = {x:dispatch_deadline(x,length,path) for x in presort.keys() if presort[x].items}
+                dispatchdeadline = {x:dispatch_deadline(x) for x in presort.keys() if presort[x].items}
                 if dispatchdeadline and min(dispatchdeadline.values()) - env.now < 0:
                     truck = node.available_trucks[1].pop(0)
                     destination = min(dispatchdeadline, key= lambda x: dispatchdeadline[x])
-                    logging.debug('%.2f | Node %s | send %s to Node %s: urgent container delivery', env.now, nodename, truck, destination)
+                    if tracing.enabled:
+                        tracing.emit(env.now, 'dispatch', nodename, truck.name, destination, reason='urgent container delivery')
 
             if truck:
-                cargo = []
-                while len(cargo) < truck_storage_capacity and presort[destination].items:
-                        container = yield presort[destination].get()
-                        cargo.append(container)
+                cargo = presort[destination].get_many(truck_storage_capacity)
                 env.process(truck.deliver_cargo(G,node.name,destination,cargo))
             else:
                 break
-        yield env.timeout(interval)
+
+        # wait until the next check, or until the first dispatch deadline passes
+        deadline = None
+        if dispatch_mode == 'event' and node.available_trucks[1]:
+            deadline = min([dispatch_deadline(x) for x in presort.keys() if presort[x].items], default=None)
+        yield _next_check(env,node,interval,dispatch_mode,deadline)
 
 def protocol_information(G,env,parameters,edges,nodename):
     """Volume-based protocol with information about incoming trucks at neighbors
@@ -255,62 +386,59 @@ def protocol_information(G,env,parameters,edges,nodename):
         Parameters of the simulation
 
     edges : Pandas DataFrame
-        An edge list representation of a graph
+        An edge list representation of a graph (unused, the edge weights are taken from G)
 
     nodename : str
         Name of the node at which the protocol is running
     """
 
-    logging.debug('%.2f | Node %s | initializing protocol...', env.now, nodename)
+    if tracing.enabled:
+        tracing.emit(env.now, 'protocol_init_start', nodename)
 
     # load parameters
     interval = float(parameters['protocol_interval'])
+    dispatch_mode = _dispatch_mode(parameters)
     handling_time = float(parameters['handling_time'])
     truck_storage_capacity = float(parameters['truck_storage_capacity'])
 
     # initialize node inventory
-    node = G.nodes[nodename]['node']
-    heaps = {finalnode:simpy.PriorityStore(env) for finalnode in G.nodes}
+    node = G.graph['model'].node[nodename]
+    heaps = {finalnode:ContainerQueue() for finalnode in G.nodes}
+    node.queues = heaps
     heaps.pop(nodename)
 
-    logging.debug('%.2f | Node %s | protocol initialized', env.now, nodename)
+    # shortest paths from this node, updated with the delays at the neighbors
+    with timed(env, 'routing init', nodename):
+        routing = DynamicRouting(G,nodename,G.graph['routing'])
+    update_routing = profiled(env, routing.update, 'routing update', nodename)
+
+    if tracing.enabled:
+        tracing.emit(env.now, 'protocol_init_end', nodename)
 
     while True:
 
-        logging.debug('%.2f | Node %s | checking dispatch rules...', env.now, nodename)
+        if tracing.enabled:
+            tracing.emit(env.now, 'protocol_check', nodename)
 
-        # make a copy of graph edges
-        H = nx.from_pandas_edgelist(edges, edge_attr=True)
+        # in event mode, every arrival from now on triggers the next check
+        if dispatch_mode == 'event':
+            node.activity = env.event()
 
-        # edit edge weights with given information
+        # edit edge weights with given information, paths are only recalculated if a next hop can change
         processing_time = handling_time*truck_storage_capacity
-        for nextnode in G.neighbors(node.name):
-            estimated_arrival = env.now + G[node.name][nextnode]['weight']
-            delaying_trucks = []
-            for arrival in G.nodes[nextnode]['node'].incoming_trucks.values():
-                if estimated_arrival-processing_time < arrival < estimated_arrival:
-                    delaying_trucks.append(arrival)
-            if len(delaying_trucks) >= G.nodes[nextnode]['node'].forklifts.capacity:
-                first_arrival = min(delaying_trucks)
-                min_unavailable = processing_time*(len(delaying_trucks)//G.nodes[nextnode]['node'].forklifts.capacity)
-                min_delay = round(first_arrival+min_unavailable-estimated_arrival,2)
-                if min_delay>0:
-                    H[node.name][nextnode]['weight'] += min_delay
-
-        # calculate shortest paths
-        _,path = nx.single_source_dijkstra(H, nodename)
+        update_routing(_neighbor_delays(G,env,node,processing_time))
 
         # assign new containers to heaps based on final destination
         for container in node.arrived_containers:
-            finalnode = container.item[1]
-            yield heaps[finalnode].put(container)
+            finalnode = container.target
+            heaps[finalnode].put(container)
         node.arrived_containers = []
 
         # group final node heaps containing items by next node in shortest path
         nextnode_finalnodes = {nextnode:[] for nextnode in G.neighbors(node.name)}
         for finalnode in heaps.keys():
             if heaps[finalnode].items:
-                nextnode = path[finalnode][1]
+                nextnode = routing.next_node(finalnode)
                 nextnode_finalnodes[nextnode].append(finalnode)
         
         # send out trucks
@@ -320,27 +448,26 @@ def protocol_information(G,env,parameters,edges,nodename):
             # Rule 1
             if node.available_trucks[0]:
                 truck = node.available_trucks[0].pop(0)
-                destination = truck.name.split('_')[0]
-                logging.debug('%.2f | Node %s | send %s to Node %s: not our truck', env.now, nodename, truck, destination)
+                destination = truck.home
+                if tracing.enabled:
+                    tracing.emit(env.now, 'dispatch', nodename, truck.name, destination, reason='not our truck')
 
             # Rule 2
             if not truck and node.available_trucks[1]:
                 destination = max(nextnode_finalnodes, key= lambda dest: sum([len(heaps[x].items) for x in nextnode_finalnodes[dest]]))
                 if sum([len(heaps[x].items) for x in nextnode_finalnodes[destination]]) >= truck_storage_capacity:
                     truck = node.available_trucks[1].pop(0)
-                    logging.debug('%.2f | Node %s | send %s to Node %s: possible to fill', env.now, nodename, truck, destination)
+                    if tracing.enabled:
+                        tracing.emit(env.now, 'dispatch', nodename, truck.name, destination, reason='possible to fill')
                     
             if truck:
-                cargo = []
-                while len(cargo) < truck_storage_capacity and any([heaps[x].items for x in nextnode_finalnodes[destination]]):
-                    nonempty_heaps = [x for x in nextnode_finalnodes[destination] if heaps[x].items]
-                    finalnode = min(nonempty_heaps, key= lambda x: heaps[x].items[0].priority)
-                    container = yield heaps[finalnode].get()
-                    cargo.append(container)
+                cargo = ContainerQueue.get_many_from([heaps[x] for x in nextnode_finalnodes[destination]], truck_storage_capacity)
                 env.process(truck.deliver_cargo(G,node.name,destination,cargo))
             else:
                 break
-        yield env.timeout(interval)
+
+        # wait until the next check
+        yield _next_check(env,node,interval,dispatch_mode)
 
 def protocol_information_urgency(G,env,parameters,edges,nodename):
     """Urgency-based protocol with information about incoming trucks at neighbors
@@ -357,68 +484,65 @@ def protocol_information_urgency(G,env,parameters,edges,nodename):
         Parameters of the simulation
 
     edges : Pandas DataFrame
-        An edge list representation of a graph
+        An edge list representation of a graph (unused, the edge weights are taken from G)
 
     nodename : str
         Name of the node at which the protocol is running
     """
-    logging.debug('%.2f | Node %s | initializing protocol...', env.now, nodename)
+    if tracing.enabled:
+        tracing.emit(env.now, 'protocol_init_start', nodename)
 
     # load parameters
     interval = float(parameters['protocol_interval'])
+    dispatch_mode = _dispatch_mode(parameters)
     handling_time = float(parameters['handling_time'])
     truck_storage_capacity = float(parameters['truck_storage_capacity'])
 
     # initialize node inventory
-    node = G.nodes[nodename]['node']
-    heaps = {finalnode:simpy.PriorityStore(env) for finalnode in G.nodes}
+    node = G.graph['model'].node[nodename]
+    heaps = {finalnode:ContainerQueue() for finalnode in G.nodes}
+    node.queues = heaps
     heaps.pop(nodename)
 
+    # shortest paths from this node, updated with the delays at the neighbors
+    with timed(env, 'routing init', nodename):
+        routing = DynamicRouting(G,nodename,G.graph['routing'])
+    update_routing = profiled(env, routing.update, 'routing update', nodename)
+
     # dispatch deadline calculator
-    def dispatch_deadline(finalnode,length,path):
+    def dispatch_deadline(finalnode):
         scale = 1.2
-        due_date = heaps[finalnode].items[0].priority
-        delivery_time_estimate = length[finalnode]+2*scale*truck_storage_capacity*handling_time*(len(path[finalnode])-1)
+        due_date = heaps[finalnode].items[0].due
+        delivery_time_estimate = routing.length(finalnode)+2*scale*truck_storage_capacity*handling_time*routing.num_hops(finalnode)
         return due_date-delivery_time_estimate
 
-    logging.debug('%.2f | Node %s | protocol initialized', env.now, nodename)
+    if tracing.enabled:
+        tracing.emit(env.now, 'protocol_init_end', nodename)
 
     while True:
 
-        logging.debug('%.2f | Node %s | checking dispatch rules...', env.now, nodename)
+        if tracing.enabled:
+            tracing.emit(env.now, 'protocol_check', nodename)
 
-        # make a copy of graph edges
-        H = nx.from_pandas_edgelist(edges, edge_attr=True)
+        # in event mode, every arrival from now on triggers the next check
+        if dispatch_mode == 'event':
+            node.activity = env.event()
 
-        # edit edge weights with given information
+        # edit edge weights with given information, paths are only recalculated if a next hop can change
         processing_time = handling_time*truck_storage_capacity
-        for nextnode in G.neighbors(node.name):
-            estimated_arrival = env.now + G[node.name][nextnode]['weight']
-            delaying_trucks = []
-            for arrival in G.nodes[nextnode]['node'].incoming_trucks.values():
-                if estimated_arrival-processing_time < arrival < estimated_arrival:
-                    delaying_trucks.append(arrival)
-            if len(delaying_trucks) >= G.nodes[nextnode]['node'].forklifts.capacity:
-                first_arrival = min(delaying_trucks)
-                min_unavailable = processing_time*(len(delaying_trucks)//G.nodes[nextnode]['node'].forklifts.capacity)
-                min_delay = round(first_arrival+min_unavailable-estimated_arrival,2)
-                if min_delay>0:
-                    H[node.name][nextnode]['weight'] += min_delay
-        
-        # calculate shortest paths
-        length,path = nx.single_source_dijkstra(H, nodename)
+        update_routing(_neighbor_delays(G,env,node,processing_time))
 
         # assign new containers to heaps based on final destination
         for container in node.arrived_containers:
-            finalnode = container.item[1]
-            yield heaps[finalnode].put(container)
+            finalnode = container.target
+            heaps[finalnode].put(container)
         node.arrived_containers = []
 
         # group final node heaps containing items by next node in shortest path
         nextnode_finalnodes = {nextnode:[] for nextnode in G.neighbors(node.name)}
         for finalnode in heaps.keys():
             if heaps[finalnode].items:
-                nextnode = path[finalnode][1]
+                nextnode = routing.next_node(finalnode)
                 nextnode_finalnodes[nextnode].append(finalnode)
         
         # send out trucks
@@ -428,36 +552,39 @@ def protocol_information_urgency(G,env,parameters,edges,nodename):
             # Rule 1
             if node.available_trucks[0]:
                 truck = node.available_trucks[0].pop(0)
-                destination = truck.name.split('_')[0]
-                logging.debug('%.2f | Node %s | send %s to Node %s: not our truck', env.now, nodename, truck, destination)
+                destination = truck.home
+                if tracing.enabled:
+                    tracing.emit(env.now, 'dispatch', nodename, truck.name, destination, reason='not our truck')
 
             # Rule 2
             if not truck and node.available_trucks[1]:
                 destination = max(nextnode_finalnodes, key= lambda dest: sum([len(heaps[x].items) for x in nextnode_finalnodes[dest]]))
                 if sum([len(heaps[x].items) for x in nextnode_finalnodes[destination]]) >= truck_storage_capacity:
                     truck = node.available_trucks[1].pop(0)
-                    logging.debug('%.2f | Node %s | send %s to Node %s: possible to fill', env.now, nodename, truck, destination)
+                    if tracing.enabled:
+                        tracing.emit(env.now, 'dispatch', nodename, truck.name, destination, reason='possible to fill')
 
             # Rule 4      
             if not truck and node.available_trucks[1]:
-                dispatchdeadlines_heaps = {x:dispatch_deadline(x,length,path) if heaps[x].items else env.now+1 for x in heaps.keys()}
+                dispatchdeadlines_heaps = {x:dispatch_deadline(x) if heaps[x].items else env.now+1 for x in heaps.keys()}
                 dispatchdeadline = {y:min([dispatchdeadlines_heaps[x] for x in nextnode_finalnodes[y]]) for y in nextnode_finalnodes.keys() if nextnode_finalnodes[y]}
                 if dispatchdeadline and min(dispatchdeadline.values()) - env.now < 0:
                     truck = node.available_trucks[1].pop(0)
                     destination = min(dispatchdeadline, key= lambda x: dispatchdeadline[x])
-                    logging.debug('%.2f | Node %s | send %s to Node %s: urgent container delivery', env.now, nodename, truck, destination)
+                    if tracing.enabled:
+                        tracing.emit(env.now, 'dispatch', nodename, truck.name, destination, reason='urgent container delivery')
 
             if truck:
-                cargo = []
-                while len(cargo) < truck_storage_capacity and any([heaps[x].items for x in nextnode_finalnodes[destination]]):
-                    nonempty_heaps = [x for x in nextnode_finalnodes[destination] if heaps[x].items]
-                    finalnode = min(nonempty_heaps, key= lambda x: heaps[x].items[0].priority)
-                    container = yield heaps[finalnode].get()
-                    cargo.append(container)
+                cargo = ContainerQueue.get_many_from([heaps[x] for x in nextnode_finalnodes[destination]], truck_storage_capacity)
                 env.process(truck.deliver_cargo(G,node.name,destination,cargo))
             else:
                 break
-        yield env.timeout(interval)
+
+        # wait until the next check, or until the first dispatch deadline passes
+        deadline = None
+        if dispatch_mode == 'event' and node.available_trucks[1]:
+            deadline = min([dispatch_deadline(x) for x in heaps.keys() if heaps[x].items], default=None)
+        yield _next_check(env,node,interval,dispatch_mode,deadline)
 
 def protocol_consolidation(G,env,parameters,nodename):
     """Urgency-based protocol that allows sub-optimal routes
@@ -477,52 +604,73 @@ def protocol_consolidation(G,env,parameters,nodename):
         Name of the node at which the protocol is running
     """
 
-    logging.debug('%.2f | Node %s | initializing protocol...', env.now, nodename)
+    if tracing.enabled:
+        tracing.emit(env.now, 'protocol_init_start', nodename)
 
     # load parameters
     interval = float(parameters['protocol_interval'])
+    dispatch_mode = _dispatch_mode(parameters)
     handling_time = float(parameters['handling_time'])
     truck_storage_capacity = float(parameters['truck_storage_capacity'])
 
     # initialize node inventory
-    node = G.nodes[nodename]['node']
-    heaps = {finalnode:simpy.PriorityStore(env) for finalnode in G.nodes}
+    node = G.graph['model'].node[nodename]
+    heaps = {finalnode:ContainerQueue() for finalnode in G.nodes}
+    node.queues = heaps
     heaps.pop(node.name)
 
+    # shortest paths from the shared routing table, also used for the paths starting at each neighbor
+    routing = G.graph['routing']
+
     # dispatch deadline calculator
-    def dispatch_deadline(finalnode,length,path):
+    def dispatch_deadline(finalnode):
         scale = 1.2
-        due_date = heaps[finalnode].items[0].priority
-        delivery_time_estimate = length[finalnode]+2*scale*truck_storage_capacity*handling_time*(len(path[finalnode])-1)
+        due_date = heaps[finalnode].items[0].due
+        delivery_time_estimate = routing.length(node.name,finalnode)+2*scale*truck_storage_capacity*handling_time*routing.num_hops(node.name,finalnode)
         return due_date-delivery_time_estimate
 
-    # calculate shortest paths starting from source
-    length,path = nx.single_source_dijkstra(G, node.name)
-
-    # calculate shortest paths starting at each neighbor
-    neighbor_pathlen = {nextnode:nx.single_source_dijkstra(G, nextnode)[0] for nextnode in G.neighbors(node.name)}
+    # neighbors of this node in the compiled network model
+    model = G.graph['model']
+    i = model.index[nodename]
+    neighbor_ids = model.indices[model.indptr[i]:model.indptr[i+1]]
+    neighbor_weights = model.weight[i,neighbor_ids]
+    nextnodes = [model.names[j] for j in neighbor_ids]
+
+    # next nodes within a margin of the shortest path to a final node, calculated once as the paths do not change
+    allowed = dict()
+    def allowed_nextnodes(margin,finalnode):
+        if (margin,finalnode) not in allowed:
+            j = routing.index[finalnode]
+            via_nextnode = routing.distance[neighbor_ids,j] + neighbor_weights
+            allowed[(margin,finalnode)] = [nextnodes[n] for n in np.flatnonzero(via_nextnode <= routing.distance[i,j] + margin)]
+        return allowed[(margin,finalnode)]
 
     # group final node heaps by next node(s) in shortest path(s)
-    def allocate_heaps(margin,G=G,node=node,heaps=heaps,neighbor_pathlen=neighbor_pathlen,length=length):
-        nextnode_finalnodes = {nextnode:[] for nextnode in G.neighbors(node.name)}
+    def allocate_heaps(margin):
+        nextnode_finalnodes = {nextnode:[] for nextnode in nextnodes}
         for finalnode in heaps.keys():
             if heaps[finalnode].items:
-                optimal_pathlen = length[finalnode]
-                for nextnode in G.neighbors(node.name):
-                    if neighbor_pathlen[nextnode][finalnode] + G[node.name][nextnode]['weight'] <= optimal_pathlen + margin:
-                        nextnode_finalnodes[nextnode].append(finalnode)
+                for nextnode in allowed_nextnodes(margin,finalnode):
+                    nextnode_finalnodes[nextnode].append(finalnode)
         return nextnode_finalnodes
+    allocate_heaps = profiled(env, allocate_heaps, 'routing allocate_heaps', nodename)
 
-    logging.debug('%.2f | Node %s | protocol initialized', env.now, nodename)
+    if tracing.enabled:
+        tracing.emit(env.now, 'protocol_init_end', nodename)
 
     while True:
 
-        logging.debug('%.2f | Node %s | checking dispatch rules...', env.now, nodename)
+        if tracing.enabled:
+            tracing.emit(env.now, 'protocol_check', nodename)
+
+        # in event mode, every arrival from now on triggers the next check
+        if dispatch_mode == 'event':
+            node.activity = env.event()
 
         # assign new containers to heaps based on final destination
         for container in node.arrived_containers:
-            finalnode = container.item[1]
-            yield heaps[finalnode].put(container)
+            finalnode = container.target
+            heaps[finalnode].put(container)
         node.arrived_containers = []
         
         nextnode_finalnodes_opt = allocate_heaps(0)
@@ -538,15 +686,17 @@ def protocol_consolidation(G,env,parameters,nodename):
             # Rule 1
             if node.available_trucks[0]:
                 truck = node.available_trucks[0].pop(0)
-                destination = truck.name.split('_')[0]
-                logging.debug('%.2f | Node %s | send %s to Node %s: not our truck', env.now, nodename, truck, destination)
+                destination = truck.home
+                if tracing.enabled:
+                    tracing.emit(env.now, 'dispatch', nodename, truck.name, destination, reason='not our truck')
 
             # Rule 2
             if not truck and node.available_trucks[1]:
                 destination = max(nextnode_finalnodes, key= lambda dest: sum([len(heaps[x].items) for x in nextnode_finalnodes[dest]]))
                 if sum([len(heaps[x].items) for x in nextnode_finalnodes[destination]]) >= truck_storage_capacity:
                     truck = node.available_trucks[1].pop(0)
-                    logging.debug('%.2f | Node %s | send %s to Node %s: possible to fill', env.now, nodename, truck, destination)
+                    if tracing.enabled:
+                        tracing.emit(env.now, 'dispatch', nodename, truck.name, destination, reason='possible to fill')
 
             # relax the optimality
             nextnode_finalnodes = nextnode_finalnodes_margin
@@ -556,25 +706,57 @@ def protocol_consolidation(G,env,parameters,nodename):
                 destination = max(nextnode_finalnodes, key= lambda dest: sum([len(heaps[x].items) for x in nextnode_finalnodes[dest]]))
                 if sum([len(heaps[x].items) for x in nextnode_finalnodes[destination]]) >= truck_storage_capacity:
                     truck = node.available_trucks[1].pop(0)
-                    logging.debug('%.2f | Node %s | send %s to Node %s: possible to fill with suboptimal flows', env.now, nodename, truck, destination)
+                    if tracing.enabled:
+                        tracing.emit(env.now, 'dispatch', nodename, truck.name, destination, reason='possible to fill with suboptimal flows')
 
             # Rule 4
             if not truck and node.available_trucks[1]:
-                dispatchdeadlines_heaps = {x:dispatch_deadline(x,length,path) if heaps[x].items else env.now+1 for x in heaps.keys()}
+                dispatchdeadlines_heaps = {x:dispatch_deadline(x) if heaps[x].items else env.now+1 for x in heaps.keys()}
                 dispatchdeadline = {y:min([dispatchdeadlines_heaps[x] for x in nextnode_finalnodes[y]]) for y in nextnode_finalnodes.keys() if nextnode_finalnodes[y]}
                 if dispatchdeadline and min(dispatchdeadline.values()) - env.now < 0:
                     truck = node.available_trucks[1].pop(0)
                     destination = min(dispatchdeadline, key= lambda x: dispatchdeadline[x])
-                    logging.debug('%.2f | Node %s | send %s to Node %s: urgent container delivery', env.now, nodename, truck, destination)
+                    if tracing.enabled:
+                        tracing.emit(env.now, 'dispatch', nodename, truck.name, destination, reason='urgent container delivery')
                     
             if truck:
-                cargo = []
-                while len(cargo) < truck_storage_capacity and any([heaps[x].items for x in nextnode_finalnodes[destination]]):
-                    nonempty_heaps = [x for x in nextnode_finalnodes[destination] if heaps[x].items]
-                    finalnode = min(nonempty_heaps, key= lambda x: heaps[x].items[0].priority)
-                    container = yield heaps[finalnode].get()
-                    cargo.append(container)
+                cargo = ContainerQueue.get_many_from([heaps[x] for x in nextnode_finalnodes[destination]], truck_storage_capacity)
                 env.process(truck.deliver_cargo(G,node.name,destination,cargo))
             else:
                 break
-        yield env.timeout(interval)
\ No newline at end of file
+
+        # wait until the next check, or until the first dispatch deadline passes
+        deadline = None
+        if dispatch_mode == 'event' and node.available_trucks[1]:
+            deadline = min([dispatch_deadline(x) for x in heaps.keys() if heaps[x].items], default=None)
+        yield _next_check(env,node,interval,dispatch_mode,deadline)
+
+def get_protocol(name, edges=None, patience=2):
+    """Returns the protocol function of a protocol name, called with (G,env,parameters,nodename) like protocol_volume
+
+    Parameters
+    ----------
+    name : str
+        Name of the protocol, one of PROTOCOL_NAMES, with or without the 'protocol_' prefix
+
+    edges : Pandas DataFrame, optional
+        An edge list representation of the graph, required by the information protocols
+
+    patience : float
+        Patience of protocol_patience
+    """
+
+    name = name[len('protocol_'):] if name.startswith('protocol_') else name
+    if name == 'volume':
+        return protocol_volume
+    if name == 'patience':
+        return lambda G,env,parameters,nodename: protocol_patience(G,env,parameters,nodename,patience)
+    if name == 'urgency':
+        return protocol_urgency
+    if name == 'information':
+        return lambda G,env,parameters,nodename: protocol_information(G,env,parameters,edges,nodename)
+    if name == 'information_urgency':
+        return lambda G,env,parameters,nodename: protocol_information_urgency(G,env,parameters,edges,nodename)
+    if name == 'consolidation':
+        return protocol_consolidation
+    raise ValueError(f"unknown protocol '{name}', choose from {', '.join(PROTOCOL_NAMES)}")
@@ -0,0 +1,97 @@
+import numpy as np
+import random
+import zlib
+
+class RandomStreams():
+
+    def __init__(self, seed=None):
+        """Seed hierarchy of one simulation run
+
+        Every stochastic component gets its own random number stream, derived from the
+        run seed with a NumPy SeedSequence and a key such as ('orders', 3). A stream only
+        depends on the run seed and its key, so the same order gets the same arrivals in
+        every run with the same seed (common random numbers), whatever else changes.
+        Every stream is created once, so the states of all streams can be saved and
+        restored (see get_state and set_state).
+
+        Parameters
+        ----------
+        seed : int, optional
+            Run seed. Fresh entropy is drawn when None, see the seed attribute.
+        """
+
+        self.root = np.random.SeedSequence(seed)
+        self.seed = self.root.entropy
+        self.streams = dict() # (kind, name, *index) => random number generator
+
+    def __repr__(self):
+        return f'RandomStreams (seed {self.seed})'
+
+    def sequence(self, name, *index):
+        """Returns the SeedSequence of one stream
+
+        Parameters
+        ----------
+        name : str
+            Name of the stochastic component, e.g. 'orders' or 'handling'
+
+        *index : int
+            Position of the stream within the component, e.g. the order number
+        """
+
+        key = (zlib.crc32(name.encode()),) + tuple(int(x) for x in index)
+        return np.random.SeedSequence(self.seed, spawn_key=key)
+
+    def generator(self, name, *index):
+        """Returns the NumPy Generator of one stream, see sequence"""
+
+        key = ('generator', name) + index
+        if key not in self.streams:
+            self.streams[key] = np.random.default_rng(self.sequence(name, *index))
+        return self.streams[key]
+
+    def random(self, name, *index):
+        """Returns the random.Random instance of one stream, see sequence"""
+
+        key = ('random', name) + index
+        if key not in self.streams:
+            state = self.sequence(name, *index).generate_state(4)
+            self.streams[key] = random.Random(int.from_bytes(state.tobytes(), 'little'))
+        return self.streams[key]
+
+    def get_state(self):
+        """Returns the current state of every stream"""
+
+        return {key:(rng.getstate() if key[0] == 'random' else rng.bit_generator.state) for key, rng in self.streams.items()}
+
+    def set_state(self, states):
+        """Restores the states of the streams, see get_state. States of streams that were not created are ignored.
+
+        Parameters
+        ----------
+        states : dict
+            State of every stream
+        """
+
+        for key, state in states.items():
+            rng = self.streams.get(key)
+            if rng is None:
+                continue
+            if key[0] == 'random':
+                rng.setstate(state)
+            else:
+                rng.bit_generator.state = state
+
+def replication_seeds(seed, amount):
+    """Returns independent run seeds for a number of replications, derived from one base seed
+
+    Parameters
+    ----------
+    seed : int
+        Base seed of the replications
+
+    amount : int
+        Number of replications
+    """
+
+    return [int(child.generate_state(1, np.uint64)[0]) for child in np.random.SeedSequence(seed).spawn(amount)]
@@ -0,0 +1,112 @@
+from main.sweep import run_sweep
+from main.random_streams import RandomStreams, replication_seeds
+from main.confidence import confidence_interval, relative_halfwidth
+import math
+import json
+import os
+
+# KPIs returned by run_simulation that are estimated over the replications
+REPLICATION_KPIS = ('ontime_fraction', 'total_drivingtime')
+
+def run_replications(folder, orderfreq_mult, output_folder, seed=None, target=0.05, level=0.95,
+                     min_replications=3, max_replications=30, workers=None, kpis=REPLICATION_KPIS, **kwargs):
+    """Runs independent replications of one scenario until the confidence intervals of the KPIs are tight enough.
+
+    Every replication is a run with its own seed, derived from one base seed. The KPIs
+    of the replications are independent samples, so their t-confidence intervals are
+    valid, unlike the intervals over the autocorrelated deliveries of one run. After each
+    batch of replications the number of replications that is still needed is estimated
+    from the current relative half-widths, and the next batch is run in parallel. The
+    batch is rounded up to a multiple of workers, but not beyond the number of
+    replications that were already run. The replications stop when the relative
+    half-width of every KPI is at most target, or when max_replications is reached.
+
+    The seeds, the KPIs of every replication and the confidence intervals are saved in
+    replications.json. Returns the same information as a dictionary.
+
+    Parameters
+    ----------
+    folder : str
+        Path of the network folder, e.g. 'networks/network-test-volume'
+
+    orderfreq_mult : float
+        Multiplier of the order frequencies in orders.csv
+
+    output_folder : str
+        Folder of the replications, every replication is saved in a subfolder replication_<i>
+
+    seed : int, optional
+        Base seed of the replications. Fresh entropy is used when None.
+
+    target : float
+        Target relative half-width of the confidence intervals, e.g. 0.05 for +-5% of the mean
+
+    level : float
+        Confidence level of the intervals
+
+    min_replications : int
+        Number of replications of the first batch, at least 2
+
+    max_replications : int
+        Maximum number of replications
+
+    workers : int, optional
+        Number of worker processes. Defaults to the number of CPUs.
+
+    kpis : tuple
+        KPIs of run_simulation of which the confidence intervals must reach the target
+
+    **kwargs
+        Extra keyword arguments passed to run_simulation, e.g. protocol
+    """
+
+    workers = workers or os.cpu_count()
+    base_seed = RandomStreams(seed).seed
+    seeds = replication_seeds(base_seed, max_replications)
+    os.makedirs(output_folder, exist_ok=True)
+
+    replications = []
+    intervals = dict()
+    converged = False
+    started = 0
+    while started < max_replications:
+
+        # size of the next batch
+        if len(replications) < max(min_replications, 2):
+            amount = max(min_replications, 2) - len(replications)
+        else:
+            needed = max(math.ceil(len(replications)*(interval['relative_halfwidth']/target)**2) for interval in intervals.values())
+            missing = max(needed-len(replications), 1)
+            # fill the workers, but at most double the replications in one batch
+            amount = min(math.ceil(missing/workers)*workers, max(missing, len(replications)))
+        amount = min(amount, max_replications-started)
+
+        jobs = [{'folder': folder, 'orderfreq_mult': orderfreq_mult, 'output_folder': f'{output_folder}/replication_{idx}', 'seed': seeds[idx]}
+                for idx in range(started, started+amount)]
+        results = run_sweep(jobs, workers, **kwargs)
+        for idx, result in enumerate(results, started):
+            if 'error' not in result and all(result.get(kpi) is not None for kpi in kpis):
+                replications.append({'replication': idx, 'seed': seeds[idx], **{kpi:result[kpi] for kpi in kpis}})
+        started += amount
+
+        # confidence intervals over the replications
+        if len(replications) < 2:
+            continue
+        for kpi in kpis:
+            mean, halfwidth = confidence_interval([replication[kpi] for replication in replications], level)
+            intervals[kpi] = {'mean': mean, 'halfwidth': halfwidth, 'relative_halfwidth': relative_halfwidth(mean, halfwidth)}
+            print(f"{kpi} = {mean:.4f} +- {halfwidth:.4f} ({intervals[kpi]['relative_halfwidth']*100:.2f}%, {len(replications)} replications)")
+        if all(interval['relative_halfwidth'] <= target for interval in intervals.values()):
+            converged = True
+            break
+
+    if converged:
+        print(f'Target relative half-width {target*100:.1f}% reached after {len(replications)} replications')
+    else:
+        print(f'Target relative half-width {target*100:.1f}% not reached after {len(replications)} replications')
+
+    summary = {'folder': folder, 'orderfreq_mult': orderfreq_mult, 'seed': base_seed, 'level': level, 'target': target,
+               'converged': converged, 'intervals': intervals, 'replications': replications}
+    with open(f'{output_folder}/replications.json', 'w') as file:
+        json.dump(summary, file, indent=1)
+    return summary
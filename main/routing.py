@@ -0,0 +1,240 @@
+import networkx as nx
+import numpy as np
+
+class RoutingTable():
+
+    def __init__(self, G):
+        """All-pairs shortest path routing table of a graph
+
+        The table is built once with one Dijkstra run per node. Nodes are indexed by
+        integer IDs, in the order of G.nodes:
+
+        - names[i]: name of node i
+        - index[name]: ID of a node
+        - distance[i,j]: shortest path length from node i to node j (inf if unreachable)
+        - next_hop[i,j]: ID of the next node on the shortest path from i to j (-1 if unreachable)
+        - hops[i,j]: number of edges on the shortest path from i to j (-1 if unreachable)
+
+        The lookups of a path raise a NetworkXNoPath exception if the target cannot be
+        reached from the source, like the NetworkX shortest path functions.
+
+        Parameters
+        ----------
+        G : NetworkX Graph
+            Graph with a 'weight' attribute on every edge
+        """
+
+        self.names = list(G.nodes)
+        self.index = {name:idx for idx,name in enumerate(self.names)}
+
+        size = len(self.names)
+        self.distance = np.full((size,size), np.inf)
+        self.next_hop = np.full((size,size), -1, dtype=np.int32)
+        self.hops = np.full((size,size), -1, dtype=np.int32)
+
+        for source, (length, path) in nx.all_pairs_dijkstra(G):
+            i = self.index[source]
+            for target, pathlen in length.items():
+                j = self.index[target]
+                self.distance[i,j] = pathlen
+                self.hops[i,j] = len(path[target])-1
+                self.next_hop[i,j] = self.index[path[target][1]] if i != j else i
+
+    def __repr__(self):
+        return f'RoutingTable ({len(self.names)} nodes)'
+
+    def _pair(self, source, target):
+        i, j = self.index[source], self.index[target]
+        if self.next_hop[i,j] < 0:
+            raise nx.NetworkXNoPath(f'node {target} not reachable from {source}')
+        return i, j
+
+    def next_node(self, source, target):
+        """Returns the name of the next node on the shortest path from source to target
+
+        Parameters
+        ----------
+        source : str
+            Name of the start node
+
+        target : str
+            Name of the destination node
+        """
+
+        return self.names[self.next_hop[self._pair(source, target)]]
+
+    def length(self, source, target):
+        """Returns the shortest path length from source to target
+
+        Parameters
+        ----------
+        source : str
+            Name of the start node
+
+        target : str
+            Name of the destination node
+        """
+
+        return float(self.distance[self._pair(source, target)])
+
+    def num_hops(self, source, target):
+        """Returns the number of edges on the shortest path from source to target
+
+        Parameters
+        ----------
+        source : str
+            Name of the start node
+
+        target : str
+            Name of the destination node
+        """
+
+        return int(self.hops[self._pair(source, target)])
+
+class DynamicRouting():
+
+    def __init__(self, G, source, routing):
+        """Shortest paths from one source node while the weights of its outgoing edges change
+
+        Only the edges leaving the source node get extra delays. A shortest path never
+        returns to its start node, so the shortest path to any target is the best
+        combination of an outgoing edge (base weight + delay) and the shortest path from
+        that neighbor to the target in the graph without the source node. Those neighbor
+        paths are calculated once, so an update costs O(neighbors x nodes) instead of a
+        graph rebuild and a Dijkstra run. Without delays, the paths of the static routing
+        table are used. The lookups of a path raise a NetworkXNoPath exception if the
+        target cannot be reached, like those of RoutingTable.
+
+        Parameters
+        ----------
+        G : NetworkX Graph
+            Graph with a 'weight' attribute on every edge
+
+        source : str
+            Name of the node from which the paths start
+
+        routing : RoutingTable
+            Static routing table of G
+        """
+
+        self.routing = routing
+        self.source = source
+        self.neighbors = list(G.neighbors(source))
+        self.position = {nextnode:idx for idx,nextnode in enumerate(self.neighbors)}
+        self.neighbor_ids = np.array([routing.index[nextnode] for nextnode in self.neighbors], dtype=np.int32)
+        self.base_weight = np.array([G[source][nextnode]['weight'] for nextnode in self.neighbors], dtype=float)
+        self.delays = np.zeros(len(self.neighbors))
+
+        # shortest paths from each neighbor that do not pass through the source node
+        size = len(routing.names)
+        self.neighbor_distance = np.full((len(self.neighbors),size), np.inf)
+        self.neighbor_hops = np.full((len(self.neighbors),size), -1, dtype=np.int32)
+        without_source = nx.restricted_view(G, [source], [])
+        for k, nextnode in enumerate(self.neighbors):
+            length, path = nx.single_source_dijkstra(without_source, nextnode)
+            for target, pathlen in length.items():
+                j = routing.index[target]
+                self.neighbor_distance[k,j] = pathlen
+                self.neighbor_hops[k,j] = len(path[target])-1
+
+        self._use_static_paths()
+
+    def __repr__(self):
+        return f'DynamicRouting from {self.source}'
+
+    def _target(self, target):
+        j = self.routing.index[target]
+        if self.next_hop[j] < 0:
+            raise nx.NetworkXNoPath(f'node {target} not reachable from {self.source}')
+        return j
+
+    def _use_static_paths(self):
+        i = self.routing.index[self.source]
+        self.distance = self.routing.distance[i]
+        self.next_hop = self.routing.next_hop[i]
+        self.hops = self.routing.hops[i]
+
+    def update(self, delays):
+        """Applies new delays to the outgoing edges of the source node.
+
+        The paths are only recalculated if the new delays can change a next hop: a delay
+        that increases on an edge that is not used by any current shortest path leaves
+        all paths unchanged.
+
+        Returns True if the paths were recalculated.
+
+        Parameters
+        ----------
+        delays : dict
+            Delay per neighbor name. Neighbors that are not in the dict get no delay.
+        """
+
+        new_delays = np.zeros(len(self.neighbors))
+        for nextnode, delay in delays.items():
+            new_delays[self.position[nextnode]] = delay
+
+        changed = new_delays != self.delays
+        if not changed.any():
+            return False
+
+        # increased delays on unused edges cannot change any shortest path
+        used = np.isin(self.neighbor_ids, self.next_hop)
+        if not (changed & (used | (new_delays < self.delays))).any():
+            self.delays = new_delays
+            return False
+
+        self.delays = new_delays
+        if not new_delays.any():
+            self._use_static_paths()
+            return True
+
+        # best neighbor for every target
+        total = (self.base_weight + new_delays)[:,None] + self.neighbor_distance
+        best = np.argmin(total, axis=0)
+        targets = np.arange(total.shape[1])
+        distance = total[best,targets]
+        reachable = np.isfinite(distance)
+        self.distance = distance
+        self.next_hop = np.where(reachable, self.neighbor_ids[best], -1).astype(np.int32)
+        self.hops = np.where(reachable, self.neighbor_hops[best,targets]+1, -1).astype(np.int32)
+
+        # paths from the source node to itself
+        i = self.routing.index[self.source]
+        self.distance[i] = 0
+        self.next_hop[i] = i
+        self.hops[i] = 0
+
+        return True
+
+    def next_node(self, target):
+        """Returns the name of the next node on the shortest path to target
+
+        Parameters
+        ----------
+        target : str
+            Name of the destination node
+        """
+
+        return self.routing.names[self.next_hop[self._target(target)]]
+
+    def length(self, target):
+        """Returns the shortest path length to target
+
+        Parameters
+        ----------
+        target : str
+            Name of the destination node
+        """
+
+        return float(self.distance[self._target(target)])
+
+    def num_hops(self, target):
+        """Returns the number of edges on the shortest path to target
+
+        Parameters
+        ----------
+        target : str
+            Name of the destination node
+        """
+
+        return int(self.hops[self._target(target)])
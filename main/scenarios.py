@@ -0,0 +1,191 @@
+from main.simulation import run_simulation
+from main.protocols import get_protocol
+from main.sweep import run_sweep
+import pandas as pd
+import itertools
+import hashlib
+import json
+import os
+
+# KPIs of summary.json that are collected in the results table
+RESULT_KPIS = ('deliveries', 'ontime_fraction', 'deliverytime', 'transports', 'loadfraction', 'total_drivingtime')
+
+def load_scenarios(path):
+    """Returns the scenario definition saved in a json file, see expand_scenarios"""
+
+    with open(path) as file:
+        return json.load(file)
+
+def _normalize(value):
+    """Returns numbers as floats, so 1 and 1.0 give the same scenario"""
+
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    return value
+
+def scenario_id(scenario):
+    """Returns a readable, stable ID of a scenario: the protocol name and a hash of all settings
+
+    Parameters
+    ----------
+    scenario : dict
+        Settings of one scenario: folder, protocol, orderfreq_mult, overrides and seed
+    """
+
+    key = json.dumps({name:scenario[name] for name in ('folder', 'protocol', 'orderfreq_mult', 'overrides', 'seed')}, sort_keys=True)
+    return f"{scenario['protocol']}_{hashlib.sha1(key.encode()).hexdigest()[:10]}"
+
+def expand_scenarios(scenarios):
+    """Returns one job for every combination of the grid of a scenario definition, without duplicates
+
+    A scenario definition is a dictionary (or json file) like
+
+        {"folder": "networks/network-test-volume",
+         "grid": {"protocol": ["volume", "urgency"],
+                  "orderfreq_mult": [1, 2],
+                  "truck_storage_capacity": [3, 4],
+                  "handling_time": [0.1],
+                  "lookahead": [0],
+                  "protocol_interval": [0.5]},
+         "seeds": [1, 2, 3]}
+
+    Every grid entry besides protocol and orderfreq_mult replaces a column of parameters.csv
+    (also the optional columns). Parameters that are not in the grid keep their value in
+    parameters.csv. Every job is saved in output_folder/<scenario id>, by default in the
+    scenarios folder of the network output.
+
+    Parameters
+    ----------
+    scenarios : dict
+        Scenario definition with the network folder, the grid, the seeds (default one
+        unseeded run) and optionally the output_folder and the patience of protocol_patience
+    """
+
+    folder = scenarios['folder']
+    output_folder = scenarios.get('output_folder', f'{folder}/output/scenarios')
+    grid = {'protocol': ['volume'], 'orderfreq_mult': [1], **scenarios['grid']}
+    seeds = scenarios.get('seeds', [None])
+
+    jobs = []
+    seen = set()
+    names = list(grid)
+    for values in itertools.product(*(grid[name] for name in names), seeds):
+        settings = {name:_normalize(value) for name, value in zip(names, values)}
+        protocol = settings.pop('protocol')
+        scenario = {'folder': folder,
+                    'protocol': protocol[len('protocol_'):] if protocol.startswith('protocol_') else protocol,
+                    'orderfreq_mult': settings.pop('orderfreq_mult'),
+                    'overrides': dict(sorted(settings.items())),
+                    'seed': values[-1]}
+        key = scenario_id(scenario)
+        if key in seen:
+            continue
+        seen.add(key)
+        jobs.append({**scenario, 'output_folder': f'{output_folder}/{key}', 'patience': scenarios.get('patience', 2)})
+    return jobs
+
+def run_scenario(folder, protocol, orderfreq_mult, overrides, seed, output_folder, patience=2, verbose=False):
+    """Simulates one scenario with run_simulation and saves its settings in scenario.json next to summary.json
+
+    The protocol is given by name, so the jobs can be sent to worker processes.
+
+    Parameters
+    ----------
+    folder : str
+        Path of the network folder, e.g. 'networks/network-test-volume'
+
+    protocol : str
+        Name of the protocol, see main.protocols.get_protocol
+
+    orderfreq_mult : float
+        Multiplier of the order frequencies in orders.csv
+
+    overrides : dict
+        Parameters that replace the values in parameters.csv
+
+    seed : int, optional
+        Seed of the run. Fresh entropy is used when None.
+
+    output_folder : str
+        Folder in which the output data is saved
+
+    patience : float
+        Patience of protocol_patience
+
+    verbose : bool
+        Print the simulation progress
+    """
+
+    edges = pd.read_csv(f'{folder}/input/edges.csv')
+    result = run_simulation(folder, orderfreq_mult, output_folder, seed, get_protocol(protocol, edges, patience),
+                            verbose=verbose, overrides=overrides)
+    with open(f'{output_folder}/scenario.json', 'w') as file:
+        json.dump({'folder': folder, 'protocol': protocol, 'orderfreq_mult': orderfreq_mult, 'overrides': overrides,
+                   'seed': seed, 'run_seed': result['seed'], 'wall_time': result['wall_time']}, file, indent=1)
+    return result
+
+def _finished(job):
+    """Returns True if the output of a scenario job is already on disk"""
+
+    return os.path.exists(f"{job['output_folder']}/scenario.json") and os.path.exists(f"{job['output_folder']}/summary.json")
+
+def collect_results(jobs):
+    """Returns one table with the settings and the KPIs of every finished scenario job
+
+    Parameters
+    ----------
+    jobs : list
+        Scenario jobs, see expand_scenarios
+    """
+
+    rows = []
+    for job in jobs:
+        if not _finished(job):
+            continue
+        with open(f"{job['output_folder']}/scenario.json") as file:
+            scenario = json.load(file)
+        with open(f"{job['output_folder']}/summary.json") as file:
+            summary = json.load(file)
+        row = {'scenario': os.path.basename(job['output_folder']), 'protocol': job['protocol'],
+               'orderfreq_mult': job['orderfreq_mult'], **job['overrides'], 'seed': scenario['run_seed']}
+        row.update({kpi:summary[kpi] for kpi in RESULT_KPIS})
+        row['ontime_ci_low'], row['ontime_ci_high'] = summary['ontime_ci'] if summary['ontime_ci'] else (None, None)
+        row['wall_time'] = scenario['wall_time']
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+def run_scenarios(scenarios, workers=None, rerun=False):
+    """Runs every scenario of a scenario definition that is not on disk yet, and saves one results table.
+
+    The grid is expanded with expand_scenarios. Scenarios of which the output already
+    exists (e.g. from an earlier run with a smaller grid) are skipped unless rerun is True.
+    The other scenarios run in parallel with run_sweep. The settings and KPIs of all
+    scenarios are saved in results.csv in the output folder of the scenarios and returned
+    as a Pandas DataFrame.
+
+    Parameters
+    ----------
+    scenarios : dict or str
+        Scenario definition or the path of its json file, see expand_scenarios
+
+    workers : int, optional
+        Number of worker processes. Defaults to the number of CPUs.
+
+    rerun : bool
+        Also run the scenarios that are already on disk
+    """
+
+    if isinstance(scenarios, str):
+        scenarios = load_scenarios(scenarios)
+    jobs = expand_scenarios(scenarios)
+    todo = [job for job in jobs if rerun or not _finished(job)]
+    print(f'{len(jobs)} scenarios, {len(jobs)-len(todo)} already on disk')
+    if todo:
+        run_sweep(todo, workers, runner=run_scenario)
+
+    results = collect_results(jobs)
+    output_folder = scenarios.get('output_folder', f"{scenarios['folder']}/output/scenarios")
+    os.makedirs(output_folder, exist_ok=True)
+    results.to_csv(f'{output_folder}/results.csv', index=False)
+    print(f'{len(results)}/{len(jobs)} scenarios in {output_folder}/results.csv')
+    return results
@@ -1,9 +1,179 @@
 import simpy
-import logging
+from main import tracing
+import heapq
+
+class Container():
+
+    __slots__ = ('due', 'source', 'target', 'starttime', 'arrivaltime', 'transporttime', 'handlingtime', 'hops')
+
+    def __init__(self, due, source, target, starttime):
+        """Container class
+
+        Containers are ordered by due time, so the most urgent container comes first in a priority queue.
+
+        Parameters
+        ----------
+        due : float
+            Time at which the container must be delivered
+
+        source : str
+            Name of the order's source node
+
+        target : str
+            Name of the order's destination node
+
+        starttime : float
+            Time at which the container was generated
+        """
+
+        self.due = due
+        self.source = source
+        self.target = target
+        self.starttime = starttime
+        self.arrivaltime = 0
+        self.transporttime = 0
+        self.handlingtime = 0
+        self.hops = -1
+
+    def __repr__(self):
+        return f'Container {self.source} => {self.target} (due {self.due:.2f})'
+
+    def __lt__(self, other):
+        return self.due < other.due
+
+class ContainerQueue():
+
+    __slots__ = ('items',)
+
+    def __init__(self):
+        """Priority queue of containers, ordered by due time
+
+        A plain binary heap: putting or getting containers never blocks, so unlike a
+        SimPy PriorityStore it needs no events. The heap list is available as items,
+        items[0] is the most urgent container.
+        """
+
+        self.items = []
+
+    def __repr__(self):
+        return f'ContainerQueue ({len(self.items)} containers)'
+
+    def __len__(self):
+        return len(self.items)
+
+    def put(self, container):
+        """Adds one container to the queue
+
+        Parameters
+        ----------
+        container : Container class
+            The container to add
+        """
+
+        heapq.heappush(self.items, container)
+
+    def put_many(self, containers):
+        """Adds several containers to the queue
+
+        Parameters
+        ----------
+        containers : list
+            The containers to add
+        """
+
+        for container in containers:
+            heapq.heappush(self.items, container)
+
+    def get(self):
+        """Removes and returns the most urgent container"""
+
+        return heapq.heappop(self.items)
+
+    def get_many(self, amount):
+        """Removes and returns the most urgent containers, most urgent first
+
+        Parameters
+        ----------
+        amount : int
+            Maximum number of containers to remove
+        """
+
+        containers = []
+        while len(containers) < amount and self.items:
+            containers.append(heapq.heappop(self.items))
+        return containers
+
+    @staticmethod
+    def get_many_from(queues, amount):
+        """Removes and returns the most urgent containers of several queues, most urgent first
+
+        Parameters
+        ----------
+        queues : list
+            The queues to take containers from. For equal due times, the first queue in the list goes first.
+
+        amount : int
+            Maximum number of containers to remove
+        """
+
+        containers = []
+        queues = [queue for queue in queues if queue.items]
+        while len(containers) < amount and queues:
+            queue = min(queues, key= lambda x: x.items[0].due)
+            containers.append(heapq.heappop(queue.items))
+            if not queue.items:
+                queues.remove(queue)
+        return containers
+
+class Trip():
+
+    __slots__ = ('startnode', 'endnode', 'cargo', 'load', 'phase', 'dispatch_time', 'departure_time', 'arrival_time', 'end_times', 'request')
+
+    def __init__(self, startnode, endnode, cargo, dispatch_time):
+        """Progress of a truck during the delivery of a cargo
+
+        The trip is the explicit state of Truck.deliver_cargo, so an interrupted delivery can
+        be saved and continued later (see main.snapshot). The phase is:
+
+        - 'loading': waiting for a forklift or loading at the start node
+        - 'driving': driving to the destination
+        - 'unloading': waiting for a forklift or unloading at the destination
+
+        end_times holds the handling end times of the current loading or unloading once the
+        forklift is assigned, request is the forklift request of the current phase.
+
+        Parameters
+        ----------
+        startnode : str
+            Name of the start node
+
+        endnode : str
+            Name of the destination node
+
+        cargo : list
+            The list of containers to load
+
+        dispatch_time : float
+            Time at which the truck was dispatched
+        """
+
+        self.startnode = startnode
+        self.endnode = endnode
+        self.cargo = cargo
+        self.load = len(cargo)
+        self.phase = 'loading'
+        self.dispatch_time = dispatch_time
+        self.departure_time = None
+        self.arrival_time = None
+        self.end_times = None
+        self.request = None
+
+    def __repr__(self):
+        return f'Trip {self.startnode} => {self.endnode} ({self.phase})'
 
 class Truck():
 
-    def __init__(self, env, name, logfile, maxcapacity, handling_time):
+    def __init__(self, env, name, logfile, maxcapacity, handling_time, handling_distribution=None, home=None):
         """Truck class
 
         Parameters
@@ -14,22 +184,33 @@ class Truck():
         name : str
             Name of the truck
 
-        logfile : Logging logger
-            Logger for information on truck trips
+        logfile : TraceWriter
+            Output trace for information on truck trips
 
         maxcapacity : int
             Maximum amount of containers that can fit in a truck
 
         handling_time: float
             Handling time per container loading/unloading action
+
+        handling_distribution : function, optional
+            Returns the handling times of a given number of containers.
+            Every container takes handling_time when None.
+
+        home : str, optional
+            Name of the home node of the truck. Defaults to the part of the name before '_'.
         """
 
         self.env = env
         self.name = name
+        self.home = home if home is not None else name.split('_')[0]
         self.logfile = logfile
-        self.storage = simpy.PriorityStore(env, capacity=maxcapacity)
+        self.storage = ContainerQueue()
+        self.capacity = maxcapacity
         self.handling_time = handling_time
+        self.handling_distribution = handling_distribution
         self.idle_since = 0
+        self.trip = None # Trip in progress, None while the truck is available at a node
 
     def __repr__(self):
         return f'Truck {self.name}'
@@ -37,58 +218,80 @@ class Truck():
     def __eq__(self, other):
         return self.name == other.name
 
-    def _load(self, cargo):
-        """Loads containers from the designated cargo into the truck
+    def _handling_end_times(self, amount):
+        """Returns the times at which each of the next containers is handled, one after another
 
         Parameters
         ----------
-        cargo : list
-            The list of containers to load
+        amount : int
+            Number of containers to handle
         """
 
-        logging.debug('%.2f | %s | load cargo...', self.env.now, self)
-
-        while cargo:
-            yield self.env.timeout(self.handling_time)
-            container = cargo.pop(0)
-            yield self.storage.put(container)
+        if self.handling_distribution is None:
+            durations = [self.handling_time]*amount
+        else:
+            durations = self.handling_distribution(amount)
 
-        logging.debug('%.2f | %s | finish loading cargo', self.env.now, self)
+        end_times = []
+        time = self.env.now
+        for duration in durations:
+            time += duration
+            end_times.append(time)
+        return end_times
 
-    def _unload(self, G, endnode, dispatch_time, departure_time, arrival_time):
-        """Unloads containers from the truck's cargo at the destination node
+    def _load(self, trip):
+        """Loads containers from the designated cargo into the truck.
+        The whole cargo is handled in one timeout.
 
         Parameters
         ----------
-        G : NetworkX Graph
-            State Graph of the simulation
+        trip : Trip class
+            The trip of the truck, in the loading phase
+        """
 
-        endnode : str
-            Name of the destination node
+        if tracing.enabled:
+            tracing.emit(self.env.now, 'load_start', trip.startnode, self.name)
 
-        dispatch_time : float
-            Time at which the truck was originally dispatched
+        if trip.end_times is None:
+            trip.end_times = self._handling_end_times(trip.load)
+        yield self.env.timeout(trip.end_times[-1]-self.env.now)
+        self.storage.put_many(trip.cargo)
+
+        if tracing.enabled:
+            tracing.emit(self.env.now, 'load_end', trip.startnode, self.name)
 
-        departure_time : float
-            Time at which the truck departed at the start node
+    def _unload(self, G, trip):
+        """Unloads containers from the truck's cargo at the destination node.
+        The whole cargo is handled in one timeout, every container keeps the time at which it was unloaded.
+
+        Parameters
+        ----------
+        G : NetworkX Graph
+            State Graph of the simulation
 
-        arrival_time : float
-            Time at which the truck arrived at the destination node
+        trip : Trip class
+            The trip of the truck, in the unloading phase
         """
 
-        logging.debug('%.2f | %s | unload cargo...', self.env.now, self)
+        if tracing.enabled:
+            tracing.emit(self.env.now, 'unload_start', trip.endnode, self.name)
 
-        while self.storage.items:
-            yield self.env.timeout(self.handling_time)
-            container = yield self.storage.get()
+        if trip.end_times is None:
+            trip.end_times = self._handling_end_times(len(self.storage))
+        yield self.env.timeout(trip.end_times[-1]-self.env.now)
+
+        node = G.graph['model'].node[trip.endnode]
+        containers = self.storage.get_many(len(self.storage))
+        for container, unload_time in zip(containers, trip.end_times):
 
             # add data about handling and driving time to container
-            container.item[4] += arrival_time - departure_time
-            container.item[5] += departure_time - dispatch_time + self.env.now - arrival_time
+            container.transporttime += trip.arrival_time - trip.departure_time
+            container.handlingtime += trip.departure_time - trip.dispatch_time + unload_time - trip.arrival_time
 
-            G.nodes[endnode]['node'].receive_container(container)
+            node.receive_container(container, unload_time)
         
-        logging.debug('%.2f | %s | finish unloading cargo', self.env.now, self)
+        if tracing.enabled:
+            tracing.emit(self.env.now, 'unload_end', trip.endnode, self.name)
 
     def deliver_cargo(self, G, startnode, endnode, cargo):
         """Controls the truck during the delivery of a designated cargo. This includes:
@@ -97,6 +300,8 @@ class Truck():
         - loading/unloading the truck
         - driving to the destination
 
+        The progress of the delivery is kept in the trip attribute.
+
         Parameters
         ----------
         G : NetworkX Graph
@@ -112,45 +317,77 @@ class Truck():
             The list of containers to load
         """
 
-        dispatch_time = self.env.now
+        self.trip = Trip(startnode, endnode, cargo, self.env.now)
+        yield from self._continue_trip(G)
 
-        # load the truck
-        load = len(cargo)
-        if load:
-            logging.debug('%.2f | %s | request forklift at Node %s', self.env.now, self, startnode)
-            request = G.nodes[startnode]['node'].forklifts.request()
-            yield request
-            yield self.env.process(self._load(cargo))
-            logging.debug('%.2f | %s | release forklift at Node %s', self.env.now, self, startnode)
-            G.nodes[startnode]['node'].forklifts.release(request)
-        
-        logging.debug('%.2f | %s | drive %s => %s...', self.env.now, self, startnode, endnode)
+    def resume_trip(self, G):
+        """Continues the delivery of the trip attribute from its current phase, e.g. after a restored snapshot
+
+        Parameters
+        ----------
+        G : NetworkX Graph
+            State Graph of the simulation
+        """
 
-        # add the truck to the incoming trucks
-        departure_time = self.env.now
-        G.nodes[endnode]['node'].incoming_trucks[self.name] = departure_time + G[startnode][endnode]["weight"]
+        yield from self._continue_trip(G)
 
-        # drive to the destination
-        yield self.env.timeout(G[startnode][endnode]["weight"])
-        arrival_time = self.env.now
+    def _continue_trip(self, G):
+        trip = self.trip
+        startnode, endnode = trip.startnode, trip.endnode
+        model = G.graph['model']
 
-        logging.debug('%.2f | %s | finish driving %s => %s', self.env.now, self, startnode, endnode)
+        if trip.phase == 'loading':
+
+            # load the truck
+            if trip.load:
+                if tracing.enabled:
+                    tracing.emit(self.env.now, 'forklift_request', startnode, self.name)
+                trip.request = model.node[startnode].forklifts.request()
+                yield trip.request
+                yield from self._load(trip)
+                if tracing.enabled:
+                    tracing.emit(self.env.now, 'forklift_release', startnode, self.name)
+                model.node[startnode].forklifts.release(trip.request)
+                trip.request = None
+
+            if tracing.enabled:
+                tracing.emit(self.env.now, 'drive_start', startnode, self.name, endnode)
+
+            # add the truck to the incoming trucks
+            trip.departure_time = self.env.now
+            trip.arrival_time = trip.departure_time + model.edge_weight[startnode][endnode]
+            model.node[endnode].incoming_trucks[self.name] = trip.arrival_time
+            trip.phase, trip.cargo, trip.end_times = 'driving', None, None
+
+            # drive to the destination
+            yield self.env.timeout(model.edge_weight[startnode][endnode])
+
+        elif trip.phase == 'driving':
+            yield self.env.timeout(max(trip.arrival_time-self.env.now, 0))
+
+        if trip.phase == 'driving':
+
+            if tracing.enabled:
+                tracing.emit(self.env.now, 'drive_end', startnode, self.name, endnode)
+
+            # log the truck transport information
+            self.logfile.write(self.name, startnode, endnode, trip.departure_time, trip.arrival_time, trip.load, self.capacity)
+            trip.phase = 'unloading'
 
-        # log the truck transport information
-        transport = ','.join([self.name, str(startnode), str(endnode), str(departure_time), str(arrival_time), str(load), str(self.storage.capacity)])
-        self.logfile.info('%s', transport)
-        
         # unload the truck
-        if load:
-            logging.debug('%.2f | %s | request forklift at Node %s', self.env.now, self, endnode)
-            request = G.nodes[endnode]['node'].forklifts.request()
-            yield request
-            yield self.env.process(self._unload(G,endnode,dispatch_time,departure_time,arrival_time))
-            logging.debug('%.2f | %s | release forklift at Node %s', self.env.now, self, endnode)
-            G.nodes[endnode]['node'].forklifts.release(request)
+        if trip.load:
+            if tracing.enabled:
+                tracing.emit(self.env.now, 'forklift_request', endnode, self.name)
+            trip.request = model.node[endnode].forklifts.request()
+            yield trip.request
+            yield from self._unload(G,trip)
+            if tracing.enabled:
+                tracing.emit(self.env.now, 'forklift_release', endnode, self.name)
+            model.node[endnode].forklifts.release(trip.request)
 
         # make the truck available at the destination
-        G.nodes[endnode]['node'].receive_truck(self)
+        self.trip = None
+        model.node[endnode].receive_truck(self)
 
 class Node():
 
@@ -171,8 +408,8 @@ class Node():
         trucks : list
             List of this node's Truck class instances
 
-        logfile : Logging logger
-            Logger for information on arrived containers
+        logfile : TraceWriter
+            Output trace for information on arrived containers
         """
 
         self.env = env
@@ -180,9 +417,12 @@ class Node():
         self.logfile = logfile
         self.arrived_containers = []
         self.incoming_containers = dict()
-        self.available_trucks = [[],trucks] # other nodes' trucks, own trucks
+        self.available_trucks = [[],list(trucks)] # other nodes' trucks, own trucks
         self.incoming_trucks = dict()
         self.forklifts = simpy.Resource(env, capacity=forklifts)
+        self.queues = dict() # container queues of the protocol running at this node
+        self.activity = None # event that wakes up the protocol in event-driven dispatch mode
+        self.wakeup = None # time at which the protocol wakes up without activity in event-driven dispatch mode
 
     def __repr__(self):
         return f'Node {self.name}'
@@ -190,36 +430,48 @@ class Node():
     def __eq__(self, other):
         return self.name == other.name
 
-    def receive_container(self, container):
+    def notify(self):
+        """Wakes up the protocol of this node if it runs in event-driven dispatch mode"""
+
+        if self.activity is not None and not self.activity.triggered:
+            self.activity.succeed()
+
+    def receive_container(self, container, time=None):
         """Process an arrived container
 
         Parameters
         ----------
-        container : SimPy PriorityItem
+        container : Container class
             The arrived container
+
+        time : float, optional
+            Time at which the container arrived, if it was handled before the current time
         """
 
         # increase number of hops
-        container.item[6] += 1
+        container.hops += 1
 
         # check if container has arrived at final destination
-        if container.item[1] == self.name:
+        if container.target == self.name:
 
-            logging.debug('%.2f | %s | container arrived at final destination', self.env.now, self)
+            if tracing.enabled:
+                tracing.emit(self.env.now, 'container_delivered', self.name)
 
             # log arrival time
-            container.item[3] = self.env.now
+            container.arrivaltime = self.env.now if time is None else time
             
             # generate arrival log
-            delivery = ','.join([str(x) for x in [container[0],*container[1]]])
-            self.logfile.info('%s', delivery)
+            self.logfile.write(container.due, container.source, container.target, container.starttime,
+                               container.arrivaltime, container.transporttime, container.handlingtime, container.hops)
 
         else:
 
-            logging.debug('%.2f | %s | container arrived at intermediate hub', self.env.now, self)
+            if tracing.enabled:
+                tracing.emit(self.env.now, 'container_transferred', self.name)
             
             # add container to inventory
             self.arrived_containers.append(container)
+            self.notify()
 
     def receive_truck(self, truck):
         """Process an arrived truck
@@ -230,7 +482,8 @@ class Node():
             The arrived truck
         """
 
-        logging.debug('%.2f | %s | %s available', self.env.now, self, truck)
+        if tracing.enabled:
+            tracing.emit(self.env.now, 'truck_available', self.name, truck.name)
 
         # remove truck from incoming trucks
         self.incoming_trucks.pop(truck.name)
@@ -239,7 +492,8 @@ class Node():
         truck.idle_since = self.env.now
 
         # add truck to available trucks at node
-        if truck.name.split('_')[0] != self.name:
+        if truck.home != self.name:
             self.available_trucks[0].append(truck)
         else:
-            self.available_trucks[1].append(truck)
\ No newline at end of file
+            self.available_trucks[1].append(truck)
+        self.notify()
\ No newline at end of file
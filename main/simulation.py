@@ -0,0 +1,322 @@
+from main.protocols import protocol_volume
+from main.order_generator import order_generator, OrderStream
+from main.init_graph import init_graph
+from main.trace_writer import TraceWriter, init_trace_writers
+from main.parameters import get_parameter
+from main.random_streams import RandomStreams
+from main.kpi import KPIAggregator
+from main.warmup import DEFAULT_WARMUP_DAYS
+from main.profiling import ProfiledEnvironment
+from main.hubstates import HubSampler, HUBSTATE_COLUMNS
+from main import tracing
+import simpy
+import pandas as pd
+import os
+import json
+import math
+import shutil
+import time
+
+def printdays(env):
+    """Prints the simulation progress every 10 simulated days
+
+    Parameters
+    ----------
+    env : SimPy Environment
+        The simulation environment of the model
+    """
+
+    while True:
+        yield env.timeout(240)
+        print(env.now, f'day {int(env.now/24)} finished')
+
+def _delayed(env, delay, process):
+    """Starts a process after a delay
+
+    Parameters
+    ----------
+    env : SimPy Environment
+        The simulation environment of the model
+
+    delay : float
+        Time before the process starts
+
+    process : generator
+        The process to start
+    """
+
+    yield env.timeout(delay)
+    yield from process
+
+def _resumed(env, node, wakeup, process):
+    """Starts the protocol process of a node in event-driven dispatch mode at the first activity of the node, or at wakeup
+
+    Parameters
+    ----------
+    env : SimPy Environment
+        The simulation environment of the model
+
+    node : Node class
+        The node at which the protocol is running
+
+    wakeup : float, optional
+        Time at which the process starts without activity. Only activity starts it when None.
+
+    process : generator
+        The protocol process to start
+    """
+
+    node.activity = env.event()
+    node.wakeup = wakeup
+    if wakeup is None:
+        yield node.activity
+    else:
+        yield node.activity | env.timeout(max(wakeup-env.now,0))
+    yield from process
+
+def load_inputs(folder):
+    """Returns the 4 input DataFrames of a network folder: parameters, nodes, edges and orders
+
+    Parameters
+    ----------
+    folder : str
+        Path of the network folder, e.g. 'networks/network-test-volume'
+    """
+
+    parameters = pd.read_csv(f'{folder}/input/parameters.csv')
+    nodes = pd.read_csv(f'{folder}/input/nodes.csv')
+    edges = pd.read_csv(f'{folder}/input/edges.csv')
+    orders = pd.read_csv(f'{folder}/input/orders.csv')
+    return parameters, nodes, edges, orders
+
+class Simulation():
+
+    def __init__(self, folder, orderfreq_mult, output_folder, seed=None, protocol=protocol_volume, debug=False,
+                 environment=simpy.Environment, start_time=0, overrides=None, wakeups=None):
+        """One simulation run of a network: the environment, the State Graph and the output data
+
+        Creates the output folder, the random streams, the trace writers, the KPI aggregator
+        and the debug trace of the run, and adds the order generators and the protocols to
+        the environment. The simulation is advanced with run, and close must be called
+        when it is finished.
+
+        Parameters
+        ----------
+        folder : str
+            Path of the network folder, e.g. 'networks/network-test-volume'
+
+        orderfreq_mult : float
+            Multiplier of the order frequencies in orders.csv
+
+        output_folder : str
+            Folder in which the transports and deliveries traces, seed.json, summary.json,
+            the debug trace (debug.bin, debug.json), profile.json (profiled runs) and the
+            hubstates trace (runs with the optional parameter hubstate_interval) are saved.
+            An existing folder is removed first.
+
+        seed : int, optional
+            Seed of the run. Fresh entropy is used when None.
+
+        protocol : function
+            Protocol running at every node of the network
+
+        debug : bool
+            Write the debug events to debug.bin, see main.tracing
+
+        environment : class
+            SimPy Environment class of the simulation. A ProfiledEnvironment is used instead
+            when the optional parameter profile is 1, see main.profiling.
+
+        start_time : float
+            Simulated time at which the run starts, e.g. the time of a restored snapshot.
+            The protocols check their dispatch rules at the same times as in a run that
+            started at time 0.
+
+        overrides : dict, optional
+            Parameters that replace the values in parameters.csv
+
+        wakeups : dict, optional
+            In event-driven dispatch mode: node => time at which its protocol checks its
+            dispatch rules first, or None to wait for the first activity at the node, e.g. the
+            pending wake-ups of a restored snapshot. The protocols start in phase with the
+            protocol interval when not given.
+        """
+
+        # load input data and edit multiplier parameter
+        self.folder = folder
+        self.output_folder = output_folder
+        self.parameters, self.nodes, self.edges, self.orders = load_inputs(folder)
+        self.parameters['orderfreq_mult'] = orderfreq_mult
+        for name, value in (overrides or dict()).items():
+            self.parameters[name] = value
+        self.sim_time = 24*float(self.parameters['sim_days']) + 1
+        parameters, orders = self.parameters, self.orders
+
+        # create output folder
+        if os.path.exists(output_folder):
+            shutil.rmtree(output_folder)
+        os.makedirs(output_folder)
+
+        # initialize random streams and record the seed of this run
+        self.streams = RandomStreams(seed)
+        with open(f'{output_folder}/seed.json', 'w') as f:
+            json.dump({'seed': self.streams.seed}, f)
+
+        # initialize data collection
+        self.trace_format = trace_format = str(get_parameter(parameters, 'trace_format', 'csv'))
+        self.logfile_trucks, self.logfile_packages = init_trace_writers(output_folder, trace_format)
+        self.hubstates = None
+        self.kpis = KPIAggregator(float(get_parameter(parameters, 'warmup_days', DEFAULT_WARMUP_DAYS)))
+        self.kpis.attach(self.logfile_trucks, self.logfile_packages)
+
+        # initialize debug trace of this run
+        self.debug = debug
+        if debug:
+            tracing.start(output_folder)
+
+        try:
+            # start simulation environment, profile the events, routing computations and trace writes if requested
+            if int(get_parameter(parameters, 'profile', 0)) and not issubclass(environment, ProfiledEnvironment):
+                environment = ProfiledEnvironment
+            self.env = env = environment(start_time)
+            if isinstance(env, ProfiledEnvironment):
+                self.logfile_trucks.flush = env.profile.wrap(self.logfile_trucks.flush, 'trace flush', 'transports')
+                self.logfile_packages.flush = env.profile.wrap(self.logfile_packages.flush, 'trace flush', 'deliveries')
+
+            # initialize Graph
+            self.G = G = init_graph(env,parameters,self.nodes,self.edges,self.logfile_trucks,self.logfile_packages,self.streams)
+
+            # add order generators to environment
+            order_generation = str(get_parameter(parameters, 'order_generation', 'process'))
+            if order_generation == 'vectorized':
+                rngs = [self.streams.generator('orders', idx) for idx in range(orders.shape[0])]
+                self.order_stream = OrderStream(G,env,parameters,orders,rngs)
+                self.order_states = []
+                _ = env.process(self.order_stream.run())
+            elif order_generation == 'process':
+                self.order_stream = None
+                self.order_states = [dict() for _ in range(orders.shape[0])]
+                for idx in range(orders.shape[0]):
+                    source, target, order_interval = orders.iloc[idx]
+                    rng = self.streams.random('orders', idx)
+                    _ = env.process(order_generator(G,env,parameters,source,target,order_interval,rng,self.order_states[idx]))
+            else:
+                raise ValueError(f"order_generation must be 'process' or 'vectorized', not '{order_generation}'")
+
+            # add protocol to environment, at the given wake-ups or in phase with the protocol interval
+            interval = float(parameters['protocol_interval'])
+            delay = math.ceil(round(start_time/interval, 6))*interval - start_time
+            event_mode = str(get_parameter(parameters, 'dispatch_mode', 'polling')) == 'event'
+            for node in list(G):
+                if event_mode and wakeups is not None:
+                    _ = env.process(_resumed(env,G.graph['model'].node[node],wakeups[node],protocol(G,env,parameters,node)))
+                elif delay > 0:
+                    _ = env.process(_delayed(env,delay,protocol(G,env,parameters,node)))
+                else:
+                    _ = env.process(protocol(G,env,parameters,node))
+
+            # sample the state of the nodes, in phase with the sample interval
+            hubstate_interval = float(get_parameter(parameters, 'hubstate_interval', 0))
+            if hubstate_interval > 0:
+                self.hubstates = HubSampler(env, G, hubstate_interval, start_time, self.sim_time)
+                _ = env.process(self.hubstates.sample())
+
+        except Exception:
+            self.close()
+            raise
+
+    def __repr__(self):
+        return f'Simulation {self.output_folder} (t = {self.env.now:.2f})'
+
+    def run(self, until=None):
+        """Runs the simulation until a given time, by default until the end of sim_days"""
+
+        self.env.run(self.sim_time if until is None else until)
+
+    def flush(self):
+        """Writes the buffered output data to disk and passes it to the consumers of the traces"""
+
+        self.logfile_trucks.flush()
+        self.logfile_packages.flush()
+
+    def close(self):
+        """Closes the output traces and the debug trace of the run, and saves profile.json if the run is profiled"""
+
+        if self.debug:
+            tracing.stop()
+        self.logfile_trucks.close()
+        self.logfile_packages.close()
+        if self.hubstates is not None:
+            logfile_hubstates = TraceWriter(f'{self.output_folder}/hubstates', HUBSTATE_COLUMNS, self.trace_format)
+            self.hubstates.write(logfile_hubstates)
+            logfile_hubstates.close()
+            self.hubstates = None
+        if isinstance(getattr(self, 'env', None), ProfiledEnvironment):
+            self.env.profile.save(f'{self.output_folder}/profile.json')
+
+def run_simulation(folder, orderfreq_mult, output_folder, seed=None, protocol=protocol_volume, debug=False, verbose=True, overrides=None):
+    """Simulates one network for one value of orderfreq_mult and saves the output data.
+
+    Every run gets its own output traces and debug trace, so several runs can safely
+    be executed in parallel worker processes.
+
+    Every order and every truck draws from its own random stream, derived from the run
+    seed (see RandomStreams). The seed is saved in seed.json, so every run can be
+    reproduced, also when no seed is given.
+
+    The KPIs are aggregated while the traces are written and saved in summary.json, with
+    the warm-up period given by the optional parameter warmup_days (default 10 days).
+
+    Returns a dictionary with the simulated and the wall clock time, the seed, the on-time
+    delivery fraction and the total truck driving time of the run.
+
+    Parameters
+    ----------
+    folder : str
+        Path of the network folder, e.g. 'networks/network-test-volume'
+
+    orderfreq_mult : float
+        Multiplier of the order frequencies in orders.csv
+
+    output_folder : str
+        Folder in which the output data is saved, see Simulation. An existing folder is removed first.
+
+    seed : int, optional
+        Seed of the run. Fresh entropy is used when None.
+
+    protocol : function
+        Protocol running at every node of the network
+
+    debug : bool
+        Write the debug events to debug.bin, see main.tracing
+
+    verbose : bool
+        Print the simulation progress
+
+    overrides : dict, optional
+        Parameters that replace the values in parameters.csv, e.g. {'handling_time': 0.2}
+    """
+
+    start = time.perf_counter()
+    simulation = Simulation(folder, orderfreq_mult, output_folder, seed, protocol, debug, overrides=overrides)
+
+    try:
+        # add progress logging to environment
+        if verbose:
+            _ = simulation.env.process(printdays(simulation.env))
+            print('Starting simulation...')
+
+        simulation.run()
+
+        if verbose:
+            print('Simulation finished')
+
+    finally:
+        simulation.close()
+
+    # save the KPIs of this run
+    kpis = simulation.kpis
+    kpis.save(f'{output_folder}/summary.json')
+
+    return {'sim_time': simulation.sim_time, 'wall_time': time.perf_counter()-start, 'seed': simulation.streams.seed,
+            'ontime_fraction': kpis.summary()['ontime_fraction'], 'total_drivingtime': kpis.drivingtime}
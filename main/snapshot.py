@@ -0,0 +1,266 @@
+from main.simulation import Simulation
+from main.protocols import protocol_volume
+from main.sim_classes import Trip
+from main.parameters import get_parameter
+from main.warmup import DEFAULT_WARMUP_DAYS
+import simpy
+import pickle
+import time
+
+# attributes of a Trip and of an OrderStream that are saved in a snapshot
+TRIP_STATE = ('startnode', 'endnode', 'cargo', 'load', 'phase', 'dispatch_time', 'departure_time', 'arrival_time', 'end_times')
+ORDER_STREAM_STATE = ('arrivals', 'due_offsets', 'last_arrival', 'queue')
+
+# attributes of an OrderStream with which its arrivals were sampled, compared when a snapshot is restored
+ORDER_STREAM_RATES = ('mean_interarrival', 'lookahead')
+
+def _forklift_position(G, trip):
+    """Returns -1 if the truck of a trip holds a forklift, its position in the forklift queue if it waits for one, else None"""
+
+    if trip.request is None:
+        return None
+    node = G.graph['model'].node[trip.startnode if trip.phase == 'loading' else trip.endnode]
+    if trip.request in node.forklifts.users:
+        return -1
+    return node.forklifts.queue.index(trip.request)
+
+def save_snapshot(simulation, path):
+    """Saves the state of a simulation at its current time in a pickle file
+
+    The snapshot contains the containers and trucks at every node (the containers in
+    the queues of the protocol are put back with the arrived containers), the trucks on
+    their way with their cargo and the phase of their trip, the state of the order
+    generation and of all random streams, and the KPIs aggregated so far. In event-driven
+    dispatch mode, it also contains the time at which the protocol of every node wakes up
+    next without activity (the current time if it was already notified). The buffered
+    output data is flushed first.
+
+    Parameters
+    ----------
+    simulation : Simulation class
+        The simulation, in between two calls of its run method
+
+    path : str
+        Filepath of the snapshot
+    """
+
+    simulation.flush()
+    G = simulation.G
+    now = simulation.env.now
+
+    nodes = dict()
+    trucks = dict()
+    for name in G:
+        node = G.nodes[name]['node']
+        containers = list(node.arrived_containers)
+        for queue in node.queues.values():
+            containers.extend(sorted(queue.items))
+        nodes[name] = {'arrived_containers': containers,
+                       'incoming_containers': node.incoming_containers,
+                       'available_trucks': [[truck.name for truck in available] for available in node.available_trucks],
+                       'incoming_trucks': node.incoming_trucks,
+                       'wakeup': now if node.activity is not None and node.activity.triggered else node.wakeup}
+
+        for truck in G.nodes[name]['trucks']:
+            trip = None
+            if truck.trip is not None:
+                trip = {attribute:getattr(truck.trip, attribute) for attribute in TRIP_STATE}
+                trip['forklift'] = _forklift_position(G, truck.trip)
+            trucks[truck.name] = {'storage': truck.storage.items, 'idle_since': truck.idle_since, 'trip': trip}
+
+    order_stream = None
+    if simulation.order_stream is not None:
+        order_stream = {attribute:getattr(simulation.order_stream, attribute) for attribute in ORDER_STREAM_STATE+ORDER_STREAM_RATES}
+
+    state = {'time': now,
+             'folder': simulation.folder,
+             'dispatch_mode': str(get_parameter(simulation.parameters, 'dispatch_mode', 'polling')),
+             'orderfreq_mult': float(simulation.parameters['orderfreq_mult']),
+             'seed': simulation.streams.seed,
+             'nodes': nodes,
+             'trucks': trucks,
+             'order_generators': simulation.order_states,
+             'order_stream': order_stream,
+             'random_streams': simulation.streams.get_state(),
+             'kpis': simulation.kpis}
+
+    with open(path, 'wb') as file:
+        pickle.dump(state, file, protocol=pickle.HIGHEST_PROTOCOL)
+
+def restore_simulation(path, output_folder, protocol=protocol_volume, overrides=None, debug=False, environment=simpy.Environment):
+    """Returns a new Simulation that continues from a snapshot, see save_snapshot
+
+    The protocol and the parameters may differ from the run of the snapshot, so several
+    variants can start from one warmed-up state. The protocols start with the containers
+    of the snapshot in their inventory, trucks on their way continue their trip.
+    The output data of the new run only contains the records after the snapshot, its KPIs
+    continue from the KPIs of the snapshot. The warmup_days and order_generation parameters
+    must therefore be the same as in the run of the snapshot, a ValueError is raised otherwise.
+    When the order frequency or the lookahead changes, the vectorized order stream samples
+    the arrivals that are not known yet again, see OrderStream.resample.
+
+    Parameters
+    ----------
+    path : str
+        Filepath of the snapshot
+
+    output_folder : str
+        Folder in which the output data is saved, see Simulation. An existing folder is removed first.
+
+    protocol : function
+        Protocol running at every node of the network
+
+    overrides : dict, optional
+        Parameters that replace the values in parameters.csv, e.g. {'orderfreq_mult': 2}
+
+    debug : bool
+        Write the debug events to debug.bin, see main.tracing
+
+    environment : class
+        SimPy Environment class of the simulation
+    """
+
+    with open(path, 'rb') as file:
+        state = pickle.load(file)
+
+    overrides = dict(overrides or dict())
+    orderfreq_mult = overrides.pop('orderfreq_mult', state['orderfreq_mult'])
+    wakeups = None
+    if state['dispatch_mode'] == 'event':
+        wakeups = {name:saved['wakeup'] for name, saved in state['nodes'].items()}
+    simulation = Simulation(state['folder'], orderfreq_mult, output_folder, state['seed'], protocol, debug,
+                            environment, start_time=state['time'], overrides=overrides, wakeups=wakeups)
+
+    try:
+        G, env = simulation.G, simulation.env
+        if (state['order_stream'] is None) != (simulation.order_stream is None):
+            raise ValueError('the order_generation parameter of the snapshot and of the restored simulation must be the same')
+        if simulation.kpis.warmup_days != state['kpis'].warmup_days:
+            raise ValueError('the warmup_days parameter of the snapshot and of the restored simulation must be the same, '
+                             f"as the KPIs of the snapshot only count after its warm-up period ({state['kpis'].warmup_days} days)")
+
+        # random streams and order generation
+        simulation.streams.set_state(state['random_streams'])
+        for order_state, saved in zip(simulation.order_states, state['order_generators']):
+            order_state.update(saved)
+        if state['order_stream'] is not None:
+            for attribute in ORDER_STREAM_STATE:
+                setattr(simulation.order_stream, attribute, state['order_stream'][attribute])
+        simulation.kpis.__dict__.update(state['kpis'].__dict__)
+
+        # nodes and trucks
+        trucks = {truck.name:truck for truck in G.graph['model'].trucks}
+        for name, saved in state['nodes'].items():
+            node = G.nodes[name]['node']
+            node.arrived_containers = saved['arrived_containers']
+            node.incoming_containers = saved['incoming_containers']
+            node.available_trucks = [[trucks[truck] for truck in available] for available in saved['available_trucks']]
+            node.incoming_trucks = saved['incoming_trucks']
+        for name, saved in state['trucks'].items():
+            trucks[name].storage.items = saved['storage']
+            trucks[name].idle_since = saved['idle_since']
+
+        # arrivals that were sampled with another order frequency or lookahead
+        stream = simulation.order_stream
+        if stream is not None and any(getattr(stream, attribute) != state['order_stream'][attribute] for attribute in ORDER_STREAM_RATES):
+            stream.resample(state['order_stream']['lookahead'])
+
+        # trucks on their way: trucks holding a forklift first, then in the order of the forklift queues
+        travelling = [(name, saved['trip']) for name, saved in state['trucks'].items() if saved['trip'] is not None]
+        travelling.sort(key= lambda x: -2 if x[1]['forklift'] is None else x[1]['forklift'])
+        for name, saved in travelling:
+            truck = trucks[name]
+            truck.trip = Trip(saved['startnode'], saved['endnode'], [], saved['dispatch_time'])
+            for attribute in TRIP_STATE:
+                setattr(truck.trip, attribute, saved[attribute])
+            _ = env.process(truck.resume_trip(G))
+
+    except Exception:
+        simulation.close()
+        raise
+
+    return simulation
+
+def warmup_snapshot(folder, orderfreq_mult, output_folder, path, seed=None, protocol=protocol_volume, days=None, overrides=None):
+    """Simulates the warm-up period of a network once and saves the state at its end, see save_snapshot
+
+    Parameters
+    ----------
+    folder : str
+        Path of the network folder, e.g. 'networks/network-test-volume'
+
+    orderfreq_mult : float
+        Multiplier of the order frequencies in orders.csv
+
+    output_folder : str
+        Folder in which the output data of the warm-up period is saved
+
+    path : str
+        Filepath of the snapshot
+
+    seed : int, optional
+        Seed of the run. Fresh entropy is used when None.
+
+    protocol : function
+        Protocol running during the warm-up period
+
+    days : float, optional
+        Length of the warm-up period. Defaults to the optional parameter warmup_days (default 10 days).
+
+    overrides : dict, optional
+        Parameters that replace the values in parameters.csv, e.g. {'order_generation': 'vectorized'}
+    """
+
+    simulation = Simulation(folder, orderfreq_mult, output_folder, seed, protocol, overrides=overrides)
+    try:
+        if days is None:
+            days = float(get_parameter(simulation.parameters, 'warmup_days', DEFAULT_WARMUP_DAYS))
+        simulation.run(24*days)
+        save_snapshot(simulation, path)
+    finally:
+        simulation.close()
+
+def run_from_snapshot(snapshot, output_folder, protocol=protocol_volume, overrides=None, debug=False, verbose=True):
+    """Continues a snapshot until the end of sim_days and saves the output data, like run_simulation.
+
+    Returns a dictionary with the simulated and the wall clock time, the seed, the on-time
+    delivery fraction and the total truck driving time of the run.
+
+    Parameters
+    ----------
+    snapshot : str
+        Filepath of the snapshot
+
+    output_folder : str
+        Folder in which the output data is saved, see Simulation. An existing folder is removed first.
+
+    protocol : function
+        Protocol running at every node of the network
+
+    overrides : dict, optional
+        Parameters that replace the values in parameters.csv, e.g. {'orderfreq_mult': 2}
+
+    debug : bool
+        Write the debug events to debug.bin, see main.tracing
+
+    verbose : bool
+        Print the start and end of the simulation
+    """
+
+    start = time.perf_counter()
+    simulation = restore_simulation(snapshot, output_folder, protocol, overrides, debug)
+
+    try:
+        if verbose:
+            print(f'Starting simulation from snapshot at {simulation.env.now:.2f}...')
+        simulation.run()
+        if verbose:
+            print('Simulation finished')
+    finally:
+        simulation.close()
+
+    kpis = simulation.kpis
+    kpis.save(f'{output_folder}/summary.json')
+
+    return {'sim_time': simulation.sim_time, 'wall_time': time.perf_counter()-start, 'seed': simulation.streams.seed,
+            'ontime_fraction': kpis.summary()['ontime_fraction'], 'total_drivingtime': kpis.drivingtime}
@@ -0,0 +1,107 @@
+from main.simulation import run_simulation
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import os
+import time
+
+def sweep_jobs(folder, orderfreq_values, seeds=(None,)):
+    """Returns one job for each (multiplier, seed) combination of a network
+
+    A job is a dictionary with the keyword arguments of run_simulation.
+
+    Parameters
+    ----------
+    folder : str
+        Path of the network folder, e.g. 'networks/network-test-volume'
+
+    orderfreq_values : list
+        Values of orderfreq_mult to simulate
+
+    seeds : list
+        Seeds to simulate for every multiplier. None runs without a fixed seed.
+    """
+
+    jobs = []
+    for orderfreq_mult in orderfreq_values:
+        for seed in seeds:
+            output_folder = f'{folder}/output/orderfreq_{orderfreq_mult}'
+            if seed is not None:
+                output_folder += f'_seed_{seed}'
+            jobs.append({'folder': folder, 'orderfreq_mult': orderfreq_mult, 'output_folder': output_folder, 'seed': seed})
+    return jobs
+
+def _job_label(job):
+    if 'folder' not in job:
+        return os.path.basename(job['output_folder'])
+    label = f"{os.path.basename(job['folder'])} orderfreq {job['orderfreq_mult']}"
+    if isinstance(job.get('protocol'), str):
+        label += f" {job['protocol']}"
+    if job.get('overrides'):
+        label += ' ' + ' '.join(f'{name}={value}' for name, value in job['overrides'].items())
+    if job.get('seed') is not None:
+        label += f" seed {job['seed']}"
+    return label
+
+def run_sweep(jobs, workers=None, runner=run_simulation, **kwargs):
+    """Runs independent simulation jobs in a process pool and prints a progress summary.
+
+    Returns a list with the result of every job, in the order of the jobs.
+    A failed job does not stop the sweep, its result contains the error instead.
+
+    Parameters
+    ----------
+    jobs : list
+        Dictionaries with keyword arguments of the runner, see sweep_jobs
+
+    workers : int, optional
+        Number of worker processes. Defaults to the number of CPUs.
+        With 1 worker the jobs run one after another in the current process.
+
+    runner : function
+        Function that runs one job, run_simulation or e.g. main.snapshot.run_from_snapshot
+
+    **kwargs
+        Extra keyword arguments passed to the runner for every job
+    """
+
+    workers = workers or os.cpu_count()
+    results = [None]*len(jobs)
+    start = time.perf_counter()
+    print(f'Running {len(jobs)} jobs on {workers} worker(s)...')
+
+    def report(idx, result, done):
+        elapsed = time.perf_counter() - start
+        remaining = elapsed/done*(len(jobs)-done)
+        if 'error' in result:
+            status = f"FAILED ({result['error']})"
+        else:
+            status = f"finished in {result['wall_time']:.1f}s"
+        print(f'[{done}/{len(jobs)}] {_job_label(jobs[idx])} {status} | elapsed {elapsed:.1f}s, remaining ~{remaining:.1f}s')
+
+    if workers == 1:
+        for idx, job in enumerate(jobs):
+            try:
+                results[idx] = runner(**job, verbose=False, **kwargs)
+            except Exception as error:
+                results[idx] = {'error': repr(error)}
+            report(idx, results[idx], idx+1)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(runner, **job, verbose=False, **kwargs): idx for idx, job in enumerate(jobs)}
+            for done, future in enumerate(as_completed(futures), 1):
+                idx = futures[future]
+                try:
+                    results[idx] = future.result()
+                except Exception as error:
+                    results[idx] = {'error': repr(error)}
+                report(idx, results[idx], done)
+
+    # summary over all jobs
+    wall_time = time.perf_counter() - start
+    failed = [idx for idx, result in enumerate(results) if 'error' in result]
+    cpu_time = sum(result['wall_time'] for result in results if 'error' not in result)
+    print(f'Sweep finished: {len(jobs)-len(failed)}/{len(jobs)} jobs succeeded in {wall_time:.1f}s '
+          f'(sum of run times {cpu_time:.1f}s, speedup {cpu_time/wall_time:.1f}x)')
+    for idx in failed:
+        print(f"  failed: {_job_label(jobs[idx])}: {results[idx]['error']}")
+
+    return results
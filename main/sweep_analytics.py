@@ -0,0 +1,146 @@
+from main.trace_store import TraceStore
+from main.kpi import Z_95
+from pandas.api.types import union_categoricals
+import numpy as np
+import pandas as pd
+
+"""
+KPIs of a sweep of runs (e.g. the order frequency multipliers of sim.py or a scenario grid),
+computed for all runs at once.
+
+The traces of all runs are read through their TraceStore and concatenated in one table per
+trace, with a scenario column that identifies the run. The KPIs of every run, every order
+and every arc are then computed with grouped, vectorized operations, with the same
+definitions as KPIAggregator:
+
+    transports, deliveries = load_sweep({mult:f'{folder}/output/orderfreq_{mult}' for mult in values}, warmup_days)
+    runs = sweep_kpis(transports, deliveries)
+    orders = order_kpis(deliveries)
+    arcs = arc_kpis(transports)
+"""
+
+# columns of the traces that are needed for the KPIs
+TRANSPORT_KPI_COLUMNS = ['startnode', 'endnode', 'starttime', 'endtime', 'load', 'capacity']
+DELIVERY_KPI_COLUMNS = ['duetime', 'startnode', 'endnode', 'starttime', 'arrivaltime', 'transporttime', 'handlingtime']
+
+def _concat(tables, scenarios):
+    """Returns one table of the tables of several runs, with a categorical scenario column and shared categories"""
+
+    lengths = [len(table) for table in tables]
+    data = {'scenario': pd.Categorical.from_codes(np.repeat(np.arange(len(scenarios)), lengths), pd.Index(scenarios))}
+    for name in tables[0].columns:
+        if isinstance(tables[0][name].dtype, pd.CategoricalDtype):
+            data[name] = union_categoricals([table[name] for table in tables])
+        else:
+            data[name] = np.concatenate([table[name].to_numpy() for table in tables])
+    return pd.DataFrame(data)
+
+def load_sweep(runs, warmup_days=0):
+    """Returns the transports and deliveries after the warm-up period of several runs as two concatenated tables
+
+    Only the rows after the warm-up period (endtime and arrivaltime) and the columns needed
+    for the KPIs are read, see TraceStore. The deliveries get the deliverytime, the delay and
+    whether they were on time.
+
+    Parameters
+    ----------
+    runs : dict
+        Scenario => output folder of its run, e.g. the order frequency multiplier => output folder
+
+    warmup_days : float
+        Length of the warm-up period in days
+    """
+
+    scenarios = list(runs)
+    transports = []
+    deliveries = []
+    for scenario in scenarios:
+        transports.append(TraceStore(runs[scenario], 'transports').time_range(24*warmup_days, columns=TRANSPORT_KPI_COLUMNS))
+        deliveries.append(TraceStore(runs[scenario], 'deliveries').time_range(24*warmup_days, columns=DELIVERY_KPI_COLUMNS))
+    transports = _concat(transports, scenarios)
+    deliveries = _concat(deliveries, scenarios)
+
+    deliveries['deliverytime'] = deliveries['arrivaltime'] - deliveries['starttime']
+    deliveries['delay'] = deliveries['arrivaltime'] - deliveries['duetime']
+    deliveries['ontime'] = deliveries['delay'] <= 0
+    return transports, deliveries
+
+def _proportion_ci(successes, samples):
+    """Returns the fractions and their 95% confidence intervals of arrays of successes and samples, see proportion_ci"""
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        fraction = successes/samples
+        halfwidth = Z_95*np.sqrt(fraction*(1-fraction)/samples)
+    return fraction, fraction-halfwidth, fraction+halfwidth
+
+def sweep_kpis(transports, deliveries):
+    """Returns the KPIs of every run of a sweep as a Pandas DataFrame indexed by scenario, see load_sweep
+
+    The KPIs are those of the summary of KPIAggregator: deliveries, ontime_fraction with its
+    confidence interval (ontime_ci_low, ontime_ci_high), the mean deliverytime with its
+    confidence interval, transports, loadfraction and total_drivingtime.
+
+    Parameters
+    ----------
+    transports, deliveries : Pandas DataFrame
+        Concatenated traces of the sweep, see load_sweep
+    """
+
+    trips = transports.assign(loadfraction=transports['load']/transports['capacity'],
+                              drivingtime=transports['endtime']-transports['starttime'])
+    trips = trips.groupby('scenario', observed=False).agg(transports=('load', 'size'), loadfraction=('loadfraction', 'mean'),
+                                                          total_drivingtime=('drivingtime', 'sum'))
+    arrivals = deliveries.assign(squares=deliveries['deliverytime']**2)
+    arrivals = arrivals.groupby('scenario', observed=False).agg(deliveries=('ontime', 'size'), ontime=('ontime', 'sum'),
+                                                                deliverytime=('deliverytime', 'sum'), squares=('squares', 'sum'))
+
+    kpis = pd.DataFrame(index=arrivals.index)
+    samples = arrivals['deliveries'].to_numpy(dtype=float)
+    kpis['deliveries'] = arrivals['deliveries']
+    kpis['ontime_fraction'], kpis['ontime_ci_low'], kpis['ontime_ci_high'] = _proportion_ci(arrivals['ontime'].to_numpy(), samples)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = arrivals['deliverytime'].to_numpy()/samples
+        variance = np.maximum(arrivals['squares'].to_numpy() - samples*mean**2, 0)/(samples-1)
+        halfwidth = np.where(samples > 1, Z_95*np.sqrt(variance/samples), 0)
+    kpis['deliverytime'] = mean
+    kpis['deliverytime_ci_low'] = mean-halfwidth
+    kpis['deliverytime_ci_high'] = mean+halfwidth
+    kpis = kpis.join(trips)
+    kpis['total_drivingtime'] = kpis['total_drivingtime'].fillna(0.0)
+    return kpis
+
+def order_kpis(deliveries):
+    """Returns the KPIs of every order of every run of a sweep as a Pandas DataFrame, like the orders in the summary of KPIAggregator
+
+    Parameters
+    ----------
+    deliveries : Pandas DataFrame
+        Concatenated deliveries of the sweep, see load_sweep
+    """
+
+    groups = deliveries.groupby(['scenario', 'startnode', 'endnode'], observed=True)
+    orders = groups.agg(deliveries=('ontime', 'size'), ontime=('ontime', 'sum'), deliverytime=('deliverytime', 'sum'),
+                        transporttime=('transporttime', 'sum'), handlingtime=('handlingtime', 'sum')).reset_index()
+    samples = orders['deliveries'].to_numpy(dtype=float)
+    orders.insert(1, 'order', orders['startnode'].astype(str) + ' > ' + orders['endnode'].astype(str))
+    orders['ontime_fraction'], orders['ontime_ci_low'], orders['ontime_ci_high'] = _proportion_ci(orders['ontime'].to_numpy(), samples)
+    orders['idletime'] = (orders['deliverytime']-orders['transporttime']-orders['handlingtime'])/samples
+    orders['transporttime'] = orders['transporttime']/samples
+    orders['handlingtime'] = orders['handlingtime']/samples
+    orders['deliverytime'] = orders['deliverytime']/samples
+    return orders.drop(columns=['startnode', 'endnode', 'ontime'])
+
+def arc_kpis(transports):
+    """Returns the transports, containers, mean load fraction and driving time of every arc of every run of a sweep
+
+    Parameters
+    ----------
+    transports : Pandas DataFrame
+        Concatenated transports of the sweep, see load_sweep
+    """
+
+    trips = transports.assign(loadfraction=transports['load']/transports['capacity'],
+                              drivingtime=transports['endtime']-transports['starttime'])
+    return trips.groupby(['scenario', 'startnode', 'endnode'], observed=True).agg(
+        transports=('load', 'size'), containers=('load', 'sum'), loadfraction=('loadfraction', 'mean'),
+        drivingtime=('drivingtime', 'sum')).reset_index()
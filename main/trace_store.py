@@ -0,0 +1,300 @@
+import numpy as np
+import pandas as pd
+import tempfile
+import shutil
+import json
+import os
+from main.trace_writer import TRANSPORT_COLUMNS, DELIVERY_COLUMNS, BINARY_DTYPES, TRACE_FORMATS, iter_trace
+from main.hubstates import HUBSTATE_COLUMNS
+
+"""
+Memory-mapped, indexed access to the output traces of a run.
+
+The first time a trace is opened, it is converted once to the binary trace format (one
+raw file per column, see main.trace_writer.TraceWriter) in the trace_cache folder of the
+run, together with a time index and an order pair index. Every next open only reads the
+small json files and memory-maps the columns, so only the requested rows and columns are
+read from disk. The conversion is repeated when the trace changes. Traces saved in the
+binary format are not converted, only indexed.
+
+    store = TraceStore(output_folder, 'deliveries')
+    store.time_range(240, 480, columns=['startnode', 'endnode', 'arrivaltime'])
+    store.pair('Gent', 'Liege', start=240)
+"""
+
+# known columns of the traces, other traces get the types of their first chunk
+TRACE_COLUMNS = {'transports': TRANSPORT_COLUMNS, 'deliveries': DELIVERY_COLUMNS, 'hubstates': HUBSTATE_COLUMNS}
+
+# column of the time index and the columns of the order pair index of each trace
+TIME_COLUMNS = {'transports': 'endtime', 'deliveries': 'arrivaltime', 'hubstates': 'time'}
+PAIR_COLUMNS = ('startnode', 'endnode')
+
+# folder in the output folder of a run with the converted traces and their indexes
+CACHE_FOLDER = 'trace_cache'
+
+def _memmap(path, dtype, count):
+    """Returns a read-only memory map of count values of a raw file, or an empty array"""
+
+    if not count:
+        return np.zeros(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode='r', shape=(count,))
+
+def _source(output_folder, name):
+    """Returns the path, format and signature (size and modification time) of a saved trace"""
+
+    for fmt, extension in TRACE_FORMATS.items():
+        path = f'{output_folder}/{name}{extension}'
+        if os.path.exists(path):
+            stat = os.stat(f'{path}/schema.json' if fmt == 'binary' else path)
+            return path, fmt, [stat.st_size, stat.st_mtime_ns]
+    raise FileNotFoundError(f'no {name} trace found in {output_folder}')
+
+def _kind(series):
+    """Returns the trace column type of a Pandas column: 'str', 'd' (float) or 'q' (int)"""
+
+    if pd.api.types.is_float_dtype(series):
+        return 'd'
+    if pd.api.types.is_integer_dtype(series):
+        return 'q'
+    return 'str'
+
+def _convert(output_folder, name, folder, chunksize):
+    """Writes a trace in the binary format to folder, reading it in chunks with iter_trace"""
+
+    columns = TRACE_COLUMNS.get(name)
+    files = dict()
+    categories = dict()
+    codes = dict()
+    rows = 0
+    try:
+        for chunk in iter_trace(output_folder, name, chunksize):
+            if columns is None:
+                columns = [(column, _kind(chunk[column])) for column in chunk.columns]
+            if not files:
+                files = {column:open(f'{folder}/{column}.bin', 'wb') for column,_ in columns}
+                categories = {column:[] for column,kind in columns if kind == 'str'}
+                codes = {column:dict() for column in categories}
+            for column, kind in columns:
+                if kind == 'str':
+                    chunk_codes, uniques = pd.factorize(chunk[column].astype(str))
+                    table = codes[column]
+                    for value in uniques:
+                        if value not in table:
+                            table[value] = len(table)
+                            categories[column].append(value)
+                    values = np.array([table[value] for value in uniques], dtype=BINARY_DTYPES['str'])[chunk_codes]
+                else:
+                    values = chunk[column].to_numpy(dtype=BINARY_DTYPES[kind])
+                values.tofile(files[column])
+            rows += len(chunk)
+    finally:
+        for file in files.values():
+            file.close()
+
+    columns = columns or []
+    for column, kind in columns:
+        if column not in files:
+            open(f'{folder}/{column}.bin', 'wb').close()
+    schema = {'columns': [{'name': column, 'type': kind, 'dtype': BINARY_DTYPES[kind]} for column,kind in columns],
+              'categories': {column:categories.get(column, []) for column,kind in columns if kind == 'str'},
+              'rows': rows}
+    with open(f'{folder}/schema.json', 'w') as file:
+        json.dump(schema, file)
+
+def _build_index(columns_folder, name, folder, signature):
+    """Writes the time index and the order pair index of a binary trace to folder"""
+
+    with open(f'{columns_folder}/schema.json') as file:
+        schema = json.load(file)
+    dtypes = {column['name']:column['dtype'] for column in schema['columns']}
+    rows = schema['rows']
+    index = {'source': signature, 'rows': rows, 'time_column': None, 'time_sorted': True, 'pairs': None}
+
+    # time index: the sorted times and, if the trace is not in time order, the rows in time order
+    time_column = TIME_COLUMNS.get(name)
+    if time_column in dtypes:
+        times = _memmap(f'{columns_folder}/{time_column}.bin', dtypes[time_column], rows)
+        order = np.argsort(times, kind='stable')
+        index['time_column'] = time_column
+        index['time_sorted'] = bool(np.all(order == np.arange(rows)))
+        np.asarray(times[order], dtype='<f8').tofile(f'{folder}/time.bin')
+        if not index['time_sorted']:
+            order.astype('<i8').tofile(f'{folder}/time_order.bin')
+
+    # order pair index: the rows of every (startnode, endnode) pair, in CSR form
+    if all(column in dtypes for column in PAIR_COLUMNS):
+        start = _memmap(f'{columns_folder}/{PAIR_COLUMNS[0]}.bin', dtypes[PAIR_COLUMNS[0]], rows).astype(np.int64)
+        end = _memmap(f'{columns_folder}/{PAIR_COLUMNS[1]}.bin', dtypes[PAIR_COLUMNS[1]], rows).astype(np.int64)
+        keys, pairs = np.unique(start*len(schema['categories'][PAIR_COLUMNS[1]]) + end, return_inverse=True)
+        order = np.argsort(pairs, kind='stable')
+        pointers = np.searchsorted(pairs[order], np.arange(len(keys)+1))
+        order.astype('<i8').tofile(f'{folder}/pair_order.bin')
+        pointers.astype('<i8').tofile(f'{folder}/pair_pointers.bin')
+        startnames, endnames = schema['categories'][PAIR_COLUMNS[0]], schema['categories'][PAIR_COLUMNS[1]]
+        first = order[pointers[:-1]]
+        index['pairs'] = [[startnames[start[row]], endnames[end[row]]] for row in first]
+
+    with open(f'{folder}/index.json', 'w') as file:
+        json.dump(index, file)
+
+class TraceStore():
+
+    def __init__(self, output_folder, name, chunksize=65536):
+        """Memory-mapped output trace of a run with a time index and an order pair index
+
+        The trace is converted (csv, parquet, feather) and indexed once in the trace_cache
+        folder of the run, see the module documentation. String columns are returned as
+        Pandas Categoricals.
+
+        Parameters
+        ----------
+        output_folder : str
+            Folder in which the traces are saved
+
+        name : str
+            Name of the trace, e.g. 'transports' or 'deliveries'
+
+        chunksize : int
+            Number of records per chunk when the trace is converted
+        """
+
+        self.output_folder = output_folder
+        self.name = name
+        source, fmt, signature = _source(output_folder, name)
+        self.path = f'{output_folder}/{CACHE_FOLDER}/{name}.trace'
+        self.columns_path = source if fmt == 'binary' else self.path
+
+        index = None
+        if os.path.exists(f'{self.path}/index.json'):
+            with open(f'{self.path}/index.json') as file:
+                index = json.load(file)
+        if index is None or index['source'] != signature:
+            self._build(fmt, signature, chunksize)
+            with open(f'{self.path}/index.json') as file:
+                index = json.load(file)
+        self.index = index
+
+        with open(f'{self.columns_path}/schema.json') as file:
+            schema = json.load(file)
+        self.rows = index['rows']
+        self.columns = [column['name'] for column in schema['columns']]
+        self.dtypes = {column['name']:column['dtype'] for column in schema['columns']}
+        self.categories = {column:pd.Index(values) for column, values in schema['categories'].items()}
+        self.pair_ids = {tuple(pair):idx for idx, pair in enumerate(index['pairs'] or ())}
+        self._memmaps = dict()
+
+    def __repr__(self):
+        return f'TraceStore {self.output_folder}/{self.name} ({self.rows} rows)'
+
+    def __len__(self):
+        return self.rows
+
+    def _build(self, fmt, signature, chunksize):
+        """Converts (if needed) and indexes the trace in a temporary folder and moves it to the cache"""
+
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        folder = tempfile.mkdtemp(prefix=f'{self.name}_', dir=os.path.dirname(self.path))
+        try:
+            if fmt != 'binary':
+                _convert(self.output_folder, self.name, folder, chunksize)
+            _build_index(folder if fmt != 'binary' else self.columns_path, self.name, folder, signature)
+            shutil.rmtree(self.path, ignore_errors=True)
+            os.replace(folder, self.path)
+        except BaseException:
+            shutil.rmtree(folder, ignore_errors=True)
+            raise
+
+    def _memmap(self, name):
+        values = self._memmaps.get(name)
+        if values is None:
+            values = self._memmaps[name] = _memmap(f'{self.path}/{name}.bin', '<i8' if name != 'time' else '<f8',
+                                                   self.rows if name != 'pair_pointers' else len(self.index['pairs'])+1)
+        return values
+
+    def column(self, name):
+        """Returns the memory-mapped values of a column, the integer codes of the categories for string columns"""
+
+        values = self._memmaps.get(('column', name))
+        if values is None:
+            values = self._memmaps[('column', name)] = _memmap(f'{self.columns_path}/{name}.bin', self.dtypes[name], self.rows)
+        return values
+
+    def take(self, rows, columns=None):
+        """Returns the given rows of the trace as a Pandas DataFrame, only reading those rows from disk
+
+        Parameters
+        ----------
+        rows : numpy array or slice
+            Row numbers (in the order of the trace) or a slice of rows
+
+        columns : list, optional
+            Names of the columns to read. Defaults to all columns.
+        """
+
+        data = dict()
+        for name in columns or self.columns:
+            values = np.asarray(self.column(name)[rows])
+            data[name] = pd.Categorical.from_codes(values, self.categories[name]) if name in self.categories else values
+        return pd.DataFrame(data)
+
+    def to_pandas(self, columns=None):
+        """Returns the complete trace (or some of its columns) as a Pandas DataFrame"""
+
+        return self.take(slice(None), columns)
+
+    def time_rows(self, start=-np.inf, end=np.inf):
+        """Returns the row numbers, in trace order, with start <= time < end, see TIME_COLUMNS
+
+        Parameters
+        ----------
+        start, end : float
+            Bounds of the time window in hours
+        """
+
+        if self.index['time_column'] is None:
+            raise ValueError(f'the {self.name} trace has no time index')
+        times = self._memmap('time')
+        low, high = np.searchsorted(times, [start, end], side='left')
+        if self.index['time_sorted']:
+            return np.arange(low, high)
+        return np.sort(self._memmap('time_order')[low:high])
+
+    def time_range(self, start=-np.inf, end=np.inf, columns=None):
+        """Returns the records with start <= time < end as a Pandas DataFrame, see time_rows"""
+
+        if self.index['time_column'] is not None and self.index['time_sorted']:
+            low, high = np.searchsorted(self._memmap('time'), [start, end], side='left')
+            return self.take(slice(low, high), columns)
+        return self.take(self.time_rows(start, end), columns)
+
+    def pair_rows(self, startnode, endnode):
+        """Returns the row numbers, in trace order, of one (startnode, endnode) pair, e.g. one order of the deliveries"""
+
+        if self.index['pairs'] is None:
+            raise ValueError(f'the {self.name} trace has no order pair index')
+        pair = self.pair_ids.get((startnode, endnode))
+        if pair is None:
+            return np.zeros(0, dtype=np.int64)
+        pointers = self._memmap('pair_pointers')
+        return np.asarray(self._memmap('pair_order')[pointers[pair]:pointers[pair+1]])
+
+    def pair(self, startnode, endnode, columns=None, start=-np.inf, end=np.inf):
+        """Returns the records of one (startnode, endnode) pair with start <= time < end as a Pandas DataFrame
+
+        Parameters
+        ----------
+        startnode, endnode : str
+            Source and target of the order (deliveries) or start and end of the arc (transports)
+
+        columns : list, optional
+            Names of the columns to read. Defaults to all columns.
+
+        start, end : float
+            Bounds of the time window in hours
+        """
+
+        rows = self.pair_rows(startnode, endnode)
+        if self.index['time_column'] is not None and (np.isfinite(start) or np.isfinite(end)):
+            times = np.asarray(self.column(self.index['time_column'])[rows])
+            rows = rows[(start <= times) & (times < end)]
+        return self.take(rows, columns)
@@ -0,0 +1,303 @@
+import numpy as np
+import pandas as pd
+import array
+import csv
+import json
+import os
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+# supported output formats and the file extension of each format
+TRACE_FORMATS = {'csv': '.csv', 'parquet': '.parquet', 'feather': '.feather', 'binary': '.trace'}
+
+# columns of the output traces: (name, type), with type 'str', 'd' (float) or 'q' (int)
+TRANSPORT_COLUMNS = [('truckname','str'),('startnode','str'),('endnode','str'),('starttime','d'),('endtime','d'),('load','q'),('capacity','q')]
+DELIVERY_COLUMNS = [('duetime','d'),('startnode','str'),('endnode','str'),('starttime','d'),('arrivaltime','d'),('transporttime','d'),('handlingtime','d'),('hops','q')]
+
+# numpy dtypes of the binary format
+BINARY_DTYPES = {'str': '<i4', 'd': '<f8', 'q': '<i8'}
+
+class TraceWriter():
+
+    def __init__(self, path, columns, fmt='csv', buffer_size=65536):
+        """Buffered writer for one output trace (e.g. transports or deliveries)
+
+        Records are buffered column by column in typed arrays, with strings stored as
+        integer codes, and written to disk in bulk when the buffer is full.
+
+        Formats:
+        - csv: a csv file with a header line, identical to the original logger output
+        - parquet / feather: Apache Arrow formats, requires pyarrow
+        - binary: a folder with one raw little-endian file per column and a schema.json
+          with the column types, the string categories and the number of rows
+
+        Parameters
+        ----------
+        path : str
+            Filepath of the trace without extension, e.g. 'output/transports'
+
+        columns : list
+            (name, type) of every column, type is 'str', 'd' (float) or 'q' (int)
+
+        fmt : str
+            Output format: 'csv', 'parquet', 'feather' or 'binary'
+
+        buffer_size : int
+            Number of records kept in memory before they are written to disk
+        """
+
+        if fmt not in TRACE_FORMATS:
+            raise ValueError(f"trace format must be one of {list(TRACE_FORMATS)}, not '{fmt}'")
+        if fmt in ('parquet', 'feather') and pa is None:
+            raise ImportError(f"the '{fmt}' trace format requires pyarrow")
+
+        self.path = path + TRACE_FORMATS[fmt]
+        self.columns = columns
+        self.fmt = fmt
+        self.buffer_size = buffer_size
+        self.rows = 0
+        self.consumers = [] # functions called with every flushed chunk, see flush
+        self.categories = {name:[] for name,kind in columns if kind == 'str'}
+        self._codes = {name:dict() for name in self.categories}
+        self._size = 0
+        self._new_buffers()
+
+        # open output file
+        if fmt == 'csv':
+            self._file = open(self.path, 'w', newline='')
+            self._csv = csv.writer(self._file, lineterminator='\n')
+            self._csv.writerow([name for name,_ in columns])
+        elif fmt == 'binary':
+            os.makedirs(self.path, exist_ok=True)
+            self._files = {name:open(f'{self.path}/{name}.bin', 'wb') for name,_ in columns}
+            self._write_schema()
+        elif fmt == 'parquet':
+            self._writer = pq.ParquetWriter(self.path, self._arrow_schema())
+        elif fmt == 'feather':
+            self._file = pa.OSFile(self.path, 'wb')
+            self._writer = pa.ipc.new_file(self._file, self._arrow_schema())
+
+    def __repr__(self):
+        return f'TraceWriter {self.path}'
+
+    def _new_buffers(self):
+        self._buffers = [array.array('i' if kind == 'str' else kind) for _,kind in self.columns]
+        self._appenders = []
+        for (name,kind), buffer in zip(self.columns, self._buffers):
+            if kind == 'str':
+                self._appenders.append(self._string_appender(name, buffer))
+            else:
+                self._appenders.append(buffer.append)
+
+    def _string_appender(self, name, buffer):
+        codes = self._codes[name]
+        categories = self.categories[name]
+        def append(value):
+            code = codes.get(value)
+            if code is None:
+                code = codes[value] = len(categories)
+                categories.append(value)
+            buffer.append(code)
+        return append
+
+    def _arrow_schema(self):
+        types = {'str': pa.string(), 'd': pa.float64(), 'q': pa.int64()}
+        return pa.schema([(name, types[kind]) for name,kind in self.columns])
+
+    def _write_schema(self):
+        schema = {'columns': [{'name': name, 'type': kind, 'dtype': BINARY_DTYPES[kind]} for name,kind in self.columns],
+                  'categories': self.categories,
+                  'rows': self.rows}
+        with open(f'{self.path}/schema.json', 'w') as file:
+            json.dump(schema, file)
+
+    def write(self, *values):
+        """Adds one record to the trace
+
+        Parameters
+        ----------
+        *values
+            One value per column, in the order of the columns
+        """
+
+        for append, value in zip(self._appenders, values):
+            append(value)
+        self._size += 1
+        if self._size >= self.buffer_size:
+            self.flush()
+
+    def write_many(self, *columns):
+        """Adds several records to the trace at once
+
+        Parameters
+        ----------
+        *columns
+            One sequence of values per column, in the order of the columns
+        """
+
+        for (_,kind), append, buffer, values in zip(self.columns, self._appenders, self._buffers, columns):
+            if kind == 'str':
+                for value in values:
+                    append(value)
+            else:
+                buffer.extend(values.tolist() if isinstance(values, np.ndarray) else values)
+        self._size += len(columns[0])
+        if self._size >= self.buffer_size:
+            self.flush()
+
+    def decoded_buffers(self):
+        """Returns the buffered records as a dict of column name => list of values"""
+
+        chunk = dict()
+        for (name,kind), buffer in zip(self.columns, self._buffers):
+            if kind == 'str':
+                categories = self.categories[name]
+                chunk[name] = [categories[code] for code in buffer]
+            else:
+                chunk[name] = buffer
+        return chunk
+
+    def flush(self):
+        """Writes all buffered records to disk and passes them to the consumers"""
+
+        if not self._size:
+            return
+
+        chunk = None
+        if self.fmt != 'binary' or self.consumers:
+            chunk = self.decoded_buffers()
+
+        if self.fmt == 'csv':
+            self._csv.writerows(zip(*[chunk[name] for name,_ in self.columns]))
+            self._file.flush()
+        elif self.fmt == 'binary':
+            for (name,_), buffer in zip(self.columns, self._buffers):
+                buffer.tofile(self._files[name])
+                self._files[name].flush()
+        else:
+            table = {name:(chunk[name] if kind == 'str' else np.asarray(chunk[name])) for name,kind in self.columns}
+            self._writer.write_table(pa.table(table, schema=self._arrow_schema()))
+
+        for consumer in self.consumers:
+            consumer(chunk)
+
+        self.rows += self._size
+        self._size = 0
+        self._new_buffers()
+        if self.fmt == 'binary':
+            self._write_schema()
+
+    def close(self):
+        """Flushes the buffer and closes the output file"""
+
+        self.flush()
+        if self.fmt == 'csv':
+            self._file.close()
+        elif self.fmt == 'binary':
+            for file in self._files.values():
+                file.close()
+            self._write_schema()
+        elif self.fmt == 'parquet':
+            self._writer.close()
+        elif self.fmt == 'feather':
+            self._writer.close()
+            self._file.close()
+
+def init_trace_writers(output_folder, fmt='csv', buffer_size=65536):
+    """Returns the trace writers of the transports and deliveries output data
+
+    Parameters
+    ----------
+    output_folder : str
+        Folder in which the traces are saved
+
+    fmt : str
+        Output format: 'csv', 'parquet', 'feather' or 'binary'
+
+    buffer_size : int
+        Number of records kept in memory before they are written to disk
+    """
+
+    trace_trucks = TraceWriter(f'{output_folder}/transports', TRANSPORT_COLUMNS, fmt, buffer_size)
+    trace_containers = TraceWriter(f'{output_folder}/deliveries', DELIVERY_COLUMNS, fmt, buffer_size)
+    return trace_trucks, trace_containers
+
+def read_trace(output_folder, name):
+    """Returns an output trace as a Pandas DataFrame, in whichever format it was saved
+
+    Parameters
+    ----------
+    output_folder : str
+        Folder in which the traces are saved
+
+    name : str
+        Name of the trace, e.g. 'transports' or 'deliveries'
+    """
+
+    path = f'{output_folder}/{name}'
+    if os.path.exists(path + '.csv'):
+        return pd.read_csv(path + '.csv')
+    if os.path.exists(path + '.parquet'):
+        return pd.read_parquet(path + '.parquet')
+    if os.path.exists(path + '.feather'):
+        return pd.read_feather(path + '.feather')
+    if os.path.exists(path + '.trace'):
+        with open(f'{path}.trace/schema.json') as file:
+            schema = json.load(file)
+        data = dict()
+        for column in schema['columns']:
+            values = np.fromfile(f"{path}.trace/{column['name']}.bin", dtype=column['dtype'], count=schema['rows'])
+            if column['type'] == 'str':
+                values = np.array(schema['categories'][column['name']], dtype=object)[values]
+            data[column['name']] = values
+        return pd.DataFrame(data)
+    raise FileNotFoundError(f'no {name} trace found in {output_folder}')
+
+def iter_trace(output_folder, name, chunksize=65536):
+    """Yields an output trace in chunks of at most chunksize records, as Pandas DataFrames
+
+    Only one chunk is kept in memory at a time, so also traces that do not fit in
+    memory can be processed, e.g. by a KPIAggregator.
+
+    Parameters
+    ----------
+    output_folder : str
+        Folder in which the traces are saved
+
+    name : str
+        Name of the trace, e.g. 'transports' or 'deliveries'
+
+    chunksize : int
+        Maximum number of records per chunk
+    """
+
+    path = f'{output_folder}/{name}'
+    if os.path.exists(path + '.csv'):
+        yield from pd.read_csv(path + '.csv', chunksize=chunksize)
+    elif os.path.exists(path + '.parquet'):
+        for batch in pq.ParquetFile(path + '.parquet').iter_batches(batch_size=chunksize):
+            yield batch.to_pandas()
+    elif os.path.exists(path + '.feather'):
+        with pa.memory_map(path + '.feather') as source:
+            reader = pa.ipc.open_file(source)
+            for idx in range(reader.num_record_batches):
+                yield reader.get_batch(idx).to_pandas()
+    elif os.path.exists(path + '.trace'):
+        with open(f'{path}.trace/schema.json') as file:
+            schema = json.load(file)
+        for start in range(0, schema['rows'], chunksize):
+            count = min(chunksize, schema['rows']-start)
+            data = dict()
+            for column in schema['columns']:
+                dtype = np.dtype(column['dtype'])
+                values = np.fromfile(f"{path}.trace/{column['name']}.bin", dtype=dtype, count=count, offset=start*dtype.itemsize)
+                if column['type'] == 'str':
+                    values = np.array(schema['categories'][column['name']], dtype=object)[values]
+                data[column['name']] = values
+            yield pd.DataFrame(data)
+    else:
+        raise FileNotFoundError(f'no {name} trace found in {output_folder}')
@@ -0,0 +1,224 @@
+import numpy as np
+import pandas as pd
+import json
+import math
+import os
+
+"""
+Debug tracing of a simulation run.
+
+The hot paths of the model only pay for one flag check when tracing is off:
+
+    if tracing.enabled:
+        tracing.emit(env.now, 'drive_start', startnode, truck.name, endnode)
+
+When a run is started with debug=True, every event is written as a fixed size binary
+record to debug.bin in the output folder, with the names of the nodes, trucks, event
+kinds and reasons in debug.json. The events can be filtered by node, truck and kind
+with read_debug_events, and written as the text lines of a debug log with write_debug_log.
+Only one run per process can be traced at the same time.
+"""
+
+# kinds of debug events and their messages, formatted with the fields of the event
+KINDS = {
+    'init_graph_start': 'init_graph | initializing state graph...',
+    'init_graph_end': 'init_graph | state graph initialized',
+    'order_init_start': 'order_generator {node} => {other} | initializing incoming_containers...',
+    'order_init_end': 'order_generator {node} => {other} | incoming_containers initialized',
+    'order_activated': 'order_generator {node} => {other} | activated',
+    'order_next': 'order_generator {node} => {other} | next arrival {value:.2f}',
+    'order_generate': 'order_generator {node} => {other} | generate container',
+    'order_future': 'order_generator {node} => {other} | add future arrival to incoming_containers',
+    'forklift_request': 'Truck {truck} | request forklift at Node {node}',
+    'forklift_release': 'Truck {truck} | release forklift at Node {node}',
+    'load_start': 'Truck {truck} | load cargo...',
+    'load_end': 'Truck {truck} | finish loading cargo',
+    'unload_start': 'Truck {truck} | unload cargo...',
+    'unload_end': 'Truck {truck} | finish unloading cargo',
+    'drive_start': 'Truck {truck} | drive {node} => {other}...',
+    'drive_end': 'Truck {truck} | finish driving {node} => {other}',
+    'container_delivered': 'Node {node} | container arrived at final destination',
+    'container_transferred': 'Node {node} | container arrived at intermediate hub',
+    'truck_available': 'Node {node} | Truck {truck} available',
+    'protocol_init_start': 'Node {node} | initializing protocol...',
+    'protocol_init_end': 'Node {node} | protocol initialized',
+    'protocol_check': 'Node {node} | checking dispatch rules...',
+    'dispatch': 'Node {node} | send Truck {truck} to Node {other}: {reason}',
+}
+KIND_CODES = {kind:code for code, kind in enumerate(KINDS)}
+
+# reasons of the dispatch events of the protocols
+REASONS = ('', 'not our truck', 'possible to fill', 'not our truck + patience ran out', 'urgent container delivery',
+           'possible to fill with suboptimal flows')
+REASON_CODES = {reason:code for code, reason in enumerate(REASONS)}
+
+# binary record of one debug event, nodes and trucks are indices in the name lists of debug.json (-1 if not set)
+DEBUG_DTYPE = np.dtype([('time', '<f8'), ('kind', 'u1'), ('reason', 'u1'), ('node', '<i4'), ('truck', '<i4'), ('other', '<i4'), ('value', '<f8')])
+
+# tracing switch, checked before every emit
+enabled = False
+_trace = None
+
+def _code(table, name):
+    """Returns the index of a name in a name table, adding new names at the end"""
+
+    if name is None:
+        return -1
+    code = table.get(name)
+    if code is None:
+        code = table[name] = len(table)
+    return code
+
+class DebugTrace():
+
+    def __init__(self, output_folder, buffer_size=65536):
+        """Binary debug event stream of one run: debug.bin with the records and debug.json with the names
+
+        Parameters
+        ----------
+        output_folder : str
+            Folder in which the debug stream is saved
+
+        buffer_size : int
+            Number of records kept in memory before they are written to disk
+        """
+
+        self.output_folder = output_folder
+        self.buffer_size = buffer_size
+        self.records = []
+        self.nodes = dict()
+        self.trucks = dict()
+        self.file = open(f'{output_folder}/debug.bin', 'wb')
+
+    def __repr__(self):
+        return f'DebugTrace {self.output_folder}'
+
+    def emit(self, time, kind, node=None, truck=None, other=None, value=math.nan, reason=''):
+        self.records.append((time, KIND_CODES[kind], REASON_CODES[reason], _code(self.nodes, node),
+                             _code(self.trucks, truck), _code(self.nodes, other), value))
+        if len(self.records) >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        """Writes the buffered records to debug.bin"""
+
+        if self.records:
+            np.array(self.records, dtype=DEBUG_DTYPE).tofile(self.file)
+            self.records = []
+
+    def close(self):
+        """Writes the remaining records and the names of the nodes, trucks, kinds and reasons in debug.json"""
+
+        self.flush()
+        self.file.close()
+        with open(f'{self.output_folder}/debug.json', 'w') as file:
+            json.dump({'kinds': list(KINDS), 'reasons': list(REASONS), 'nodes': list(self.nodes), 'trucks': list(self.trucks)}, file)
+
+def start(output_folder):
+    """Starts tracing the debug events of a run in output_folder, see DebugTrace"""
+
+    global enabled, _trace
+    if _trace is not None:
+        raise RuntimeError('another run is already traced in this process')
+    _trace = DebugTrace(output_folder)
+    enabled = True
+
+def stop():
+    """Stops tracing and closes the debug stream of the traced run, if any"""
+
+    global enabled, _trace
+    enabled = False
+    if _trace is not None:
+        _trace.close()
+        _trace = None
+
+def emit(time, kind, node=None, truck=None, other=None, value=math.nan, reason=''):
+    """Writes one debug event, only call it when tracing.enabled is True
+
+    Parameters
+    ----------
+    time : float
+        Simulation time of the event
+
+    kind : str
+        Kind of the event, a key of KINDS
+
+    node : str, optional
+        Name of the node of the event
+
+    truck : str, optional
+        Name of the truck of the event
+
+    other : str, optional
+        Name of a second node, e.g. the destination of a trip
+
+    value : float, optional
+        Extra value of the event, e.g. the next arrival of an order
+
+    reason : str
+        Reason of a dispatch, one of REASONS
+    """
+
+    _trace.emit(time, kind, node, truck, other, value, reason)
+
+def read_debug_events(output_folder, nodes=None, trucks=None, kinds=None):
+    """Returns the debug events of a traced run as a Pandas DataFrame, optionally filtered
+
+    Parameters
+    ----------
+    output_folder : str
+        Output folder of the traced run
+
+    nodes : list, optional
+        Only keep the events of these nodes (as node or as other node)
+
+    trucks : list, optional
+        Only keep the events of these trucks
+
+    kinds : list, optional
+        Only keep the events of these kinds, keys of KINDS
+    """
+
+    with open(f'{output_folder}/debug.json') as file:
+        names = json.load(file)
+    path = f'{output_folder}/debug.bin'
+    records = np.memmap(path, dtype=DEBUG_DTYPE, mode='r') if os.path.getsize(path) else np.zeros(0, dtype=DEBUG_DTYPE)
+
+    keep = np.ones(len(records), dtype=bool)
+    if nodes is not None:
+        codes = [idx for idx, name in enumerate(names['nodes']) if name in set(nodes)]
+        keep &= np.isin(records['node'], codes) | np.isin(records['other'], codes)
+    if trucks is not None:
+        keep &= np.isin(records['truck'], [idx for idx, name in enumerate(names['trucks']) if name in set(trucks)])
+    if kinds is not None:
+        keep &= np.isin(records['kind'], [names['kinds'].index(kind) for kind in kinds])
+    records = records[keep]
+
+    return pd.DataFrame({'time': np.asarray(records['time']),
+                         'kind': pd.Categorical.from_codes(records['kind'], names['kinds']),
+                         'reason': pd.Categorical.from_codes(records['reason'], names['reasons']),
+                         'node': pd.Categorical.from_codes(records['node'], names['nodes']),
+                         'truck': pd.Categorical.from_codes(records['truck'], names['trucks']),
+                         'other': pd.Categorical.from_codes(records['other'], names['nodes']),
+                         'value': np.asarray(records['value'])})
+
+def write_debug_log(output_folder, path=None, **filters):
+    """Writes the debug events of a traced run as the text lines of a debug log
+
+    Parameters
+    ----------
+    output_folder : str
+        Output folder of the traced run
+
+    path : str, optional
+        Filepath of the log. Defaults to debug.log in the output folder.
+
+    **filters
+        Filters of read_debug_events, e.g. trucks=['Gent_0']
+    """
+
+    events = read_debug_events(output_folder, **filters)
+    with open(path or f'{output_folder}/debug.log', 'w') as file:
+        for event in events.itertuples(index=False):
+            message = KINDS[event.kind].format(node=event.node, truck=event.truck, other=event.other, value=event.value, reason=event.reason)
+            file.write(f'{event.time:.2f} | {message}\n')
@@ -0,0 +1,148 @@
+import numpy as np
+import json
+import os
+from main.trace_store import TraceStore
+
+# warm-up period used when no warm-up analysis was saved
+DEFAULT_WARMUP_DAYS = 10
+
+def load_deliveries(output_folder, columns=('arrivaltime','deliverytime','transporttime','handlingtime')):
+    """Returns the delivery columns needed for the warm-up analysis as numpy arrays, read from the TraceStore
+
+    Parameters
+    ----------
+    output_folder : str
+        Folder in which the traces are saved
+
+    columns : tuple
+        Names of the columns, deliverytime is calculated from the start and arrival times
+    """
+
+    store = TraceStore(output_folder, 'deliveries')
+    data = dict()
+    for name in columns:
+        if name == 'deliverytime':
+            data[name] = store.column('arrivaltime') - store.column('starttime')
+        else:
+            data[name] = np.asarray(store.column(name), dtype=float)
+    return data
+
+def daily_means(arrivaltime, values, days, window=None):
+    """Returns the mean of values over all deliveries that arrived before the end of each day
+
+    The deliveries are summed per arrival day and accumulated in one pass over the data.
+    Element d-1 of the result is the mean over the deliveries that arrived before day d.
+    Days without deliveries give nan.
+
+    Parameters
+    ----------
+    arrivaltime : numpy array
+        Arrival times of the deliveries in hours
+
+    values : numpy array
+        Value of every delivery, e.g. its delivery time
+
+    days : int
+        Number of days in the result
+
+    window : int, optional
+        Only use the deliveries of the last window days (moving window mean) instead of
+        all deliveries since the start (cumulative mean)
+    """
+
+    day = np.floor(np.asarray(arrivaltime)/24).astype(np.int64)
+    keep = day < days
+    counts = np.cumsum(np.bincount(day[keep], minlength=days))
+    sums = np.cumsum(np.bincount(day[keep], weights=np.asarray(values)[keep], minlength=days))
+    if window:
+        counts[window:] = counts[window:] - counts[:-window]
+        sums[window:] = sums[window:] - sums[:-window]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(counts > 0, sums/counts, np.nan)
+
+def mser(series, batch_size=5):
+    """Returns the MSER truncation point of a series: the number of initial observations to delete
+
+    The series is averaged in batches (MSER-5 for batch_size 5). For every truncation point d
+    in the first half of the batches, the MSER statistic is the variance of the remaining
+    batch means divided by their number, computed for all d at once from reverse cumulative
+    sums. The truncation point with the smallest statistic is returned.
+
+    Parameters
+    ----------
+    series : numpy array
+        Observations in chronological order, e.g. delivery times sorted by arrival time
+
+    batch_size : int
+        Number of observations per batch
+    """
+
+    batches = len(series)//batch_size
+    if batches < 2:
+        return 0
+    means = np.asarray(series[:batches*batch_size], dtype=float).reshape(batches, batch_size).mean(axis=1)
+
+    # sum and sum of squares of the remaining batch means for every truncation point
+    sums = np.cumsum(means[::-1])[::-1]
+    squares = np.cumsum(means[::-1]**2)[::-1]
+    remaining = batches - np.arange(batches)
+    statistic = (squares/remaining - (sums/remaining)**2)/remaining
+
+    return int(np.argmin(statistic[:batches//2+1]))*batch_size
+
+def recommend_warmup_days(arrivaltime, deliverytime, batch_size=5):
+    """Returns the recommended warm-up period in whole days, with MSER applied to the delivery times
+
+    Parameters
+    ----------
+    arrivaltime : numpy array
+        Arrival times of the deliveries in hours
+
+    deliverytime : numpy array
+        Delivery times of the deliveries in hours
+
+    batch_size : int
+        Number of observations per MSER batch
+    """
+
+    order = np.argsort(arrivaltime, kind='stable')
+    truncation = mser(np.asarray(deliverytime)[order], batch_size)
+    if truncation == 0:
+        return 0
+    return int(np.ceil(np.asarray(arrivaltime)[order][truncation-1]/24))
+
+def save_warmup_days(folder, warmup_days, **info):
+    """Saves the chosen warm-up period of a network in output/warmup.json
+
+    Parameters
+    ----------
+    folder : str
+        Path of the network folder, e.g. 'networks/network-test-volume'
+
+    warmup_days : int
+        Warm-up period in days
+
+    **info
+        Extra information saved with the warm-up period, e.g. the analysed run
+    """
+
+    with open(f'{folder}/output/warmup.json', 'w') as file:
+        json.dump({'warmup_days': warmup_days, **info}, file, indent=1)
+
+def load_warmup_days(folder, default=DEFAULT_WARMUP_DAYS):
+    """Returns the warm-up period saved by KPI_warmup.py for a network, or the default if there is none
+
+    Parameters
+    ----------
+    folder : str
+        Path of the network folder, e.g. 'networks/network-test-volume'
+
+    default : int
+        Warm-up period in days when no warmup.json was saved
+    """
+
+    path = f'{folder}/output/warmup.json'
+    if not os.path.exists(path):
+        return default
+    with open(path) as file:
+        return json.load(file)['warmup_days']
@@ -0,0 +1,37 @@
+from main.snapshot import warmup_snapshot, run_from_snapshot
+from main.sweep import run_sweep
+from main.protocols import protocol_volume, protocol_patience, protocol_urgency, protocol_consolidation
+from functools import partial
+import os
+
+"""
+This script simulates the warm-up period of a network once, saves the state at its end in a snapshot,
+and simulates several protocol/parameter variants from that warmed-up state in parallel worker processes.
+"""
+
+# choose which network to simulate + which multiplier
+folder = 'networks/network-test-volume'
+orderfreq_mult = 1
+seed = None
+
+# protocol during the warm-up period
+warmup_protocol = protocol_volume
+
+# variants: name => (protocol, parameters that replace the values in parameters.csv)
+variants = {
+    'volume': (protocol_volume, {}),
+    'patience': (partial(protocol_patience, patience=2), {}),
+    'urgency': (protocol_urgency, {}),
+    'consolidation': (protocol_consolidation, {}),
+}
+
+# number of worker processes (1 = run sequentially in this process)
+workers = os.cpu_count()
+
+if __name__ == '__main__':
+    output_folder = f'{folder}/output/orderfreq_{orderfreq_mult}_fork'
+    snapshot = f'{folder}/output/orderfreq_{orderfreq_mult}_warmup.pkl'
+    warmup_snapshot(folder, orderfreq_mult, f'{output_folder}_warmup', snapshot, seed, warmup_protocol)
+    jobs = [{'snapshot': snapshot, 'output_folder': f'{output_folder}_{name}', 'protocol': protocol, 'overrides': overrides}
+            for name, (protocol, overrides) in variants.items()]
+    run_sweep(jobs, workers, runner=run_from_snapshot)
@@ -0,0 +1,23 @@
+from main.longrun import run_longrun
+
+"""
+This script simulates one long run of a network in windows of window_days (batches).
+The run stops as soon as the batch means confidence intervals of the on-time delivery fraction
+and the truck driving time per day are tight enough, or after max_days.
+"""
+
+# choose which network to simulate + which multiplier
+folder = 'networks/network-test-volume'
+orderfreq_mult = 1
+seed = None
+
+# batch length + stopping rule (target relative half-width of the 95% confidence intervals)
+window_days = 5
+target = 0.05
+min_batches = 10
+max_days = 1000
+
+if __name__ == '__main__':
+    output_folder = f'{folder}/output/orderfreq_{orderfreq_mult}_longrun'
+    run_longrun(folder, orderfreq_mult, output_folder, seed, window_days=window_days, target=target,
+                min_batches=min_batches, max_days=max_days)
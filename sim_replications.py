@@ -0,0 +1,28 @@
+from main.replications import run_replications
+import os
+
+"""
+This script simulates independent replications of one scenario until the confidence intervals
+of the on-time delivery fraction and the total truck driving time are tight enough.
+The replications are executed in parallel worker processes.
+"""
+
+# choose which network to simulate + which multiplier
+folder = 'networks/network-test-volume'
+orderfreq_mult = 1
+
+# base seed of the replications (None = fresh entropy, saved in replications.json)
+seed = None
+
+# target relative half-width of the 95% confidence intervals + replication limits
+target = 0.05
+min_replications = 3
+max_replications = 30
+
+# number of worker processes (1 = run sequentially in this process)
+workers = os.cpu_count()
+
+if __name__ == '__main__':
+    output_folder = f'{folder}/output/orderfreq_{orderfreq_mult}_replications'
+    run_replications(folder, orderfreq_mult, output_folder, seed, target,
+                     min_replications=min_replications, max_replications=max_replications, workers=workers)
@@ -0,0 +1,17 @@
+from main.scenarios import run_scenarios
+import os
+
+"""
+This script runs a grid of scenarios (protocols x parameters x multipliers x seeds) defined in a json file.
+Scenarios that were already simulated are skipped, the others run in parallel worker processes.
+The settings and KPIs of all scenarios are collected in results.csv in the output folder of the scenarios.
+"""
+
+# json file with the network folder, the grid and the seeds, see main/scenarios.py
+scenario_file = 'scenarios/example.json'
+
+# number of worker processes (1 = run sequentially in this process)
+workers = os.cpu_count()
+
+if __name__ == '__main__':
+    run_scenarios(scenario_file, workers)
@@ -4,10 +4,14 @@ from dash import html
 import networkx as nx
 import plotly.graph_objs as go
 import pandas as pd
+import numpy as np
 from textwrap import dedent as d
 import json
 import utm
 import math
+from main.trace_store import TraceStore
+from main.flow_index import FlowIndex
+from main.playback import Playback
 
 """
 Interactive web-app to visualization the PI network and its flows
@@ -17,6 +21,10 @@ Interactive web-app to visualization the PI network and its flows
 folder = 'networks/network-europe-volume'
 orderfreq_mult = 1
 
+# time window (in days) and time step (in hours) of the playback
+playback_days = [0, 7]
+playback_step = 1
+
 # import the css template, and pass the css template into dash
 external_stylesheets = ['https://codepen.io/chriddyp/pen/bWLwgP.css']
 app = dash.Dash(__name__, external_stylesheets=external_stylesheets)
@@ -26,8 +34,12 @@ app.title = "Physical Internet"
 parameters = pd.read_csv(f'{folder}/input/parameters.csv')
 nodes = pd.read_csv(f'{folder}/input/nodes.csv')
 output_folder = f'{folder}/output/orderfreq_{orderfreq_mult}'
-Transports = pd.read_csv(f'{output_folder}/transports.csv')
-Transports['arc'] = Transports['startnode'] + ' => ' + Transports['endnode']
+Transports = TraceStore(output_folder, 'transports').to_pandas(['truckname', 'startnode', 'endnode', 'starttime', 'endtime', 'load'])
+Deliveries = TraceStore(output_folder, 'deliveries').to_pandas(['startnode', 'endnode', 'starttime', 'arrivaltime'])
+try:
+    Hubstates = TraceStore(output_folder, 'hubstates').to_pandas()
+except FileNotFoundError:
+    Hubstates = None
 
 # rescale x and y coordinates to between 0 and 1
 x = []; y = []
@@ -44,11 +56,13 @@ SIM_TIME = float(parameters['sim_days'])*24
 timeRange = [0, SIM_TIME]
 flow = 'Containers'
 
-def network_graph(timeRange,flow,nodes=nodes,Transports=Transports):
+# flows per arc of every time window, built once so moving the slider does not filter the transports again
+flows = FlowIndex(Transports, SIM_TIME)
+
+# state of the network at every playback step, built once so the frames can be rendered in advance
+playback = Playback(Transports, Deliveries, nodes, min(playback_days[1]*24, SIM_TIME), playback_step, playback_days[0]*24, Hubstates)
 
-    # only keep data within time window
-    TimeSubset = Transports.loc[timeRange[0]<Transports['endtime'].values]
-    TimeSubset = TimeSubset.loc[TimeSubset['endtime'].values<timeRange[1]]
+def network_graph(timeRange,flow,nodes=nodes,flows=flows):
 
     # initialize graph
     G = nx.DiGraph()
@@ -60,22 +74,11 @@ def network_graph(timeRange,flow,nodes=nodes,Transports=Transports):
         G.nodes[name]['numtrucks'] = numtrucks
         G.nodes[name]['pos'] = [x,y]
 
-    # calculate flows and assign to edge weights
+    # get flows of the time window and assign to edge weights
     maxflow = 0
-    for arc in TimeSubset['arc'].unique():
-        Subset = TimeSubset.loc[TimeSubset['arc'].values == arc]
-        startid,endid = Subset.iloc[0][1:3]
-
-        if flow == 'Containers':
-            weight = sum(Subset['load'])
-            if weight > 0:
-                G.add_edge(startid,endid,weight=weight)
-                maxflow = max(maxflow,sum(Subset['load']))
-        elif flow == 'Trucks':
-            weight = Subset.shape[0]
-            if weight > 0:
-                G.add_edge(startid,endid,weight=weight)
-                maxflow = max(maxflow,Subset.shape[0])
+    for startid,endid,weight in flows.flows(timeRange[0], timeRange[1], flow):
+        G.add_edge(startid,endid,weight=weight)
+        maxflow = max(maxflow,weight)
 
     # draw edges between nodes
     traceRecode = []
@@ -138,6 +141,69 @@ def network_graph(timeRange,flow,nodes=nodes,Transports=Transports):
                             )}
     return figure
 
+def playback_figure(playback=playback,nodes=nodes):
+
+    x = nodes['x'].to_numpy()
+    y = nodes['y'].to_numpy()
+    index = {name:idx for idx,name in enumerate(playback.names)}
+
+    # start and end of arcs, shifted to the side like the edges of network_graph
+    def shifted(start, end, d=0.05):
+        dx = x[start]-x[end]
+        dy = y[start]-y[end]
+        dist = np.sqrt(dx*dx + dy*dy)
+        dx = dx/dist
+        dy = dy/dist
+        return x[start]-d*dy, y[start]+d*dx, x[end]-d*dy, y[end]+d*dx
+
+    # draw all arcs once
+    x0, y0, x1, y1 = shifted(np.array([index[arc[0]] for arc in playback.arcs], dtype=int),
+                             np.array([index[arc[1]] for arc in playback.arcs], dtype=int))
+    arc_trace = go.Scatter(x=[value for arc in zip(x0, x1, [None]*len(x0)) for value in arc],
+                           y=[value for arc in zip(y0, y1, [None]*len(y0)) for value in arc],
+                           mode='lines', line={'width': 1, 'color': 'lightgrey'}, hoverinfo='none')
+
+    # nodes sized by their inventory and colored by their trucks, trucks on their way
+    maxinventory = max(playback.inventory.max(), 1)
+    maxtrucks = max(playback.trucks.max(), 1)
+    def frame_data(k):
+        inventory = playback.inventory[k]
+        trucks = playback.trucks[k]
+        hovertext = [f"Containers: {containers}<br>Trucks: {available}" for containers,available in zip(inventory,trucks)]
+        if playback.forklift_queue is not None:
+            hovertext = [f"{text}<br>Forklift queue: {queue}" for text,queue in zip(hovertext,playback.forklift_queue[k])]
+        node_trace = go.Scatter(x=x, y=y, text=playback.names, mode='markers+text', textposition="middle center",
+                                hovertext=hovertext,
+                                hoverinfo="text",
+                                marker={'size': 30 + 40*inventory/maxinventory, 'color': trucks, 'colorscale': 'Blues',
+                                        'cmin': 0, 'cmax': maxtrucks, 'showscale': True, 'colorbar': {'title': 'Trucks'}})
+        names, start, end, fraction, load = playback.markers(k)
+        x0, y0, x1, y1 = shifted(start, end)
+        truck_trace = go.Scatter(x=x0+fraction*(x1-x0), y=y0+fraction*(y1-y0), mode='markers',
+                                 hovertext=[f"{name}: {containers} containers" for name,containers in zip(names,load)],
+                                 hoverinfo="text",
+                                 marker={'size': 12, 'symbol': 'square', 'color': np.where(load > 0, 'rgb(255, 175, 14)', 'grey')})
+        return [node_trace, truck_trace]
+
+    # render every frame in advance, the browser plays them without callbacks
+    frames = [go.Frame(data=frame_data(k), traces=[1,2], name=str(k)) for k in range(len(playback))]
+    steps = [{'method': 'animate', 'label': f'{playback.times[k]/24:.2f}',
+              'args': [[str(k)], {'mode': 'immediate', 'frame': {'duration': 0, 'redraw': True}, 'transition': {'duration': 0}}]}
+             for k in range(len(playback))]
+    layout = go.Layout(title='', showlegend=False, hovermode='closest',
+                       margin={'b': 10, 'l': 10, 'r': 10, 't': 10},
+                       xaxis={'showgrid': False, 'zeroline': False, 'showticklabels': False},
+                       yaxis={'showgrid': False, 'zeroline': False, 'showticklabels': False},
+                       height=700,
+                       width=700,
+                       updatemenus=[{'type': 'buttons', 'showactive': False, 'x': 0, 'y': 0, 'xanchor': 'right', 'yanchor': 'top',
+                                     'buttons': [{'label': 'Play', 'method': 'animate',
+                                                  'args': [None, {'frame': {'duration': 200, 'redraw': True}, 'fromcurrent': True, 'transition': {'duration': 0}}]},
+                                                 {'label': 'Pause', 'method': 'animate',
+                                                  'args': [[None], {'mode': 'immediate', 'frame': {'duration': 0, 'redraw': False}, 'transition': {'duration': 0}}]}]}],
+                       sliders=[{'steps': steps, 'currentvalue': {'prefix': 'Day '}, 'x': 0.1, 'len': 0.9}])
+    return go.Figure(data=[arc_trace, *frame_data(0)], layout=layout, frames=frames)
+
 # HTML style and layout of web-app
 styles = {
     'pre': {
@@ -217,6 +283,27 @@ app.layout = html.Div([
                 ]
             )
         ]
+    ),
+    html.Div(
+        className="row",
+        children=[
+            html.Div(
+                className="two columns",
+                children=[
+                    dcc.Markdown(d("""
+                            **Playback**
+
+                            Press play to step through time. Nodes grow with their containers and darken with their trucks, squares are driving trucks (orange when loaded).
+                            """))
+                ]
+            ),
+            html.Div(
+                className="eight columns",
+                children=[dcc.Graph(id="playback-graph",
+                                    figure=playback_figure())],
+                style={'textAlign': "center"},
+            )
+        ]
     )
 ])
 